@@ -0,0 +1,79 @@
+"""Growable buffer collecting the projected views of an asset.
+"""
+import numpy as np
+
+
+class PointCloudAccumulator:
+    """Accumulate per-view point clouds in a single preallocated buffer.
+
+    The buffer grows by doubling its capacity, so appending N points costs amortized O(N) and the
+    peak memory stays within a constant factor of the final point cloud, instead of holding a list of
+    per-view arrays plus their concatenated copy.
+    """
+
+    def __init__(self, n_columns: int = 9, initial_capacity: int = 1 << 16, dtype=np.float64):
+        self.n_columns = n_columns
+        self.dtype = np.dtype(dtype)
+        self._initial_capacity = max(int(initial_capacity), 1)
+        self._buffer = None
+        self._size = 0
+        self.clear()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes
+
+    def reserve(self, capacity: int):
+        """Make sure the buffer can hold at least `capacity` points without growing again."""
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(self.capacity, self._initial_capacity)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        # Views handed out by `allocate` and `view` keep the previous buffer alive, so it is copied instead of
+        # resized in place
+        buffer = np.empty((new_capacity, self.n_columns), dtype=self.dtype)
+        buffer[: self._size] = self._buffer[: self._size]
+        self._buffer = buffer
+
+    def allocate(self, n: int) -> np.ndarray:
+        """Reserve the next `n` rows and return them as a writable view to project into.
+
+        Fill the view before the next call that can grow the buffer, later writes do not reach the accumulator.
+        """
+        self.reserve(self._size + n)
+        out = self._buffer[self._size : self._size + n]
+        self._size += n
+        return out
+
+    def append(self, pointcloud: np.ndarray):
+        """Copy an (N, n_columns) point cloud at the end of the buffer."""
+        self.allocate(pointcloud.shape[0])[...] = pointcloud
+
+    def view(self) -> np.ndarray:
+        """Get the points accumulated so far, without copying. Later appends are not part of the view."""
+        return self._buffer[: self._size]
+
+    def finalize(self) -> np.ndarray:
+        """Trim the buffer to the accumulated points and hand it over, the accumulator is reset afterwards."""
+        pointcloud, size = self._buffer, self._size
+        self.clear()
+        if pointcloud.shape[0] != size:
+            try:
+                # shrinks in place unless a view of the buffer is still referenced
+                pointcloud.resize((size, self.n_columns))
+            except ValueError:
+                pointcloud = pointcloud[:size].copy()
+        return pointcloud
+
+    def clear(self):
+        """Drop the accumulated points, the buffer is allocated again on the next append."""
+        self._buffer = np.empty((0, self.n_columns), dtype=self.dtype)
+        self._size = 0
@@ -0,0 +1,231 @@
+"""Sources of the groundtruth frames back-projected by the point cloud generator.
+
+`KitGroundTruthSource` (in `syntheticdata_utils`) reads the RTX syntheticdata sensors of a viewport.
+`RayCastGroundTruthSource` is a pure NumPy stand-in casting the camera rays against the asset meshes,
+so the projection, fusion and export stages can run headless and on CPU-only machines.
+"""
+import numpy as np
+
+from .geometry import MeshTriangles, get_camera_metadata
+from .projection import RayDirectionCache
+
+
+class GroundTruthSource:
+    """Interface of the groundtruth sources.
+
+    `get_groundtruth` renders the current camera pose and returns a dict with the fields consumed by
+    the generator: `linear_depth` (H, W), `normal` (H, W, 3), `images` (H, W, 4) and `segmentation` (H, W).
+    """
+
+    name = "base"
+    # True when every frame shows the camera pose set before it was read, so views settle on their first frame
+    renders_current_pose = False
+
+    def reset(self):
+        """Called when the asset or the stage changed."""
+        pass
+
+    async def get_groundtruth(self) -> dict:
+        raise NotImplementedError
+
+
+def _monotonic_axis(values: np.ndarray):
+    """Get increasing coordinates of pixel centers along an image axis, and whether they were flipped."""
+    if values.shape[0] > 1 and values[0] > values[-1]:
+        return -values, True
+    return values, False
+
+
+def _pixel_range(axis_values: np.ndarray, flipped: bool, lo: np.ndarray, hi: np.ndarray):
+    """Conservative range of pixels whose center lies within [lo, hi] along an image axis."""
+    if flipped:
+        lo, hi = -hi, -lo
+    first = np.searchsorted(axis_values, lo, side="left") - 1
+    last = np.searchsorted(axis_values, hi, side="right")
+    n = axis_values.shape[0]
+    return np.clip(first, 0, n - 1), np.clip(last, 0, n - 1)
+
+
+def raycast_triangles(directions: np.ndarray, triangles: np.ndarray, tile_size: int = 32, max_pairs: int = 1 << 22):
+    """Intersect camera rays with triangles, both expressed in camera space.
+
+    Rays start at the camera origin. Triangles are binned on a uniform grid of screen tiles from the
+    bounding box of their projection, then every tile tests its rays against its triangles with a
+    vectorized Moller-Trumbore intersection.
+
+    Args:
+        directions (np.ndarray): (H, W, 3) ray directions, see `projection.compute_ray_directions`
+        triangles (np.ndarray): (T, 3, 3) triangle corners in camera space
+        tile_size (int): edge length in pixels of the screen tiles
+        max_pairs (int): maximum number of ray/triangle pairs tested at once
+
+    Returns:
+        tuple: (H, W) ray parameter of the closest hit (inf if none), (H, W) index of the hit triangle
+            (-1 if none) and (H, W, 2) barycentric coordinates of the hit
+    """
+    height, width = directions.shape[:2]
+    t_hit = np.full((height, width), np.inf)
+    tri_hit = np.full((height, width), -1, dtype=np.int64)
+    uv_hit = np.zeros((height, width, 2))
+    if triangles.shape[0] == 0:
+        return t_hit, tri_hit, uv_hit
+
+    # Bin the triangles on screen tiles, using the projection of their corners on the z = -1 plane
+    z = triangles[..., 2]
+    in_front = z < 0
+    visible = in_front.any(axis=1)
+    straddling = visible & ~in_front.all(axis=1)
+    depth = np.where(in_front, -z, 1.0)
+    projected = triangles[..., :2] / depth[..., None]
+
+    cols, cols_flipped = _monotonic_axis(directions[0, :, 0])
+    rows, rows_flipped = _monotonic_axis(directions[:, 0, 1])
+    col_lo, col_hi = _pixel_range(cols, cols_flipped, projected[..., 0].min(axis=1), projected[..., 0].max(axis=1))
+    row_lo, row_hi = _pixel_range(rows, rows_flipped, projected[..., 1].min(axis=1), projected[..., 1].max(axis=1))
+    # Triangles crossing the camera plane have an unbounded projection, they cover the whole screen
+    col_lo[straddling], col_hi[straddling] = 0, width - 1
+    row_lo[straddling], row_hi[straddling] = 0, height - 1
+
+    tri_idx = np.nonzero(visible)[0]
+    tx0, tx1 = col_lo[tri_idx] // tile_size, col_hi[tri_idx] // tile_size
+    ty0, ty1 = row_lo[tri_idx] // tile_size, row_hi[tri_idx] // tile_size
+    n_tx = (width + tile_size - 1) // tile_size
+    tiles_w = tx1 - tx0 + 1
+    n_tiles = tiles_w * (ty1 - ty0 + 1)
+
+    pair_tri = np.repeat(tri_idx, n_tiles)
+    local = np.arange(pair_tri.shape[0]) - np.repeat(np.cumsum(n_tiles) - n_tiles, n_tiles)
+    pair_tw = np.repeat(tiles_w, n_tiles)
+    pair_tile = (np.repeat(ty0, n_tiles) + local // pair_tw) * n_tx + np.repeat(tx0, n_tiles) + local % pair_tw
+    order = np.argsort(pair_tile, kind="stable")
+    pair_tile, pair_tri = pair_tile[order], pair_tri[order]
+    tiles, tile_starts = np.unique(pair_tile, return_index=True)
+    tile_ends = np.append(tile_starts[1:], pair_tile.shape[0])
+
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+    # with rays starting at the origin this part of Moller-Trumbore does not depend on the ray
+    qvec = np.cross(-v0, e1)
+
+    for tile, start, end in zip(tiles, tile_starts, tile_ends):
+        r0, c0 = (tile // n_tx) * tile_size, (tile % n_tx) * tile_size
+        r1, c1 = min(r0 + tile_size, height), min(c0 + tile_size, width)
+        rays = directions[r0:r1, c0:c1].reshape(-1, 3)
+        best_t = np.full(rays.shape[0], np.inf)
+        best_tri = np.full(rays.shape[0], -1, dtype=np.int64)
+        best_uv = np.zeros((rays.shape[0], 2))
+
+        chunk = max(max_pairs // rays.shape[0], 1)
+        for chunk_start in range(start, end, chunk):
+            tris = pair_tri[chunk_start : min(chunk_start + chunk, end)]
+            pvec = np.cross(rays[:, None, :], e2[tris][None, :, :])
+            det = np.einsum("kc,rkc->rk", e1[tris], pvec)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                inv_det = 1.0 / det
+                u = np.einsum("kc,rkc->rk", -v0[tris], pvec) * inv_det
+                v = (rays @ qvec[tris].T) * inv_det
+                t = (e2[tris] * qvec[tris]).sum(axis=1)[None, :] * inv_det
+            hit = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 1e-9)
+            t = np.where(hit, t, np.inf)
+
+            closest = np.argmin(t, axis=1)
+            closest_t = t[np.arange(t.shape[0]), closest]
+            better = closest_t < best_t
+            best_t[better] = closest_t[better]
+            best_tri[better] = tris[closest[better]]
+            best_uv[better, 0] = u[better, closest[better]]
+            best_uv[better, 1] = v[better, closest[better]]
+
+        t_hit[r0:r1, c0:c1] = best_t.reshape(r1 - r0, c1 - c0)
+        tri_hit[r0:r1, c0:c1] = best_tri.reshape(r1 - r0, c1 - c0)
+        uv_hit[r0:r1, c0:c1] = best_uv.reshape(r1 - r0, c1 - c0, 2)
+
+    return t_hit, tri_hit, uv_hit
+
+
+class RayCastGroundTruthSource(GroundTruthSource):
+    """CPU groundtruth source casting one ray per pixel against the meshes of the asset.
+
+    Depth follows the convention of the syntheticdata sensors used by `get_pointcloud`, so that
+    `linear_depth * depth_scale` is the distance along the z axis of the camera. Normals are returned in
+    world space facing the camera, colors come from the mesh display colors without lighting.
+
+    Args:
+        camera: USD camera prim, read at every frame to follow the camera rig
+        asset_prim: prim holding the meshes to render
+        width (int): image width in pixels
+        height (int): image height in pixels
+        depth_scale (float): scale the generator applies to depth, see `get_pointcloud`
+        tile_size (int): edge length in pixels of the screen tiles used to bin triangles
+    """
+
+    name = "cpu_raycast"
+    renders_current_pose = True
+
+    def __init__(self, camera, asset_prim, width: int, height: int, depth_scale: float = 100.0, tile_size: int = 32):
+        self.camera = camera
+        self.asset_prim = asset_prim
+        self.width = width
+        self.height = height
+        self.depth_scale = depth_scale
+        self.tile_size = tile_size
+
+        self._triangles = None
+        self._ray_cache = RayDirectionCache()
+
+    def reset(self):
+        self._triangles = None
+
+    @property
+    def triangles(self) -> MeshTriangles:
+        if self._triangles is None:
+            self._triangles = MeshTriangles.from_prim(self.asset_prim)
+        return self._triangles
+
+    async def get_groundtruth(self) -> dict:
+        return self.render()
+
+    def render(self, metadata: dict = None) -> dict:
+        """Render the groundtruth of the current camera pose, or of the given camera metadata."""
+        if metadata is None:
+            metadata = get_camera_metadata(self.camera)
+        directions = self._ray_cache.get(
+            self.width,
+            self.height,
+            metadata["focal_length"],
+            metadata["horizontal_aperture"],
+            metadata["vertical_aperture"],
+        )
+
+        # Move the triangles to camera space, inverting the row-vector camera to world transform
+        local_to_world = np.asarray(metadata["local_to_world_tf"], dtype=np.float64)
+        rotation, origin = local_to_world[:3, :3], local_to_world[3, :3]
+        triangles = self.triangles
+        triangles_cam = (triangles.vertices - origin) @ np.linalg.inv(rotation)
+
+        t_hit, tri_hit, uv_hit = raycast_triangles(directions, triangles_cam, tile_size=self.tile_size)
+        hit = tri_hit >= 0
+        tris = tri_hit[hit]
+        u, v = uv_hit[hit, 0:1], uv_hit[hit, 1:2]
+        weights = (1 - u - v, u, v)
+
+        linear_depth = np.zeros((self.height, self.width), dtype=np.float32)
+        linear_depth[hit] = t_hit[hit] / self.depth_scale
+
+        normals = sum(w * triangles.normals[tris, i] for i, w in enumerate(weights))
+        norm = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+        # flip the normals facing away from the camera
+        view_dirs = directions[hit] @ rotation
+        normals *= np.where(np.einsum("nc,nc->n", normals, view_dirs) > 0, -1.0, 1.0)[:, None]
+        normal_image = np.zeros((self.height, self.width, 3), dtype=np.float32)
+        normal_image[hit] = normals
+
+        colors = sum(w * triangles.colors[tris, i] for i, w in enumerate(weights))
+        rgba = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        rgba[hit, :3] = np.clip(np.rint(colors * 255), 0, 255)
+        rgba[hit, 3] = 255
+
+        segmentation = hit.astype(np.uint32)
+        return {"linear_depth": linear_depth, "normal": normal_image, "images": rgba, "segmentation": segmentation}
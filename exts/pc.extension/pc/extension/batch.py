@@ -0,0 +1,138 @@
+"""Batch conversion of many assets, reusing the stage, camera rig, viewport and sensors between them.
+"""
+import collections
+import glob
+import hashlib
+import json
+import os
+import time
+import traceback
+
+
+def expand_asset_paths(asset_paths) -> list:
+    """Expand a path, a glob pattern or a list of them to the sorted list of matching files."""
+    if isinstance(asset_paths, str):
+        asset_paths = [asset_paths]
+    expanded = []
+    for pattern in asset_paths:
+        if glob.has_magic(pattern):
+            expanded.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            expanded.append(pattern)
+    # keep the first occurrence of every path
+    return list(dict.fromkeys(expanded))
+
+
+class BatchConverter:
+    """Convert a list of USD assets to point cloud files with a single `PointCloudGenerator`.
+
+    The stage is set up for the first asset only, then only the reference on `/World/Object` is swapped
+    between assets. The status, timings and errors of every asset go to a JSON manifest, written after
+    each asset so an interrupted run keeps its progress.
+
+    Args:
+        generator (PointCloudGenerator): generator doing the conversion
+        output_dir (str): directory receiving one point cloud file per asset, see `get_output_paths`
+        file_format (str): format of the point cloud files, see `exporters.export_pointcloud`
+        manifest_path (str, optional): path of the manifest, `manifest.json` in `output_dir` by default
+    """
+
+    def __init__(self, generator, output_dir: str, file_format: str = ".ply", manifest_path: str = None):
+        self.generator = generator
+        self.output_dir = output_dir
+        self.file_format = file_format if file_format.startswith(".") else f".{file_format}"
+        self.manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+        self.manifest = {"assets": []}
+
+    def get_output_path(self, asset_path: str, root: str = None) -> str:
+        """Output file of an asset, at its path relative to `root`, the directory of the asset by default."""
+        if root is None:
+            root = os.path.dirname(asset_path)
+        name = os.path.splitext(os.path.relpath(asset_path, root))[0]
+        return os.path.join(self.output_dir, f"{name}{self.file_format}")
+
+    def get_output_paths(self, asset_paths) -> dict:
+        """Output files of the assets by asset path, mirroring their directories below their common root.
+
+        Assets still sharing an output file, like `chair.usd` and `chair.usda`, get a short hash of their path
+        appended to their name.
+        """
+        asset_paths = list(asset_paths)
+        if not asset_paths:
+            return {}
+        absolute_paths = [os.path.abspath(path) for path in asset_paths]
+        root = os.path.commonpath([os.path.dirname(path) for path in absolute_paths])
+        outputs = {path: self.get_output_path(absolute, root) for path, absolute in zip(asset_paths, absolute_paths)}
+        counts = collections.Counter(outputs.values())
+        for path, absolute in zip(asset_paths, absolute_paths):
+            if counts[outputs[path]] > 1:
+                stem, ext = os.path.splitext(outputs[path])
+                digest = hashlib.sha1(absolute.encode("utf-8")).hexdigest()[:8]
+                outputs[path] = f"{stem}_{digest}{ext}"
+        return outputs
+
+    def write_manifest(self):
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+    async def convert(self, asset_path: str, output_path: str = None) -> dict:
+        """Convert a single asset and return its manifest entry.
+
+        Args:
+            asset_path (str): path of the asset
+            output_path (str, optional): point cloud file written, see `get_output_path` for the default
+        """
+        output_path = output_path or self.get_output_path(asset_path)
+        entry = {"asset": asset_path, "output": output_path, "status": "failed", "timings": {}}
+        timings = entry["timings"]
+        start = time.perf_counter()
+        try:
+            await self.generator.load_asset(asset_path)
+            timings["load"] = time.perf_counter() - start
+            if self.generator.asset_status.get("error"):
+                raise RuntimeError(self.generator.asset_status["error"])
+
+            step = time.perf_counter()
+            await self.generator.get_asset_pointcloud()
+            timings["generate"] = time.perf_counter() - step
+
+            step = time.perf_counter()
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            self.generator.export_pointcloud(output_path, self.file_format)
+            timings["export"] = time.perf_counter() - step
+
+            entry["n_points"] = len(self.generator.pointcloud)
+            entry["cache_hit"] = self.generator.cache_hit
+            entry["status"] = "ok"
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            entry["traceback"] = traceback.format_exc()
+            print(f"Failed to convert {asset_path}: {entry['error']}")
+        finally:
+            timings["total"] = time.perf_counter() - start
+            # breakdown of the conversion stages, see `Profiler`
+            profile = self.generator.profiler.asset_report()
+            if profile is not None and profile["asset"] == asset_path:
+                entry["spans"] = profile["spans"]
+            # do not keep the point cloud of the previous asset around
+            self.generator.pointcloud = None
+        return entry
+
+    async def run(self, asset_paths) -> dict:
+        """Convert every asset matching `asset_paths` and return the manifest."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        asset_paths = expand_asset_paths(asset_paths)
+        output_paths = self.get_output_paths(asset_paths)
+        self.manifest = {"assets": [], "started": time.time()}
+
+        start = time.perf_counter()
+        for i, asset_path in enumerate(asset_paths):
+            print(f"Converting asset {i + 1}/{len(asset_paths)}: {asset_path}")
+            self.manifest["assets"].append(await self.convert(asset_path, output_paths[asset_path]))
+            self.write_manifest()
+
+        self.manifest["total_time"] = time.perf_counter() - start
+        self.manifest["succeeded"] = sum(entry["status"] == "ok" for entry in self.manifest["assets"])
+        self.manifest["failed"] = len(asset_paths) - self.manifest["succeeded"]
+        self.write_manifest()
+        return self.manifest
@@ -0,0 +1,190 @@
+"""Content-addressed on-disk cache of generated point clouds.
+
+Entries are keyed on a hash of the asset file, every layer and asset it depends on, and the generation
+parameters, so a changed sublayer or texture invalidates them while moving or renaming files does not.
+The same cache stores whole results or single views, see `view_key`. Point clouds are stored in the raw
+layout of `exporters`, and the least recently used entries are evicted once the cache grows past its size cap.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+from pxr import UsdUtils
+
+from .exporters import RawWriter, load_raw
+from .pointcloud import PointCloud
+
+CACHE_VERSION = 1
+
+_HASH_CHUNK_SIZE = 1 << 22
+
+
+def asset_dependencies(asset_path: str) -> list:
+    """Paths of the asset, its sublayers, references and payloads, and of the assets like textures they use."""
+    layers, assets, _ = UsdUtils.ComputeAllDependencies(asset_path)
+    paths = [layer.realPath or layer.identifier for layer in layers] + list(assets)
+    return sorted(set(paths)) or [asset_path]
+
+
+def hash_file(path: str) -> str:
+    """Hash of the content of a local file, or of the path itself for files that cannot be read, like URLs."""
+    digest = hashlib.sha256()
+    if not os.path.isfile(path):
+        digest.update(path.encode("utf-8"))
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(asset_digest: str, params: dict) -> str:
+    """Key of the point cloud generated from an asset with the given JSON serializable parameters."""
+    payload = json.dumps({"version": CACHE_VERSION, "asset": asset_digest, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def view_key(asset_digest: str, intrinsics: dict, camera_to_world, params: dict = None) -> str:
+    """Key of the point cloud projected from a single view of an asset.
+
+    Args:
+        asset_digest (str): hash of the asset, see `ResultCache.asset_hash`
+        intrinsics (dict): camera metadata with the focal length and apertures
+        camera_to_world: (4, 4) pose of the camera
+        params (dict, optional): other parameters the view depends on, like the resolution
+    """
+    names = ("focal_length", "horizontal_aperture", "vertical_aperture")
+    view = {
+        "intrinsics": [float(intrinsics[name]) for name in names],
+        # rounded so the float noise of recomputed poses does not change the key, adding 0 turns -0 into 0
+        "pose": (np.round(np.asarray(camera_to_world, dtype=np.float64), 9) + 0.0).tolist(),
+    }
+    return cache_key(asset_digest, dict(params or {}, view=view))
+
+
+class ResultCache:
+    """Point clouds stored on disk under content-addressed keys, evicting the least recently used ones.
+
+    Every `get` refreshes the modification time of the entry it reads, which orders entries by last use.
+    The size of the cache is tracked in memory, so the directory is only listed when an entry is put past
+    the size cap. Hits, misses and evictions are counted in `stats`.
+
+    Example:
+        key = cache.key(asset_path, params)
+        pointcloud = cache.get(key)
+        if pointcloud is None:
+            pointcloud = generate()
+            cache.put(key, pointcloud)
+
+    Args:
+        directory (str): cache directory, created if needed
+        max_bytes (int): size cap of the cache, the most recent entry is always kept
+    """
+
+    suffix = ".pcraw"
+
+    def __init__(self, directory: str, max_bytes: int = 4 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # file hashes by (path, size, mtime), so unchanged files are not read again
+        self._file_hashes = {}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self.entries())
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def asset_hash(self, asset_path: str) -> str:
+        """Hash of the content of an asset and of everything it depends on."""
+        digest = hashlib.sha256()
+        for path in asset_dependencies(asset_path):
+            stat = os.stat(path) if os.path.isfile(path) else None
+            file_id = (path, stat.st_size, stat.st_mtime_ns) if stat else (path,)
+            if file_id not in self._file_hashes:
+                self._file_hashes[file_id] = hash_file(path)
+            digest.update(self._file_hashes[file_id].encode("ascii"))
+        return digest.hexdigest()
+
+    def key(self, asset_path: str, params: dict) -> str:
+        """Key of the point cloud of `asset_path` generated with `params`."""
+        return cache_key(self.asset_hash(asset_path), params)
+
+    def get(self, key: str) -> PointCloud:
+        """Get the point cloud stored under `key`, None on a miss."""
+        path = self.path(key)
+        try:
+            records = load_raw(path, mmap=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return PointCloud(
+            np.stack([records["x"], records["y"], records["z"]], axis=-1),
+            np.stack([records["nx"], records["ny"], records["nz"]], axis=-1),
+            np.stack([records["red"], records["green"], records["blue"]], axis=-1),
+        )
+
+    def put(self, key: str, pointcloud):
+        """Store an (N, 9) array or a `PointCloud` under `key`, then evict entries if over the size cap."""
+        path = self.path(key)
+        # written next to the entry and renamed, so readers never see a partial file
+        partial_path = f"{path}.{os.getpid()}.partial"
+        with RawWriter(partial_path) as writer:
+            writer.write(pointcloud)
+        # an entry put again replaces the previous one
+        if os.path.isfile(path):
+            self._total_bytes -= os.path.getsize(path)
+        os.replace(partial_path, path)
+        self._total_bytes += os.path.getsize(path)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self) -> list:
+        """(path, size, mtime) of the entries, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in `max_bytes`."""
+        entries = self.entries()
+        # also picks up the entries other processes wrote or removed
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+        self._total_bytes = 0
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
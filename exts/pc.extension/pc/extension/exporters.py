@@ -0,0 +1,178 @@
+"""Binary exporters for generated point clouds.
+
+Every exporter writes in chunks so a multi-GB cloud is never duplicated in memory. PLY and raw files
+can also be written incrementally, while views are being generated, since the point count is patched
+in their header on close.
+"""
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+# Record layout shared by the PLY and raw exporters, little endian and without padding
+POINT_DTYPE = np.dtype(
+    [
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("z", "<f4"),
+        ("nx", "<f4"),
+        ("ny", "<f4"),
+        ("nz", "<f4"),
+        ("red", "u1"),
+        ("green", "u1"),
+        ("blue", "u1"),
+    ]
+)
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Raw layout: fixed size header followed by POINT_DTYPE records, meant to be opened with np.memmap
+RAW_MAGIC = b"PCRAW\0"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct("<6sHQQ")  # magic, version, number of points, record size
+RAW_HEADER_SIZE = 64
+
+# Room for the vertex count in the PLY header, so it can be patched once the final count is known
+_PLY_COUNT_WIDTH = 20
+
+
+def to_records(pointcloud) -> np.ndarray:
+    """Convert an (N, 9) array or a `PointCloud` to POINT_DTYPE records."""
+    records = np.empty(len(pointcloud), dtype=POINT_DTYPE)
+    positions, normals, colors = pointcloud[..., 0:3], pointcloud[..., 3:6], pointcloud[..., 6:9]
+    for i, name in enumerate(("x", "y", "z")):
+        records[name] = positions[:, i]
+    for i, name in enumerate(("nx", "ny", "nz")):
+        records[name] = normals[:, i]
+    if colors.dtype != np.uint8:
+        colors = np.clip(np.rint(colors), 0, 255)
+    for i, name in enumerate(("red", "green", "blue")):
+        records[name] = colors[:, i]
+    return records
+
+
+def iter_chunks(pointcloud, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    for start in range(0, len(pointcloud), chunk_size):
+        yield pointcloud[start : start + chunk_size]
+
+
+class _StreamWriter:
+    """Base class of the writers accepting points incrementally."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.n_points = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        raise NotImplementedError
+
+    def write(self, pointcloud, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Append an (N, 9) array or a `PointCloud` to the file."""
+        for chunk in iter_chunks(pointcloud, chunk_size):
+            self._file.write(to_records(chunk).tobytes())
+            self.n_points += len(chunk)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PlyWriter(_StreamWriter):
+    """Write binary little endian PLY files."""
+
+    def _write_header(self):
+        header = (
+            "ply\n"
+            "format binary_little_endian 1.0\n"
+            f"element vertex {self.n_points:<{_PLY_COUNT_WIDTH}d}\n"
+            "property float x\n"
+            "property float y\n"
+            "property float z\n"
+            "property float nx\n"
+            "property float ny\n"
+            "property float nz\n"
+            "property uchar red\n"
+            "property uchar green\n"
+            "property uchar blue\n"
+            "end_header\n"
+        )
+        self._file.write(header.encode("ascii"))
+
+
+class RawWriter(_StreamWriter):
+    """Write the raw memory mappable layout, see `load_raw`."""
+
+    def _write_header(self):
+        header = RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, self.n_points, POINT_DTYPE.itemsize)
+        self._file.write(header.ljust(RAW_HEADER_SIZE, b"\0"))
+
+
+def load_raw(path: str, mmap: bool = True) -> np.ndarray:
+    """Load a raw point cloud file as POINT_DTYPE records, memory mapped by default."""
+    with open(path, "rb") as f:
+        magic, version, n_points, record_size = RAW_HEADER.unpack(f.read(RAW_HEADER.size))
+    if magic != RAW_MAGIC or version != RAW_VERSION or record_size != POINT_DTYPE.itemsize:
+        raise ValueError(f"'{path}' is not a raw point cloud file")
+    if mmap:
+        return np.memmap(path, dtype=POINT_DTYPE, mode="r", offset=RAW_HEADER_SIZE, shape=(n_points,))
+    return np.fromfile(path, dtype=POINT_DTYPE, count=n_points, offset=RAW_HEADER_SIZE)
+
+
+def export_npz(path: str, pointcloud, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Write `positions`, `normals` and `colors` arrays to an uncompressed .npz, one chunk at a time."""
+    fields = (("positions", 0, np.float32), ("normals", 3, np.float32), ("colors", 6, np.uint8))
+    n_points = len(pointcloud)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, start, dtype in fields:
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+                header = {"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (n_points, 3)}
+                np.lib.format.write_array_header_1_0(f, header)
+                for chunk in iter_chunks(pointcloud, chunk_size):
+                    values = chunk[..., start : start + 3]
+                    if dtype == np.uint8 and values.dtype != np.uint8:
+                        values = np.clip(np.rint(values), 0, 255)
+                    f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+WRITERS = {".ply": PlyWriter, ".pcraw": RawWriter}
+
+
+def get_file_format(path: str, file_format: str = None) -> str:
+    file_format = file_format or os.path.splitext(path)[1]
+    file_format = file_format.lower()
+    if not file_format.startswith("."):
+        file_format = f".{file_format}"
+    if file_format not in (*WRITERS, ".npz"):
+        raise ValueError(f"Unsupported point cloud format: '{file_format}'")
+    return file_format
+
+
+def open_writer(path: str, file_format: str = None) -> _StreamWriter:
+    """Open a writer accepting points incrementally. Only formats with a patchable header are supported."""
+    file_format = get_file_format(path, file_format)
+    if file_format not in WRITERS:
+        raise ValueError(f"'{file_format}' files cannot be written incrementally")
+    return WRITERS[file_format](path)
+
+
+def export_pointcloud(path: str, pointcloud, file_format: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Export an (N, 9) array or a `PointCloud` to .ply, .npz or .pcraw, inferred from the path by default."""
+    file_format = get_file_format(path, file_format)
+    if file_format == ".npz":
+        export_npz(path, pointcloud, chunk_size)
+        return
+    with open_writer(path, file_format) as writer:
+        writer.write(pointcloud, chunk_size)
@@ -0,0 +1,250 @@
+"""Outlier removal of the stray points back-projected from mask edges and depth discontinuities.
+"""
+import numpy as np
+
+# Offsets of the 27 cells around and including a cell
+_NEIGHBOR_OFFSETS = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing="ij"), -1).reshape(-1, 3)
+
+
+class SpatialHash:
+    """Uniform grid over points, sorted by cell so the points of a cell are contiguous.
+
+    Neighbors are searched in the 27 cells around the cell of a query point, so queries are exact for
+    distances up to `cell_size`. Queries work on the sorted points, which keeps memory accesses local,
+    `order` maps them back to the input order.
+
+    Args:
+        points (np.ndarray): (N, 3) positions
+        cell_size (float): edge length of the cells
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float):
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        if self.cell_size <= 0:
+            raise ValueError(f"Cell size must be positive, got {cell_size}")
+
+        cells = np.floor((self.points - self.points.min(axis=0, initial=0)) / self.cell_size)
+        # one cell of margin on every side, so that neighbor keys never wrap around
+        dims = cells.max(axis=0, initial=0) + 3
+        # cell keys are packed in int64, larger grids would make distinct cells collide
+        if float(np.prod(dims)) >= np.iinfo(np.int64).max:
+            raise ValueError(f"Cell size {cell_size} is too small for the extent of the point cloud")
+        cells = cells.astype(np.int64)
+        self._dims = dims.astype(np.int64)
+        self._keys = self._pack(cells + 1)
+        self.order = np.argsort(self._keys)
+        self._keys = self._keys[self.order]
+        # one contiguous array per axis makes the gathers of the distance computations cheaper
+        self._sorted_axes = [np.ascontiguousarray(self.points[self.order, axis]) for axis in range(3)]
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            self._keys, return_index=True, return_counts=True
+        )
+        self._offsets = self._pack(_NEIGHBOR_OFFSETS)
+
+    def __len__(self):
+        return self.points.shape[0]
+
+    def _pack(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[..., 0] * self._dims[1] + cells[..., 1]) * self._dims[2] + cells[..., 2]
+
+    def _neighbor_cells(self, queries: np.ndarray):
+        """(Q, 27) start index and point count of the cells around every query, all in sorted order."""
+        keys = self._keys[queries][:, None] + self._offsets[None, :]
+        pos = np.minimum(np.searchsorted(self.cell_keys, keys), self.cell_keys.shape[0] - 1)
+        found = self.cell_keys[pos] == keys
+        return self.cell_starts[pos], np.where(found, self.cell_counts[pos], 0)
+
+    def iter_pairs(self, max_pairs: int = 1 << 22, queries: np.ndarray = None):
+        """Yield (query, candidate) pairs of every point, or of `queries`, with every other point of its 27 cells.
+
+        Indices are positions in the points sorted by cell, `queries` too, in increasing order. Pairs come grouped
+        by query in increasing order, in chunks of about `max_pairs` pairs, or the pairs of a single query when it
+        has more. Without `queries`, the queries of a chunk are a contiguous range.
+        """
+        if queries is None:
+            queries = np.arange(len(self))
+        # bound the (Q, 27) temporaries of the candidate lookup too
+        query_chunk = max(max_pairs // 27, 1)
+        for chunk_start in range(0, queries.shape[0], query_chunk):
+            chunk = queries[chunk_start : chunk_start + query_chunk]
+            starts, counts = self._neighbor_cells(chunk)
+            per_query = counts.sum(axis=1)
+            bounds = np.cumsum(per_query)
+            first = 0
+            while first < chunk.shape[0]:
+                base = bounds[first - 1] if first else 0
+                last = max(int(np.searchsorted(bounds, base + max_pairs, side="right")), first + 1)
+                yield self._expand(chunk[first:last], starts[first:last], counts[first:last])
+                first = last
+
+    def _expand(self, queries: np.ndarray, starts: np.ndarray, counts: np.ndarray):
+        flat_counts = counts.reshape(-1)
+        query_idx = np.repeat(np.repeat(queries, starts.shape[1]), flat_counts)
+        run_starts = np.repeat(starts.reshape(-1), flat_counts)
+        local = np.arange(query_idx.shape[0]) - np.repeat(np.cumsum(flat_counts) - flat_counts, flat_counts)
+        candidates = run_starts + local
+        others = candidates != query_idx
+        return query_idx[others], candidates[others]
+
+    def distances(self, queries: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Distances between pairs of sorted points."""
+        squared = np.zeros(queries.shape[0])
+        for coords in self._sorted_axes:
+            delta = coords[queries] - coords[candidates]
+            squared += delta * delta
+        return np.sqrt(squared, out=squared)
+
+
+def estimate_cell_size(points: np.ndarray, points_per_cell: float) -> float:
+    """Cell size at which occupied cells hold about `points_per_cell` points, assuming points lie on surfaces."""
+    points = np.asarray(points, dtype=np.float64)
+    extent = float(np.ptp(points, axis=0).max()) if points.shape[0] else 0.0
+    if extent == 0:
+        return 1.0
+    cell_size = extent / np.sqrt(points.shape[0])
+    # refine from the actual occupancy, which grows with the square of the cell size on a surface
+    for _ in range(2):
+        grid = SpatialHash(points, cell_size)
+        occupancy = points.shape[0] / grid.cell_keys.shape[0]
+        cell_size *= np.sqrt(points_per_cell / occupancy)
+    return float(cell_size)
+
+
+def radius_neighbor_counts(points: np.ndarray, radius: float, max_pairs: int = 1 << 22) -> np.ndarray:
+    """(N,) number of other points within `radius` of every point."""
+    grid = SpatialHash(points, radius)
+    counts = np.zeros(len(grid), dtype=np.int64)
+    for queries, candidates in grid.iter_pairs(max_pairs):
+        if queries.shape[0] == 0:
+            continue
+        # queries of a chunk are a contiguous range
+        first = queries[0]
+        within = grid.distances(queries, candidates) <= radius
+        chunk_counts = np.bincount(queries[within] - first)
+        counts[first : first + chunk_counts.shape[0]] += chunk_counts
+    # back to the input order
+    counts[grid.order] = counts.copy()
+    return counts
+
+
+def mean_knn_distances(
+    points: np.ndarray, k: int, cell_size: float = None, max_pairs: int = 1 << 22
+) -> np.ndarray:
+    """(N,) mean distance of every point to its `k` nearest neighbors.
+
+    Neighbors are searched within the 27 cells of a spatial hash, so the distances are exact for points
+    whose k-th neighbor is closer than the cell size. Points with fewer than `k` candidates are searched
+    again with cells twice as large, until the cells span the whole cloud. Points that still have fewer
+    than `k` other points get the mean distance to the ones they have, and an infinite one without any.
+
+    Args:
+        points (np.ndarray): (N, 3) positions
+        k (int): number of neighbors
+        cell_size (float, optional): cell size of the hash, estimated to hold about k points per cell if not set
+        max_pairs (int): maximum number of candidate pairs evaluated at once
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if cell_size is None:
+        # the k-th neighbor of a point on a surface is closer than the cell size with half as many points per cell
+        cell_size = estimate_cell_size(points, k / 2)
+    n_points = points.shape[0]
+    extent = float(np.ptp(points, axis=0).max()) if n_points else 0.0
+    means = np.full(n_points, np.inf)
+    remaining = np.arange(n_points)
+    while remaining.shape[0]:
+        grid = SpatialHash(points, cell_size)
+        # with cells as large as the cloud, the 27 cells around any point hold every other point
+        last_ring = cell_size >= extent
+        sorted_positions = np.empty(n_points, dtype=np.intp)
+        sorted_positions[grid.order] = np.arange(n_points)
+        for queries, candidates in grid.iter_pairs(max_pairs, np.sort(sorted_positions[remaining])):
+            if queries.shape[0] == 0:
+                continue
+            distances = grid.distances(queries, candidates)
+            # pairs are grouped by query
+            group_starts = np.concatenate([[0], np.flatnonzero(queries[1:] != queries[:-1]) + 1])
+            group_counts = np.diff(np.append(group_starts, queries.shape[0]))
+            query_ids = queries[group_starts]
+            local = np.repeat(np.arange(query_ids.shape[0]), group_counts)
+            rank = np.arange(queries.shape[0]) - np.repeat(group_starts, group_counts)
+            width = int(group_counts.max())
+            if query_ids.shape[0] * width <= 4 * max_pairs:
+                # candidates of every query in a row padded with inf, partially sorted up to the k-th
+                dense = np.full((query_ids.shape[0], max(width, k)), np.inf)
+                dense[local, rank] = distances
+                nearest = np.partition(dense, k - 1, axis=1)[:, :k]
+                sums = np.where(np.isfinite(nearest), nearest, 0).sum(axis=1)
+            else:
+                # a few dense cells would make the padded rows too large, sort the pairs on (query, distance),
+                # candidates are less than 2 * sqrt(3) cells away
+                order = np.argsort(local * 4 + distances / (cell_size * np.sqrt(3)))
+                sums = np.add.reduceat(np.where(rank < k, distances[order], 0), group_starts)
+            n_nearest = np.minimum(group_counts, k)
+            done = n_nearest == k if not last_ring else n_nearest > 0
+            means[grid.order[query_ids[done]]] = sums[done] / n_nearest[done]
+        if last_ring:
+            break
+        remaining = remaining[np.isinf(means[remaining])]
+        cell_size *= 2
+    return means
+
+
+class OutlierFilter:
+    """Remove isolated points, with a statistical filter followed by a radius filter.
+
+    The statistical filter drops points whose mean distance to their `nb_neighbors` nearest neighbors is
+    above the average by more than `std_ratio` standard deviations, points without any other point to
+    measure it are kept. The radius filter drops points with fewer than `min_neighbors` other points within
+    `radius`. Either one is disabled by leaving `nb_neighbors` or `radius` unset. The number of points each
+    filter removed is kept in `stats`.
+
+    Args:
+        nb_neighbors (int, optional): number of neighbors of the statistical filter
+        std_ratio (float): standard deviations above the mean kNN distance at which points are dropped
+        radius (float, optional): radius of the radius filter
+        min_neighbors (int): minimum number of neighbors within `radius`
+        max_pairs (int): maximum number of candidate pairs evaluated at once, bounds the memory used
+    """
+
+    def __init__(
+        self,
+        nb_neighbors: int = 16,
+        std_ratio: float = 2.0,
+        radius: float = None,
+        min_neighbors: int = 4,
+        max_pairs: int = 1 << 22,
+    ):
+        self.nb_neighbors = nb_neighbors
+        self.std_ratio = std_ratio
+        self.radius = radius
+        self.min_neighbors = min_neighbors
+        self.max_pairs = max_pairs
+        self.stats = {}
+
+    def statistical_mask(self, points: np.ndarray) -> np.ndarray:
+        means = mean_knn_distances(points, self.nb_neighbors, max_pairs=self.max_pairs)
+        finite = np.isfinite(means)
+        if not finite.any():
+            # no statistics to compare the points with, keep them all
+            return np.ones(means.shape[0], dtype=bool)
+        threshold = means[finite].mean() + self.std_ratio * means[finite].std()
+        # points without any neighbor to measure are left to the radius filter
+        return ~finite | (means <= threshold)
+
+    def radius_mask(self, points: np.ndarray) -> np.ndarray:
+        return radius_neighbor_counts(points, self.radius, self.max_pairs) >= self.min_neighbors
+
+    def apply(self, pointcloud):
+        """Filter an (N, 9) array or a `PointCloud`, returning the kept points in their original order."""
+        self.stats = {"input": len(pointcloud)}
+        if self.nb_neighbors and len(pointcloud) > 0:
+            keep = self.statistical_mask(pointcloud[..., 0:3])
+            self.stats["statistical"] = int(len(pointcloud) - keep.sum())
+            pointcloud = pointcloud[keep]
+        if self.radius and len(pointcloud) > 0:
+            keep = self.radius_mask(pointcloud[..., 0:3])
+            self.stats["radius"] = int(len(pointcloud) - keep.sum())
+            pointcloud = pointcloud[keep]
+        self.stats["output"] = len(pointcloud)
+        return pointcloud
@@ -0,0 +1,108 @@
+"""Voxel-grid fusion of the overlapping views into a single deduplicated point cloud.
+"""
+import numpy as np
+
+# Voxel coordinates are packed into a single int64 key, 21 bits per axis
+_KEY_BITS = 21
+_KEY_OFFSET = 1 << (_KEY_BITS - 1)
+_KEY_MASK = (1 << _KEY_BITS) - 1
+
+
+def resolve_voxel_size(voxel_size: float = None, relative_voxel_size: float = None, bounds_size=None) -> float:
+    """Get the absolute voxel size to fuse with.
+
+    Args:
+        voxel_size (float, optional): absolute voxel size, takes precedence when set
+        relative_voxel_size (float, optional): voxel size as a fraction of the asset bounds diagonal
+        bounds_size (tuple, optional): size of the asset bounds, required with `relative_voxel_size`
+
+    Returns:
+        float: voxel size, or None if fusion is disabled
+    """
+    if voxel_size:
+        return float(voxel_size)
+    if relative_voxel_size:
+        if bounds_size is None:
+            raise ValueError("Asset bounds are required to use a relative voxel size")
+        return float(relative_voxel_size * np.linalg.norm(np.asarray(bounds_size, dtype=np.float64)))
+    return None
+
+
+def voxel_keys(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """Quantize positions to a voxel grid anchored at the origin and pack the voxel coordinates in int64 keys."""
+    ijk = np.floor(points[:, :3] / voxel_size).astype(np.int64) + _KEY_OFFSET
+    if ijk.size and (ijk.min() < 0 or ijk.max() > _KEY_MASK):
+        raise ValueError(f"Voxel size {voxel_size} is too small for the extent of the point cloud")
+    return (ijk[:, 0] << (2 * _KEY_BITS)) | (ijk[:, 1] << _KEY_BITS) | ijk[:, 2]
+
+
+def _reduce(keys: np.ndarray, sums: np.ndarray, counts: np.ndarray):
+    """Merge rows sharing the same key by adding their sums and counts."""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    merged_sums = np.empty((unique_keys.shape[0], sums.shape[1]))
+    for c in range(sums.shape[1]):
+        merged_sums[:, c] = np.bincount(inverse, weights=sums[:, c], minlength=unique_keys.shape[0])
+    merged_counts = np.bincount(inverse, weights=counts, minlength=unique_keys.shape[0]).astype(np.int64)
+    return unique_keys, merged_sums, merged_counts
+
+
+def _finalize(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Turn per voxel sums into averaged positions, normals and colors."""
+    pointcloud = sums / counts[:, None]
+    normals = pointcloud[:, 3:6]
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, norm, out=normals, where=norm > 0)
+    return pointcloud
+
+
+def voxel_downsample(pointcloud: np.ndarray, voxel_size: float) -> np.ndarray:
+    """Average all the points falling in the same voxel.
+
+    Args:
+        pointcloud (np.ndarray): (N, 9) array with positions, normals and rgb
+        voxel_size (float): edge length of the voxels
+
+    Returns:
+        np.ndarray: (M, 9) array with one point per occupied voxel
+    """
+    if pointcloud.shape[0] == 0:
+        return pointcloud
+    keys = voxel_keys(pointcloud, voxel_size)
+    _, sums, counts = _reduce(keys, pointcloud, np.ones(keys.shape[0]))
+    return _finalize(sums, counts)
+
+
+class VoxelGridFusion:
+    """Streaming voxel-grid fusion, each view is merged into the grid as soon as it is projected.
+
+    Only per voxel sums are kept, so the full raw point cloud never exists in memory at once.
+    """
+
+    def __init__(self, voxel_size: float):
+        self.voxel_size = voxel_size
+        self.n_points_in = 0
+        self._keys = np.empty(0, dtype=np.int64)
+        self._sums = np.empty((0, 9))
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self._keys.shape[0]
+
+    def add(self, pointcloud: np.ndarray):
+        """Merge an (N, 9) point cloud into the grid."""
+        if pointcloud.shape[0] == 0:
+            return
+        self.n_points_in += pointcloud.shape[0]
+        keys = voxel_keys(pointcloud, self.voxel_size)
+        self._keys, self._sums, self._counts = _reduce(
+            np.concatenate([self._keys, keys]),
+            np.concatenate([self._sums, pointcloud], axis=0),
+            np.concatenate([self._counts, np.ones(keys.shape[0], dtype=np.int64)]),
+        )
+
+    def get_pointcloud(self) -> np.ndarray:
+        """Get the fused (M, 9) point cloud."""
+        if len(self) == 0:
+            return np.empty((0, 9))
+        return _finalize(self._sums, self._counts)
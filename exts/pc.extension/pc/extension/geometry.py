@@ -0,0 +1,270 @@
+"""USD geometry helpers that only need pxr and numpy, so they also run outside of Kit.
+"""
+import numpy as np
+
+from pxr import Usd, UsdGeom, Vt
+
+
+def get_camera_metadata(camera) -> dict:
+    """Get the intrinsics and camera to world transform of a USD camera prim."""
+    # get some additional camera attributes
+    camera_attributes = camera.GetPropertyNames()
+    # get camera metadata
+    metadata = {
+        "clipping_range": np.array(camera.GetAttribute("clippingRange").Get()),
+        "focal_length": camera.GetAttribute("focalLength").Get(),
+        "horizontal_aperture": camera.GetAttribute("horizontalAperture").Get(),
+        "vertical_aperture": camera.GetAttribute("verticalAperture").Get(),
+        "local_to_world_tf": np.array(UsdGeom.Imageable(camera).ComputeLocalToWorldTransform(0.0)),
+        "prim_path": str(camera.GetPath()),
+    }
+    # > camera tags NOTE: this is for drivesim (might not be generic)
+    if "searchTags" in camera_attributes:
+        metadata["searchTags"] = [t.strip() for t in str(camera.GetAttribute("searchTags").Get()).split(",")]
+
+    return metadata
+
+
+def triangulate_faces(face_vertex_counts: np.ndarray):
+    """Fan triangulate polygons.
+
+    Args:
+        face_vertex_counts (np.ndarray): number of vertices of every face
+
+    Returns:
+        tuple: (T,) face index of every triangle and (T, 3) face-vertex indices of its corners, that is
+            indices into the mesh `faceVertexIndices`
+    """
+    counts = np.asarray(face_vertex_counts, dtype=np.int64)
+    face_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    tris_per_face = np.maximum(counts - 2, 0)
+    face_idx = np.repeat(np.arange(counts.shape[0]), tris_per_face)
+
+    tri_starts = np.concatenate([[0], np.cumsum(tris_per_face)[:-1]])
+    k = np.arange(face_idx.shape[0]) - tri_starts[face_idx]
+    first = face_starts[face_idx]
+    corners = np.stack([first, first + k + 1, first + k + 2], axis=1)
+    return face_idx, corners
+
+
+def _expand_primvar(values, interpolation, face_idx, corners, face_vertex_indices):
+    """Get the (T, 3, C) per-corner values of a primvar, None if it cannot be mapped on the triangles."""
+    if values is None or len(values) == 0:
+        return None
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    if interpolation == UsdGeom.Tokens.constant or values.shape[0] == 1:
+        return np.broadcast_to(values[0], corners.shape + values.shape[1:])
+    if interpolation == UsdGeom.Tokens.uniform:
+        return np.repeat(values[face_idx][:, None], 3, axis=1)
+    if interpolation in (UsdGeom.Tokens.vertex, UsdGeom.Tokens.varying):
+        return values[face_vertex_indices[corners]]
+    if interpolation == UsdGeom.Tokens.faceVarying:
+        return values[corners]
+    return None
+
+
+class MeshTriangles:
+    """World-space triangles of every visible `UsdGeom.Mesh` under a prim.
+
+    Attributes:
+        vertices (np.ndarray): (T, 3, 3) corner positions
+        normals (np.ndarray): (T, 3, 3) unit corner normals, geometric normals where none are authored
+        colors (np.ndarray): (T, 3, 3) corner display colors in [0, 1]
+    """
+
+    def __init__(self, vertices: np.ndarray, normals: np.ndarray, colors: np.ndarray):
+        self.vertices = vertices
+        self.normals = normals
+        self.colors = colors
+
+    def __len__(self):
+        return self.vertices.shape[0]
+
+    @property
+    def face_normals(self) -> np.ndarray:
+        """(T, 3) unit geometric normals, zero for degenerate triangles."""
+        normals = np.cross(self.vertices[:, 1] - self.vertices[:, 0], self.vertices[:, 2] - self.vertices[:, 0])
+        norm = np.linalg.norm(normals, axis=1, keepdims=True)
+        return np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+
+    @property
+    def areas(self) -> np.ndarray:
+        edges = np.cross(self.vertices[:, 1] - self.vertices[:, 0], self.vertices[:, 2] - self.vertices[:, 0])
+        return 0.5 * np.linalg.norm(edges, axis=1)
+
+    @classmethod
+    def from_prim(cls, prim, default_color=(0.5, 0.5, 0.5), time=Usd.TimeCode.Default()) -> "MeshTriangles":
+        vertices, normals, colors = [], [], []
+        xform_cache = UsdGeom.XformCache(time)
+        for sub_prim in Usd.PrimRange(prim, Usd.TraverseInstanceProxies()):
+            if not sub_prim.IsA(UsdGeom.Mesh):
+                continue
+            mesh = UsdGeom.Mesh(sub_prim)
+            if UsdGeom.Imageable(sub_prim).ComputeVisibility(time) == UsdGeom.Tokens.invisible:
+                continue
+
+            points = mesh.GetPointsAttr().Get(time)
+            counts = mesh.GetFaceVertexCountsAttr().Get(time)
+            indices = mesh.GetFaceVertexIndicesAttr().Get(time)
+            if not points or not counts or not indices:
+                continue
+            points = np.asarray(points, dtype=np.float64)
+            indices = np.asarray(indices, dtype=np.int64)
+            face_idx, corners = triangulate_faces(counts)
+            if face_idx.shape[0] == 0:
+                continue
+
+            # row-vector convention, as in the rest of the generator
+            local_to_world = np.array(xform_cache.GetLocalToWorldTransform(sub_prim))
+            tri_points = points[indices[corners]] @ local_to_world[:3, :3] + local_to_world[3, :3]
+            vertices.append(tri_points)
+
+            mesh_normals = _expand_primvar(
+                mesh.GetNormalsAttr().Get(time), mesh.GetNormalsInterpolation(), face_idx, corners, indices
+            )
+            if mesh_normals is None:
+                primvar = UsdGeom.PrimvarsAPI(sub_prim).GetPrimvar("normals")
+                if primvar and primvar.HasValue():
+                    mesh_normals = _expand_primvar(
+                        primvar.ComputeFlattened(time), primvar.GetInterpolation(), face_idx, corners, indices
+                    )
+            if mesh_normals is not None:
+                # normals transform with the inverse transpose of the linear part
+                mesh_normals = mesh_normals @ np.linalg.inv(local_to_world[:3, :3]).T
+            normals.append(mesh_normals)
+
+            primvar = mesh.GetDisplayColorPrimvar()
+            mesh_colors = None
+            if primvar and primvar.HasValue():
+                mesh_colors = _expand_primvar(
+                    primvar.ComputeFlattened(time), primvar.GetInterpolation(), face_idx, corners, indices
+                )
+            if mesh_colors is None:
+                mesh_colors = np.broadcast_to(np.asarray(default_color, dtype=np.float64), tri_points.shape)
+            colors.append(np.ascontiguousarray(mesh_colors))
+
+        if not vertices:
+            empty = np.empty((0, 3, 3))
+            return cls(empty, empty, empty)
+
+        triangles = cls(np.concatenate(vertices, axis=0), None, np.concatenate(colors, axis=0))
+        # fill in geometric normals for meshes without authored ones
+        face_normals = triangles.face_normals
+        start = 0
+        for i, mesh_vertices in enumerate(vertices):
+            end = start + mesh_vertices.shape[0]
+            if normals[i] is None:
+                normals[i] = np.repeat(face_normals[start:end, None], 3, axis=1)
+            start = end
+        normals = np.concatenate(normals, axis=0)
+        norm = np.linalg.norm(normals, axis=2, keepdims=True)
+        triangles.normals = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+        return triangles
+
+
+def sample_surface(triangles: MeshTriangles, n_samples: int, seed: int = None) -> np.ndarray:
+    """Draw area-weighted samples on the surface of triangles.
+
+    Args:
+        triangles (MeshTriangles): world-space triangles to sample
+        n_samples (int): number of points to draw
+        seed (int, optional): seed of the random generator
+
+    Returns:
+        np.ndarray: (n_samples, 9) array with positions, interpolated normals and rgb in [0, 255]
+    """
+    areas = triangles.areas
+    total_area = areas.sum()
+    if len(triangles) == 0 or total_area <= 0:
+        return np.empty((0, 9))
+
+    rng = np.random.default_rng(seed)
+    cdf = np.cumsum(areas)
+    tris = np.minimum(np.searchsorted(cdf, rng.random(n_samples) * total_area, side="right"), len(triangles) - 1)
+
+    # uniform barycentric coordinates
+    r1 = np.sqrt(rng.random(n_samples))
+    r2 = rng.random(n_samples)
+    weights = np.stack([1 - r1, r1 * (1 - r2), r1 * r2], axis=1)[:, :, None]
+
+    pointcloud = np.empty((n_samples, 9))
+    pointcloud[:, 0:3] = (triangles.vertices[tris] * weights).sum(axis=1)
+    normals = (triangles.normals[tris] * weights).sum(axis=1)
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    pointcloud[:, 3:6] = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+    pointcloud[:, 6:9] = np.clip((triangles.colors[tris] * weights).sum(axis=1), 0, 1) * 255
+    return pointcloud
+
+
+def author_points(stage, pointcloud, scene_path: str, point_size: float = None):
+    """Author a point cloud as a `UsdGeom.Points` prim.
+
+    Args:
+        stage (Usd.Stage): stage receiving the prim
+        pointcloud: (N, 9) array or `PointCloud` with positions, normals and rgb in [0, 255]
+        scene_path (str): path of the prim
+        point_size (float, optional): width of the points, derived from the bounds and point count if not set
+
+    Returns:
+        UsdGeom.Points: the authored prim
+    """
+    # Vt arrays are built straight from float32 buffers, no-ops for a PointCloud which is already float32
+    points = np.ascontiguousarray(pointcloud[..., :3], dtype=np.float32)
+    normals = np.ascontiguousarray(pointcloud[..., 3:6], dtype=np.float32)
+    rgb = pointcloud[..., 6:]
+
+    points_prim = stage.DefinePrim(scene_path, "Points")
+    geom_points = UsdGeom.Points(points_prim)
+
+    # Calculate default point scale
+    if point_size is None:
+        bounds = points.max(axis=0) - points.min(axis=0)
+        min_bound = np.min(bounds)
+        point_size = (min_bound / points.shape[0] ** (1 / 3)).item()
+
+    # Populate UsdGeomPoints
+    geom_points.GetPointsAttr().Set(Vt.Vec3fArray.FromNumpy(points))
+    # Every point has the same size, author a single constant width
+    geom_points.GetWidthsAttr().Set(Vt.FloatArray([point_size]))
+    geom_points.SetWidthsInterpolation(UsdGeom.Tokens.constant)
+
+    # Set color, normalized straight into a float32 buffer
+    colors = np.empty(points.shape, dtype=np.float32)
+    np.divide(rgb, 255, out=colors, dtype=np.float32)
+    geom_points.GetDisplayColorAttr().Set(Vt.Vec3fArray.FromNumpy(colors))
+
+    # Set normals
+    geom_points.GetNormalsAttr().Set(Vt.Vec3fArray.FromNumpy(normals))
+    return geom_points
+
+
+def author_lod_points(stage, octree, scene_path: str, level: int = None):
+    """Author the levels of an `octree.Octree` as Points prims, switched with a "lod" variant set.
+
+    Level k is authored on `<scene_path>/LOD_k` with the points it adds to the previous levels, and the
+    variant `LOD_k` of the prim at `scene_path` hides the levels finer than k.
+
+    Args:
+        stage (Usd.Stage): stage receiving the prims
+        octree (Octree): octree of the point cloud
+        scene_path (str): path of the parent prim
+        level (int, optional): level selected by default, the finest one if not set
+
+    Returns:
+        Usd.VariantSet: the "lod" variant set
+    """
+    root = UsdGeom.Xform.Define(stage, scene_path).GetPrim()
+    names = [f"LOD_{i}" for i in range(octree.n_levels)]
+    for i, name in enumerate(names):
+        author_points(stage, octree.level_points(i), f"{scene_path}/{name}", point_size=octree.level_spacing(i))
+
+    variant_set = root.GetVariantSets().AddVariantSet("lod")
+    for i, name in enumerate(names):
+        variant_set.AddVariant(name)
+        variant_set.SetVariantSelection(name)
+        with variant_set.GetVariantEditContext():
+            for finer in names[i + 1 :]:
+                UsdGeom.Imageable(stage.GetPrimAtPath(f"{scene_path}/{finer}")).MakeInvisible()
+    if names:
+        variant_set.SetVariantSelection(names[-1 if level is None else min(level, len(names) - 1)])
+    return variant_set
@@ -0,0 +1,234 @@
+"""Octree level of detail hierarchy over a generated point cloud, and its tiled on-disk layout.
+
+Every node keeps a spatially uniform subsample of at most `node_budget` points of its cell, and the
+remaining points are handed down to its children. Showing the nodes of levels 0 to L gives a progressively
+denser cloud, so viewers only load the levels, or the tiles, they need.
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from .exporters import export_pointcloud, get_file_format
+
+# Cell coordinates of a level are packed in an int64 key, 20 bits per axis at most
+MAX_DEPTH = 20
+TILE_INDEX_VERSION = 1
+
+
+def _cells(coords: np.ndarray, level: int) -> np.ndarray:
+    """(N, 3) integer coordinates of the cells of `level` holding normalized coordinates in [0, 1)."""
+    n_cells = 1 << level
+    return np.minimum((coords * n_cells).astype(np.int64), n_cells - 1)
+
+
+def _pack(cells: np.ndarray, level: int) -> np.ndarray:
+    return (cells[:, 0] << (2 * level)) | (cells[:, 1] << level) | cells[:, 2]
+
+
+def _unpack(key: int, level: int) -> tuple:
+    mask = (1 << level) - 1
+    return (key >> (2 * level)) & mask, (key >> level) & mask, key & mask
+
+
+def node_name(level: int, cell: tuple) -> str:
+    """Name of a node, "r" followed by the child index, 0 to 7, taken at every level from the root."""
+    i, j, k = cell
+    digits = [str((((i >> b) & 1) << 2) | (((j >> b) & 1) << 1) | ((k >> b) & 1)) for b in range(level - 1, -1, -1)]
+    return "r" + "".join(digits)
+
+
+class OctreeNode:
+    """A cell of the octree and the slice of `Octree.order` holding its points.
+
+    Attributes:
+        name (str): node name, see `node_name`
+        level (int): depth of the node, 0 for the root
+        cell (tuple): integer coordinates of the node cell at its level
+        start (int): first index of the node points in `Octree.order`
+        count (int): number of points of the node
+        children (list): names of the child nodes
+    """
+
+    __slots__ = ("name", "level", "cell", "start", "count", "children")
+
+    def __init__(self, name: str, level: int, cell: tuple, start: int, count: int):
+        self.name = name
+        self.level = level
+        self.cell = cell
+        self.start = start
+        self.count = count
+        self.children = []
+
+    def __repr__(self):
+        return f"OctreeNode({self.name}, level={self.level}, count={self.count})"
+
+
+class Octree:
+    """Octree built with `Octree.build`.
+
+    Attributes:
+        pointcloud: (N, 9) array or `PointCloud` the octree indexes
+        origin (np.ndarray): minimum corner of the root cube
+        size (float): edge length of the root cube
+        node_budget (int): maximum number of points kept by an inner node
+        nodes (dict): `OctreeNode` by name, parents before children
+        order (np.ndarray): (N,) point indices grouped by node, nodes of a level after the ones of the previous level
+        level_offsets (list): index in `order` of the first point of every level, followed by N
+    """
+
+    def __init__(self, pointcloud, origin, size: float, node_budget: int, nodes: dict, order, level_offsets):
+        self.pointcloud = pointcloud
+        self.origin = origin
+        self.size = size
+        self.node_budget = node_budget
+        self.nodes = nodes
+        self.order = order
+        self.level_offsets = level_offsets
+
+    @classmethod
+    def build(cls, pointcloud, node_budget: int = 65536, max_depth: int = 10) -> "Octree":
+        """Build the octree of a point cloud.
+
+        At every level, the points left are binned in the cells of the level. Cells with at most `node_budget`
+        points keep all of them and become leaves, the others keep the first point of every sub-cell of a
+        finer grid with at most `node_budget` sub-cells, and hand the rest down to the next level.
+
+        Args:
+            pointcloud: (N, 9) array or `PointCloud`
+            node_budget (int): maximum number of points of an inner node
+            max_depth (int): depth of the deepest level, which keeps all its points
+
+        Returns:
+            Octree: the octree, indexing `pointcloud` without copying it
+        """
+        max_depth = min(int(max_depth), MAX_DEPTH)
+        node_budget = max(int(node_budget), 1)
+        positions = np.asarray(pointcloud[..., 0:3], dtype=np.float64)
+        n_points = positions.shape[0]
+        if n_points == 0:
+            return cls(pointcloud, np.zeros(3), 1.0, node_budget, {}, np.empty(0, dtype=np.int64), [0])
+
+        origin = positions.min(axis=0)
+        size = float(np.ptp(positions, axis=0).max()) or 1.0
+        # keep the points on the max faces inside the root cube
+        size *= 1 + 1e-6
+        coords = (positions - origin) / size
+        # levels finer than the node level used to subsample, with at most node_budget sub-cells per node
+        sample_levels = int(math.log2(node_budget) // 3)
+
+        nodes = {}
+        order = []
+        level_offsets = [0]
+        remaining = np.arange(n_points)
+        for level in range(max_depth + 1):
+            if remaining.shape[0] == 0:
+                break
+            keys = _pack(_cells(coords[remaining], level), level)
+            if level == max_depth:
+                take = np.ones(remaining.shape[0], dtype=bool)
+            else:
+                _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+                take = counts[inverse.reshape(-1)] <= node_budget
+                sample_level = min(level + sample_levels, MAX_DEPTH)
+                sample_keys = _pack(_cells(coords[remaining], sample_level), sample_level)
+                take[np.unique(sample_keys, return_index=True)[1]] = True
+
+            taken, taken_keys = remaining[take], keys[take]
+            sort = np.argsort(taken_keys, kind="stable")
+            taken, taken_keys = taken[sort], taken_keys[sort]
+            node_keys, starts, counts = np.unique(taken_keys, return_index=True, return_counts=True)
+            offset = level_offsets[-1]
+            for key, start, count in zip(node_keys.tolist(), starts.tolist(), counts.tolist()):
+                cell = _unpack(key, level)
+                node = OctreeNode(node_name(level, cell), level, cell, offset + start, count)
+                nodes[node.name] = node
+                if level > 0:
+                    nodes[node.name[:-1]].children.append(node.name)
+
+            order.append(taken)
+            level_offsets.append(offset + taken.shape[0])
+            remaining = remaining[~take]
+
+        return cls(pointcloud, origin, size, node_budget, nodes, np.concatenate(order), level_offsets)
+
+    @property
+    def n_levels(self) -> int:
+        return len(self.level_offsets) - 1
+
+    def node_bounds(self, node: OctreeNode) -> tuple:
+        """(min, max) corners of the cell of a node."""
+        cell_size = self.size / (1 << node.level)
+        bounds_min = self.origin + np.asarray(node.cell) * cell_size
+        return bounds_min, bounds_min + cell_size
+
+    def node_points(self, node: OctreeNode):
+        return self.pointcloud[self.order[node.start : node.start + node.count]]
+
+    def level_points(self, level: int):
+        """Points added by `level`, the points of levels 0 to `level` give the cloud at that level of detail."""
+        return self.pointcloud[self.order[self.level_offsets[level] : self.level_offsets[level + 1]]]
+
+    def level_spacing(self, level: int) -> float:
+        """Approximate distance between neighboring points once `level` is shown."""
+        sample_levels = int(math.log2(self.node_budget) // 3)
+        return self.size / (1 << min(level + sample_levels, MAX_DEPTH))
+
+    def select_level(self, distance: float, pixel_angle: float, max_points: int = None) -> int:
+        """Coarsest level whose point spacing is below the footprint of a pixel at `distance`.
+
+        Args:
+            distance (float): distance from the camera to the point cloud
+            pixel_angle (float): angle covered by a pixel, in radians
+            max_points (int, optional): cap on the number of points shown
+
+        Returns:
+            int: level of detail to show
+        """
+        footprint = distance * pixel_angle
+        level = 0
+        while level < self.n_levels - 1 and self.level_spacing(level) > footprint:
+            if max_points is not None and self.level_offsets[level + 2] > max_points:
+                break
+            level += 1
+        return level
+
+
+def export_tiles(octree: Octree, directory: str, file_format: str = ".pcraw") -> dict:
+    """Write every node of an octree to its own file, along with an `index.json` describing the hierarchy.
+
+    Args:
+        octree (Octree): octree to export
+        directory (str): output directory, created if needed
+        file_format (str): format of the tiles, see `exporters.export_pointcloud`
+
+    Returns:
+        dict: the node index
+    """
+    file_format = get_file_format(directory, file_format)
+    os.makedirs(directory, exist_ok=True)
+    index = {
+        "version": TILE_INDEX_VERSION,
+        "format": file_format,
+        "origin": octree.origin.tolist(),
+        "size": octree.size,
+        "node_budget": octree.node_budget,
+        "levels": octree.n_levels,
+        "n_points": int(octree.order.shape[0]),
+        "nodes": {},
+    }
+    for name, node in octree.nodes.items():
+        path = f"{name}{file_format}"
+        export_pointcloud(os.path.join(directory, path), octree.node_points(node), file_format)
+        bounds_min, bounds_max = octree.node_bounds(node)
+        index["nodes"][name] = {
+            "level": node.level,
+            "bounds": [bounds_min.tolist(), bounds_max.tolist()],
+            "count": node.count,
+            "file": path,
+            "children": node.children,
+        }
+    with open(os.path.join(directory, "index.json"), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
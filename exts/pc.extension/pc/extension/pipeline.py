@@ -0,0 +1,279 @@
+"""Asyncio pipeline running the stages of the conversion concurrently, connected by bounded queues.
+
+Every stage runs in its own task and hands its results to the next one through an `asyncio.Queue` of
+`queue_depth` items, so a slow stage makes the stages before it wait instead of piling up frames in memory.
+Each stage reports the occupancy of its input queue, the time it waited for input and the time it was
+blocked on a full output queue: the bottleneck is the stage that is never starved while its upstream
+stages are blocked.
+"""
+import asyncio
+import collections
+import inspect
+import socket
+import struct
+import time
+
+from .exporters import open_writer, to_records
+
+# marks the end of the items in a queue
+_END = object()
+
+
+class StageStats:
+    """Counters of a pipeline stage, see `Pipeline.stats`."""
+
+    __slots__ = ("items", "dropped", "busy", "starved", "blocked", "occupancy", "max_occupancy")
+
+    def __init__(self):
+        self.items = 0
+        self.dropped = 0
+        # seconds spent in the stage function, waiting on the input queue and on the output queue
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        # sum of the input queue sizes seen on every get, and their maximum
+        self.occupancy = 0
+        self.max_occupancy = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "dropped": self.dropped,
+            "busy": self.busy,
+            "starved": self.starved,
+            "blocked": self.blocked,
+            "mean_occupancy": self.occupancy / self.items if self.items else 0.0,
+            "max_occupancy": self.max_occupancy,
+        }
+
+
+class PipelineStage:
+    """A named step of a `Pipeline`.
+
+    Args:
+        name (str): name of the stage in the stats
+        fn (callable): called with every item, returns the item handed to the next stage, or None to drop it.
+            Coroutine functions and functions returning awaitables are awaited.
+        workers (int): number of items processed concurrently, results are still handed on in order.
+            Only useful when `fn` awaits work done elsewhere, like an executor.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(int(workers), 1)
+        self.stats = StageStats()
+
+    async def call(self, item):
+        start = time.perf_counter()
+        try:
+            result = self.fn(item)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            self.stats.busy += time.perf_counter() - start
+
+
+class Pipeline:
+    """Run items through stages connected by bounded queues.
+
+    Example:
+        pipeline = Pipeline(queue_depth=2)
+        pipeline.add_stage("render", render)
+        pipeline.add_stage("project", project)
+        await pipeline.run(views)
+
+    Args:
+        queue_depth (int): capacity of the queues between stages
+    """
+
+    def __init__(self, queue_depth: int = 2):
+        self.queue_depth = max(int(queue_depth), 1)
+        self.stages = []
+        self.source_stats = StageStats()
+        self._in_flight = 0
+        self._idle = None
+
+    def add_stage(self, name: str, fn, workers: int = 1) -> PipelineStage:
+        stage = PipelineStage(name, fn, workers)
+        self.stages.append(stage)
+        return stage
+
+    @property
+    def in_flight(self) -> int:
+        """Number of items taken from the source that did not leave the last stage yet."""
+        return self._in_flight
+
+    async def wait_idle(self):
+        """Wait until every item taken from the source went through all the stages, e.g. to get feedback."""
+        if self._in_flight:
+            await self._idle.wait()
+
+    def _done(self, n: int = 1):
+        self._in_flight -= n
+        if self._in_flight == 0:
+            self._idle.set()
+
+    async def _put(self, queue: asyncio.Queue, item, stats: StageStats):
+        start = time.perf_counter()
+        await queue.put(item)
+        stats.blocked += time.perf_counter() - start
+
+    async def _feed(self, source, outbox: asyncio.Queue):
+        stats = self.source_stats
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                await self._emit(item, outbox, stats)
+        else:
+            for item in source:
+                await self._emit(item, outbox, stats)
+        await self._put(outbox, _END, stats)
+
+    async def _emit(self, item, outbox: asyncio.Queue, stats: StageStats):
+        self._in_flight += 1
+        self._idle.clear()
+        stats.items += 1
+        await self._put(outbox, item, stats)
+
+    async def _run_stage(self, stage: PipelineStage, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        stats = stage.stats
+        pending = collections.deque()
+
+        async def hand_on(future):
+            result = await future
+            if result is None:
+                stats.dropped += 1
+                self._done()
+            elif outbox is None:
+                self._done()
+            else:
+                await self._put(outbox, result, stats)
+
+        get = None
+        try:
+            while True:
+                if get is None:
+                    occupancy = inbox.qsize()
+                    start = time.perf_counter()
+                    handing_on = 0.0
+                    get = asyncio.ensure_future(inbox.get())
+                if pending and not get.done():
+                    # hand on the oldest result if it is ready before the next item comes in
+                    await asyncio.wait((get, pending[0]), return_when=asyncio.FIRST_COMPLETED)
+                    if pending[0].done():
+                        handing_on_start = time.perf_counter()
+                        await hand_on(pending.popleft())
+                        handing_on += time.perf_counter() - handing_on_start
+                        continue
+                item = await get
+                get = None
+                stats.starved += time.perf_counter() - start - handing_on
+                if item is _END:
+                    break
+                stats.items += 1
+                stats.occupancy += occupancy
+                stats.max_occupancy = max(stats.max_occupancy, occupancy)
+                pending.append(asyncio.ensure_future(stage.call(item)))
+                # results are handed on in order, at most `workers` items are processed at once
+                while len(pending) >= stage.workers:
+                    await hand_on(pending.popleft())
+        except BaseException:
+            if get is not None:
+                get.cancel()
+            for future in pending:
+                future.cancel()
+            raise
+        while pending:
+            await hand_on(pending.popleft())
+        if outbox is not None:
+            await self._put(outbox, _END, stats)
+
+    async def run(self, source):
+        """Run every item of `source`, an iterable or an async iterable, through the stages."""
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        queues = [asyncio.Queue(self.queue_depth) for _ in self.stages]
+        tasks = [asyncio.ensure_future(self._feed(source, queues[0]))] if self.stages else []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            tasks.append(asyncio.ensure_future(self._run_stage(stage, queues[i], outbox)))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def stats(self) -> dict:
+        """Counters of the source and of every stage, in order, see `StageStats`."""
+        stats = {"queue_depth": self.queue_depth, "source": self.source_stats.to_dict()}
+        stats["stages"] = {stage.name: stage.stats.to_dict() for stage in self.stages}
+        return stats
+
+
+class PointCloudSink:
+    """Destination of the views merged by the generator, e.g. a file or a socket."""
+
+    def write(self, pointcloud):
+        """Receive the (N, 9) points of a view."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileSink(PointCloudSink):
+    """Stream the views to a .ply or .pcraw file, see `exporters.open_writer`."""
+
+    def __init__(self, path: str, file_format: str = None):
+        self.path = path
+        self.file_format = file_format
+        self._writer = None
+        self.n_points = 0
+
+    def write(self, pointcloud):
+        if self._writer is None:
+            self._writer = open_writer(self.path, self.file_format)
+        self._writer.write(pointcloud)
+        self.n_points = self._writer.n_points
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            print(f"Exported {self.n_points} points to {self.path}")
+
+
+class SocketSink(PointCloudSink):
+    """Send the views over TCP, every view as its number of points, a little endian uint64, followed by its
+    records in the `exporters.POINT_DTYPE` layout. The connection is opened on the first view.
+
+    Args:
+        host (str): host to connect to
+        port (int): port to connect to
+        timeout (float, optional): timeout of the connection and of every send, in seconds
+    """
+
+    header = struct.Struct("<Q")
+
+    def __init__(self, host: str, port: int, timeout: float = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._socket = None
+        self.n_points = 0
+
+    def write(self, pointcloud):
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.sendall(self.header.pack(len(pointcloud)))
+        self._socket.sendall(to_records(pointcloud).tobytes())
+        self.n_points += len(pointcloud)
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,76 @@
+"""Compact storage for generated point clouds.
+"""
+import numpy as np
+
+# Column layout of the dense (N, 9) point cloud arrays used throughout the generator
+FIELDS = {"positions": (0, 3), "normals": (3, 6), "colors": (6, 9)}
+
+
+class PointCloud:
+    """Point cloud stored as a structure of arrays with compact types.
+
+    Positions are float32, normals float16 and colors uint8, which is about 3.5x smaller than the dense
+    float64 (N, 9) layout. Column slices matching a field, like `pointcloud[..., :3]`, return the
+    field itself without copying so code written against the dense layout keeps working.
+    """
+
+    def __init__(self, positions: np.ndarray, normals: np.ndarray, colors: np.ndarray):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32)
+        self.normals = np.ascontiguousarray(normals, dtype=np.float16)
+        if np.asarray(colors).dtype != np.uint8:
+            colors = np.clip(np.rint(colors), 0, 255)
+        self.colors = np.ascontiguousarray(colors, dtype=np.uint8)
+
+        if not self.positions.shape[0] == self.normals.shape[0] == self.colors.shape[0]:
+            raise ValueError("Positions, normals and colors must have the same number of points")
+
+    @classmethod
+    def from_array(cls, pointcloud: np.ndarray) -> "PointCloud":
+        """Build from a dense (N, 9) array with positions, normals and rgb in [0, 255]."""
+        pointcloud = np.asarray(pointcloud)
+        return cls(pointcloud[:, 0:3], pointcloud[:, 3:6], pointcloud[:, 6:9])
+
+    @classmethod
+    def empty(cls) -> "PointCloud":
+        return cls(np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3), dtype=np.uint8))
+
+    def to_array(self, dtype=np.float64) -> np.ndarray:
+        """Get the dense (N, 9) representation."""
+        out = np.empty(self.shape, dtype=dtype)
+        for name, (start, end) in FIELDS.items():
+            out[:, start:end] = getattr(self, name)
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array(dtype or np.float64)
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self), 9)
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.normals.nbytes + self.colors.nbytes
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) and len(key) == 2 else (key, None)
+        if rows is Ellipsis:
+            rows = slice(None)
+
+        if cols is None:
+            return PointCloud(self.positions[rows], self.normals[rows], self.colors[rows])
+
+        if isinstance(cols, slice) and cols.step in (None, 1):
+            start, stop, _ = cols.indices(9)
+            for name, field_range in FIELDS.items():
+                if (start, stop) == field_range:
+                    return getattr(self, name)[rows]
+
+        # Anything not matching a single field falls back to the dense layout
+        return self.to_array()[rows, cols]
+
+    def __repr__(self):
+        return f"PointCloud(n_points={len(self)}, nbytes={self.nbytes})"
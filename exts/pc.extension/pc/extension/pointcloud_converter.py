@@ -1,48 +1,80 @@
 # This file convert USD mesh to USDGeomPoints
 import os
 import math
+import json
 
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import omni.usd
 from omni import ui
 import omni.ext
 import omni.kit
 import carb
 import omni.syntheticdata as syn
-from .syntheticdata_utils import SyntheticDataHelper, SENSORS
+from .syntheticdata_utils import KitGroundTruthSource, SyntheticDataHelper, SensorPlan, SENSORS
 from .utils import async_loading_wrapper, _create_domelight_texture, recreate_stage
-from .utils import get_stage_content, create_prim, get_world_bounds, camera_fit_to_prim
-from .utils import create_viewport
-
-from pxr import Usd, UsdLux, UsdGeom, Vt, Semantics
+from .utils import get_stage_content, create_prim, get_world_bounds
+from .utils import create_viewport, StageReadiness
+from .projection import ProjectionWorkspace, RayDirectionCache, ViewBatch, backproject_view
+from .fusion import VoxelGridFusion, resolve_voxel_size, voxel_downsample
+from .accumulator import PointCloudAccumulator
+from .pointcloud import PointCloud
+from .exporters import export_pointcloud
+from .settling import SettlePolicy
+from .viewpoints import GridSampler, ViewpointSampler, camera_fit, camera_poses
+from .backends import GroundTruthSource, RayCastGroundTruthSource
+from .batch import BatchConverter
+from .geometry import MeshTriangles, author_lod_points, author_points, get_camera_metadata, sample_surface
+from .profiling import Profiler
+from .octree import Octree, export_tiles
+from .cache import view_key
+from .pipeline import FileSink, Pipeline
+
+from pxr import Gf, Usd, UsdLux, UsdGeom, Semantics
 import numpy as np
 
 from PIL import Image
 from omni.kit.widget.viewport import ViewportWidget
+from omni.kit.viewport.utility import get_active_viewport
 # AZIMUTHS and ELEVATIONS for rendering GT images
 AZIMUTHS = [45, 135, 225, 315]
 ELEVATIONS = [-60, 0, 60]
+# Groundtruth fields consumed by the projection
+PROJECTION_FIELDS = ["linear_depth", "normal", "images", "segmentation"]
 
 
 class PointCloudGenerator:
     def __init__(self):
-        self.sd_helper = SyntheticDataHelper()
+        # Span timers of the conversion stages, see `get_run_report`
+        self.profiler = Profiler()
+        # JSON file receiving the run report after every run, not written if unset
+        self.report_path = None
+
+        self.sd_helper = SyntheticDataHelper(self.profiler)
         self.app = omni.kit.app.get_app()
-        self.viewpoints = {"azimuth": AZIMUTHS, "elevation": ELEVATIONS}
+        # ViewpointSampler used to render the asset, a {"azimuth": [...], "elevation": [...]} grid is also accepted
+        self.viewpoints = GridSampler(AZIMUTHS, ELEVATIONS)
         self.asset_status = {}
 
         self.settings_interface = carb.settings.get_settings()
 
+        # waits on the stage being opened and loaded, with the measured wait times
+        self.readiness = StageReadiness()
+
         # Camera parameters
         self.base_fov_multiplier = 0.5
         self.base_camera_distance_multiplier = 1.0
         self.camera_fov_multiplier = 4
 
-        # variable to store pointcloud
+        # variable to store pointcloud, a compact PointCloud once generated
         self.pointcloud = None
 
         # variable to hold the reference of the Usd Mesh
         self.ref = None
+        # path of the referenced asset
+        self.asset_path = None
+        # bounds of the referenced asset, see `get_asset_bounds`
+        self._asset_bounds = None
 
         self.stage = None
 
@@ -57,14 +89,102 @@ class PointCloudGenerator:
 
         self._render_viewport = None
 
+        # per-pixel ray directions, keyed on camera intrinsics
+        self._ray_cache = RayDirectionCache()
+        # buffers of the back-projection, reused between the views of a resolution
+        self._projection_workspace = ProjectionWorkspace()
+
+        # Stack all the views and back-project them once every view is rendered, into a single preallocated output
+        self.batched_projection = False
+        # Back-project each view on worker threads while the next one renders
+        self.pipelined_projection = False
+        self.projection_workers = 2
+        # Views go through the pose, render, project, fuse and sink stages of a `Pipeline`, connected by queues
+        # of this many views, which bounds the frames held in memory
+        self.pipeline_queue_depth = 2
+        # callables applied to the points of every view before they are merged, e.g. to crop them. The result
+        # cache is only used when every filter describes itself with a JSON serializable `params()`, like the
+        # viewpoint samplers do.
+        self.view_filters = []
+        # PointCloudSink receiving the points of every merged view, like a FileSink or a SocketSink. Sinks are
+        # closed at the end of every run.
+        self.sinks = []
+        # queue occupancy and stall times of every stage during the last run
+        self.pipeline_stats = {}
+
+        # Voxel-grid fusion of the overlapping views. Set either an absolute voxel size or one relative to
+        # the asset bounds diagonal, leave both unset to keep every projected point.
+        self.voxel_size = None
+        self.relative_voxel_size = None
+        # Merge each view into the voxel grid as soon as it is projected
+        self.streaming_fusion = False
+
+        # Raw sensor frames are released as soon as they are projected, unless they are explicitly kept
+        self.keep_raw_frames = False
+        self.raw_frames = None
+
+        # Stream the projected views to a .ply or .pcraw file while generating. Fusion, batched projection and
+        # outlier removal need every view first, the file is then written once the cloud is generated.
+        self.stream_export_path = None
+        self._stream_exported = False
+
+        # "render" back-projects rendered views, "mesh_sampling" samples the asset meshes directly without rendering
+        self.generation_mode = "render"
+        # number of points drawn in "mesh_sampling" mode
+        self.sample_count = 1000000
+
+        # Render backend providing the groundtruth: "rtx" for the Kit viewport, "cpu" for the NumPy ray caster,
+        # or any GroundTruthSource
+        self.render_backend = "rtx"
+
+        # Frames are read until the view settles, instead of rendering every view twice
+        self.settle_policy = SettlePolicy()
+        # number of frames each view needed to settle during the last run
+        self.settle_frames = []
+        # stats of the viewpoint sampler for the last run, coverage for adaptive samplers
+        self.viewpoint_stats = {}
+
+        # OutlierFilter removing the flying pixels of mask edges and depth discontinuities, disabled if unset
+        self.outlier_filter = None
+        # number of points removed by each filter during the last run
+        self.outlier_stats = {}
+
+        # ResultCache returning the pointcloud of an unchanged asset generated with the same parameters
+        # without rendering it again, disabled if unset
+        self.result_cache = None
+        # whether the last pointcloud came from the result cache
+        self.cache_hit = False
+        # ResultCache of the projected views, a run only renders the views missing from it, which also lets an
+        # interrupted run resume where it stopped. Disabled if unset.
+        self.view_cache = None
+        # number of views of the last run read from the view cache
+        self.cached_views = 0
+
+        # Author the point cloud as an octree of LOD Points prims with at most this many points per node,
+        # unset to author a single Points prim
+        self.lod_node_budget = None
+        self.lod_max_depth = 10
+        # cap on the points shown by the level selected from the camera distance
+        self.lod_max_points = 5000000
+        # switch the level of detail from the distance of the viewport camera on every app update
+        self.lod_auto_switch = False
+        self.lod_camera_path = "/OmniverseKit_Persp"
+        self.octree = None
+        self._lod_subscription = None
+
     def clean(self):
         """ Clean all the variable to get ready for next point cloud generation.
         """
         self.pointcloud = None
+        self.raw_frames = None
+        self.octree = None
+        self._lod_subscription = None
 
         self.stage = None
 
         self.ref = None
+        self.asset_path = None
+        self._asset_bounds = None
 
     async def set_camera(self, fov_multiplier: float = 0.5):
         self.camera_rig1 = UsdGeom.Xformable(self.stage.DefinePrim("/World/CameraRig1", "Xform"))
@@ -106,8 +226,8 @@ class PointCloudGenerator:
         #         self._render_viewport.set_texture_resolution(self.width_resolution, self.height_resolution)
         #         break
 
-        # Create new viewport and set resolution and active camera
-        if self._render_viewport is None:
+        # Create new viewport and set resolution and active camera, only needed to render with RTX
+        if self._render_viewport is None and self.render_backend == "rtx":
             self.vp_name = "HELLO"
             self.vp_usd_context = ""
             self.__vp_widget = ViewportWidget(usd_context_name=self.vp_usd_context,name=self.vp_name,camera_path="/World/CameraRig1/CameraRig2/Camera",resolution=(self.width_resolution, self.height_resolution))
@@ -122,6 +242,9 @@ class PointCloudGenerator:
             # )
             # self._render_viewport = vp_iface.get_viewport_window(vp_iface.get_instance(viewport_name))
             self._render_viewport = self.__vp_widget
+        elif self._render_viewport is not None:
+            # the viewport is hidden after every generation, show it again when it is reused
+            self._render_viewport.visible = True
 
         # main_viewport_window = ui.Workspace.get_window(self.vp_name)
         # render_viewport_window = ui.Workspace.get_window(viewport_name)
@@ -174,6 +297,8 @@ class PointCloudGenerator:
         """
         await self.get_asset_pointcloud()
         await self.load_pointcloud()
+        if self.report_path:
+            self.write_run_report(self.report_path)
 
     async def generate_pointcloud(self):
         # cache current settings so they can be re-applied later
@@ -186,60 +311,350 @@ class PointCloudGenerator:
 
         camera_distance_multiplier = self.camera_fov_multiplier * self.base_camera_distance_multiplier
 
-        async def render(el, az):
-            # Clear previous transforms
-            self.camera_rig2.ClearXformOpOrder()
-            # update camera view
-            camera_fit_to_prim(self.camera, self.camera_rig1, asset, distance_multiplier=camera_distance_multiplier)
-            # Change azimuth angle
-            if UsdGeom.GetStageUpAxis(self.stage) == "Z":
-                self.camera_rig2.AddRotateZOp().Set(az)
-            else:
-                self.camera_rig2.AddRotateYOp().Set(az)
-            # Change elevation angle
-            self.camera_rig2.AddRotateXOp().Set(el)
+        profiler = self.profiler
+
+        up_axis = UsdGeom.GetStageUpAxis(self.stage)
+        bounds = self.get_asset_bounds(asset)
+        rig_center, camera_offset = camera_fit(bounds.GetMin(), bounds.GetMax(), camera_distance_multiplier)
 
+        # The rig is posed analytically, only the final camera transform is written to USD for every view
+        self.camera_rig1.ClearXformOpOrder()
+        self.camera_rig2.ClearXformOpOrder()
+        camera_transform = UsdGeom.Xformable(self.camera).MakeMatrixXform()
+        # intrinsics do not change between views
+        intrinsics = self.get_camera_metadata(self.camera)
+        poses = {}
+
+        with profiler.span("settings"):
             self.set_default_settings()
-            # help(self.__vp_widget.viewport_api.set_render_product_path)
-            # self.__vp_widget.viewport_api.set_render_product_path="test"
-            print(f"Render product path is {self.__vp_widget.viewport_api.render_product_path}")
-            # return await self.sd_helper.get_groundtruth(self._render_viewport, list(SENSORS.keys()))
-
-            return await self.sd_helper.get_groundtruth(self.__vp_widget.viewport_api, list(SENSORS.keys()))
-
-        output_dict = {f: [] for f in list(SENSORS.values())}
-        pointcloud_list = []
-        # Fit camera to the asset
-        for el in self.viewpoints["elevation"]:
-            for az in self.viewpoints["azimuth"]:
-                print(f"el is {el} and az is {az}")
-                for _ in range(2):
-                    gt = await render(el, az)
-
-                for k in output_dict:
-                    if k in SENSORS.values():
-                        output_dict[k].append(gt[k])
-
-                pointcloud_list.append(
-                    self.get_pointcloud(self.camera, gt["linear_depth"], gt["normal"], gt["images"], gt["segmentation"])
+
+        def pose(index, el, az) -> dict:
+            with profiler.span("camera_fit", view=index):
+                camera_to_world = poses.get((el, az))
+                if camera_to_world is None:
+                    camera_to_world = camera_poses([(el, az)], rig_center, camera_offset, up_axis)[0]
+            return dict(intrinsics, local_to_world_tf=camera_to_world)
+
+        # Only read the sensors the projection needs, unless raw frames are kept
+        sensor_plan = SensorPlan(SENSORS.values() if self.keep_raw_frames else PROJECTION_FIELDS)
+        gt_source = self.get_groundtruth_source(sensor_plan)
+        read = gt_source.get_groundtruth
+        pose_applied = (lambda gt: True) if gt_source.renders_current_pose else None
+
+        usd_context = omni.usd.get_context()
+
+        def is_loading():
+            _, files_loaded, total_files = usd_context.get_stage_loading_status()
+            return files_loaded < total_files
+
+        # Adaptive samplers need every view projected as soon as it is rendered, and cached views are
+        # merged one by one too
+        sampler = self.get_viewpoint_sampler()
+        batched = self.batched_projection and not sampler.adaptive and self.view_cache is None
+
+        view_cache = self.view_cache if self.asset_path else None
+        view_params = {"resolution": [self.height_resolution, self.width_resolution], "backend": self.render_backend}
+        if view_cache is not None:
+            with profiler.span("cache_lookup"):
+                asset_digest = view_cache.asset_hash(self.asset_path)
+            if not isinstance(self.render_backend, str):
+                view_params["backend"] = type(self.render_backend).__name__
+
+        voxel_size = self.get_voxel_size(asset)
+        fusion = None
+        if voxel_size and self.streaming_fusion and not batched:
+            fusion = VoxelGridFusion(voxel_size)
+
+        self.raw_frames = {f: [] for f in sensor_plan.fields} if self.keep_raw_frames else None
+        sinks = list(self.sinks)
+        # views are only streamed when the returned cloud is made of them as they are, so the file matches it
+        self._stream_exported = False
+        if self.stream_export_path:
+            if fusion is None and not batched and not voxel_size and self.outlier_filter is None:
+                sinks.append(FileSink(self.stream_export_path))
+                self._stream_exported = True
+            else:
+                carb.log_warn(
+                    f"Writing {self.stream_export_path} once the cloud is generated instead of streaming the views,"
+                    " fusion, batched projection and outlier removal change the cloud after the views"
                 )
+        accumulator = PointCloudAccumulator(initial_capacity=self.height_resolution * self.width_resolution)
+        sampler.reset(bounds.GetSize(), up_axis)
+        # every camera to world matrix the sampler can ask for, computed at once
+        viewpoints = [tuple(viewpoint) for viewpoint in sampler.viewpoints()]
+        poses.update(zip(viewpoints, camera_poses(viewpoints, rig_center, camera_offset, up_axis)))
+        view_batch = ViewBatch(sampler.max_views)
+
+        # Projecting on worker threads lets the next views render meanwhile
+        workers = self.projection_workers if self.pipelined_projection and not batched else 1
+        executor = None
+        if self.pipelined_projection and not batched:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pc-projection")
+        # Views are projected straight into the accumulator when nothing else needs their points. The points
+        # are then only referenced by rows, since the accumulator buffer moves when it grows.
+        in_place = (
+            not batched
+            and executor is None
+            and fusion is None
+            and view_cache is None
+            and not sinks
+            and not self.view_filters
+        )
+        pipeline = Pipeline(self.pipeline_queue_depth)
+
+        async def views():
+            viewpoint = sampler.next_viewpoint()
+            index = 0
+            while viewpoint is not None:
+                yield {"index": index, "viewpoint": viewpoint}
+                if sampler.adaptive:
+                    # the next viewpoint depends on the views merged so far
+                    await pipeline.wait_idle()
+                viewpoint = sampler.next_viewpoint()
+                index += 1
+
+        def pose_view(view):
+            index = view["index"]
+            view["metadata"] = metadata = pose(index, *view["viewpoint"])
+            if view_cache is not None:
+                with profiler.span("cache_lookup", view=index):
+                    view["key"] = view_key(asset_digest, intrinsics, metadata["local_to_world_tf"], view_params)
+                    # raw frames of cached views are not stored, they have to be rendered again
+                    cached = view_cache.get(view["key"]) if self.raw_frames is None else None
+                if cached is not None:
+                    view["pointcloud"] = cached.to_array()
+            return view
+
+        async def render(view):
+            el, az = view["viewpoint"]
+            print(f"el is {el} and az is {az}")
+            index = view["index"]
+            # views are rendered one after the other, so the readbacks nested in the settle span, which do not
+            # know their view, are reported under the view being rendered
+            profiler.begin_view(index, elevation=el, azimuth=az)
+            if "pointcloud" in view:
+                self.settle_frames.append(0)
+                self.cached_views += 1
+                return view
+
+            with profiler.span("camera_fit", view=index):
+                camera_transform.Set(Gf.Matrix4d(view["metadata"]["local_to_world_tf"].tolist()))
+            with profiler.span("settle", view=index):
+                gt, n_frames = await self.settle_policy.settle(read, is_loading, pose_applied)
+            self.settle_frames.append(n_frames)
+
+            if self.raw_frames is not None:
+                for k in self.raw_frames:
+                    self.raw_frames[k].append(gt[k])
+            view["gt"] = gt
+            return view
+
+        async def project(view):
+            # the frames are released as soon as the view is projected
+            gt = view.pop("gt", None)
+            if gt is None:
+                return view
+            frames = (gt["linear_depth"], gt["normal"], gt["images"], gt["segmentation"])
+            camera_to_world = view["metadata"]["local_to_world_tf"]
+            if batched:
+                view_batch.add(*frames, camera_to_world)
+                return None
+
+            directions = self.get_ray_directions(view["metadata"], gt["linear_depth"].shape[:2])
+            with profiler.span("projection", view=view["index"]):
+                if in_place:
+                    start = len(accumulator)
+                    self._projection_workspace.project(
+                        directions, *frames, camera_to_world, allocate=accumulator.allocate
+                    )
+                    view["rows"] = slice(start, len(accumulator))
+                    return view
+                if executor is None:
+                    pointcloud = self._projection_workspace.project(directions, *frames, camera_to_world)
+                else:
+                    # the workspace cannot be shared by concurrent workers
+                    project_fn = self._projection_workspace.project if workers == 1 else backproject_view
+                    loop = asyncio.get_event_loop()
+                    pointcloud = await loop.run_in_executor(executor, project_fn, directions, *frames, camera_to_world)
+            if view_cache is not None:
+                with profiler.span("cache_store", view=view["index"]):
+                    view_cache.put(view["key"], pointcloud)
+            view["pointcloud"] = pointcloud
+            return view
+
+        def fuse(view):
+            if "rows" in view:
+                # already accumulated by the projection
+                sampler.observe(accumulator.view()[view["rows"]])
+                return view
+            pointcloud = view["pointcloud"]
+            for view_filter in self.view_filters:
+                pointcloud = view_filter(pointcloud)
+            view["pointcloud"] = pointcloud
+            sampler.observe(pointcloud)
+            if fusion is not None:
+                with profiler.span("fusion", view=view["index"]):
+                    fusion.add(pointcloud)
+            else:
+                with profiler.span("accumulate", view=view["index"]):
+                    accumulator.append(pointcloud)
+            return view
+
+        def sink(view):
+            if sinks and "pointcloud" in view:
+                with profiler.span("sink", view=view["index"]):
+                    for view_sink in sinks:
+                        view_sink.write(view["pointcloud"])
+            return view
+
+        pipeline.add_stage("pose", pose_view)
+        pipeline.add_stage("render", render)
+        pipeline.add_stage("project", project, workers=workers)
+        pipeline.add_stage("fuse", fuse)
+        pipeline.add_stage("sink", sink)
+
+        self.settle_frames = []
+        self.cached_views = 0
+        try:
+            await pipeline.run(views())
+        finally:
+            profiler.end_view()
+            if executor is not None:
+                executor.shutdown(wait=True)
+            for view_sink in sinks:
+                view_sink.close()
+        self.pipeline_stats = pipeline.stats()
+        carb.log_info(f"Pipeline: {self.pipeline_stats}")
+
+        self.viewpoint_stats = sampler.stats()
+        carb.log_info(f"Viewpoint sampling: {self.viewpoint_stats}")
         self.restore_settings()
         # self._render_viewport.set_visible(False)  # Hide render viewport
-        self.__vp_widget.visible = False  # Hide render viewport
-        return np.concatenate(pointcloud_list, axis=0)
+        if self._render_viewport is not None:
+            self._render_viewport.visible = False  # Hide render viewport
+
+        carb.log_info(f"Rendered {sum(self.settle_frames)} frames for {len(self.settle_frames)} views")
+        if view_cache is not None:
+            carb.log_info(f"Read {self.cached_views} views from the view cache: {view_cache.stats()}")
+
+        if fusion is not None:
+            carb.log_info(f"Fused {fusion.n_points_in} points into {len(fusion)} voxels")
+            with profiler.span("fusion"):
+                pointcloud = fusion.get_pointcloud()
+            return self.remove_outliers(pointcloud)
+
+        if batched:
+            if not self.settle_frames:
+                return np.empty((0, 9))
+            directions = self.get_ray_directions(intrinsics, view_batch.depths.shape[1:])
+            with profiler.span("projection"):
+                pointcloud = view_batch.backproject(directions)
+        else:
+            pointcloud = accumulator.finalize()
+
+        # stray points would otherwise be fused, exported and authored too
+        pointcloud = self.remove_outliers(pointcloud)
+
+        if voxel_size:
+            n_points = pointcloud.shape[0]
+            with profiler.span("fusion"):
+                pointcloud = voxel_downsample(pointcloud, voxel_size)
+            carb.log_info(f"Fused {n_points} points into {pointcloud.shape[0]} voxels")
+        return pointcloud
+
+    def remove_outliers(self, pointcloud):
+        """Apply `self.outlier_filter` if set, keeping the number of points each filter removed in `outlier_stats`."""
+        if self.outlier_filter is None:
+            return pointcloud
+        with self.profiler.span("outlier_removal"):
+            pointcloud = self.outlier_filter.apply(pointcloud)
+        self.outlier_stats = dict(self.outlier_filter.stats)
+        carb.log_info(f"Outlier removal: {self.outlier_stats}")
+        return pointcloud
+
+    def sample_pointcloud(self, n_samples: int = None, seed: int = None) -> np.ndarray:
+        """Sample the surface of the meshes referenced under `/World/Object`, without rendering.
+
+        Args:
+            n_samples (int, optional): number of points, `self.sample_count` by default
+            seed (int, optional): seed of the random generator
+
+        Returns:
+            np.ndarray: (N, 9) array with positions, normals and rgb, same layout as `generate_pointcloud`
+        """
+        with self.profiler.span("mesh_sampling"):
+            triangles = MeshTriangles.from_prim(self.ref)
+            carb.log_info(f"Sampling {len(triangles)} triangles")
+            return sample_surface(triangles, n_samples or self.sample_count, seed)
+
+    def get_groundtruth_source(self, sensor_plan: SensorPlan) -> GroundTruthSource:
+        """Get the groundtruth source of `self.render_backend` for the current camera and asset."""
+        if isinstance(self.render_backend, GroundTruthSource):
+            return self.render_backend
+        if self.render_backend == "rtx":
+            # return KitGroundTruthSource(self.sd_helper, self._render_viewport, sensor_plan)
+            return KitGroundTruthSource(self.sd_helper, self.__vp_widget.viewport_api, sensor_plan)
+        if self.render_backend == "cpu":
+            return RayCastGroundTruthSource(self.camera, self.ref, self.width_resolution, self.height_resolution)
+        raise ValueError(f"Unknown render backend: '{self.render_backend}'")
+
+    def get_viewpoint_sampler(self) -> ViewpointSampler:
+        """Get the sampler behind `self.viewpoints`, wrapping azimuth/elevation grids."""
+        if isinstance(self.viewpoints, ViewpointSampler):
+            return self.viewpoints
+        return GridSampler(self.viewpoints["azimuth"], self.viewpoints["elevation"])
+
+    def get_generation_params(self) -> dict:
+        """Parameters the generated pointcloud depends on besides the asset, see `ResultCache`."""
+        params = {"generation_mode": self.generation_mode, "stage_up_axis": self.stage_up_axis}
+        if self.generation_mode == "mesh_sampling":
+            params["sample_count"] = self.sample_count
+        else:
+            backend = self.render_backend
+            params.update(
+                resolution=[self.height_resolution, self.width_resolution],
+                viewpoints=self.get_viewpoint_sampler().params(),
+                fov_multiplier=self.camera_fov_multiplier * self.base_fov_multiplier,
+                distance_multiplier=self.camera_fov_multiplier * self.base_camera_distance_multiplier,
+                render_backend=backend if isinstance(backend, str) else type(backend).__name__,
+            )
+            if self.view_filters:
+                params["view_filters"] = [view_filter.params() for view_filter in self.view_filters]
+        params["voxel_size"] = [self.voxel_size, self.relative_voxel_size]
+        if self.outlier_filter is not None:
+            params["outlier_filter"] = {k: v for k, v in vars(self.outlier_filter).items() if k != "stats"}
+        return params
+
+    def get_voxel_size(self, asset) -> float:
+        """Get the absolute voxel size used to fuse the views, None if fusion is disabled."""
+        bounds_size = None
+        if not self.voxel_size and self.relative_voxel_size:
+            bounds_size = self.get_asset_bounds(asset).GetSize()
+        return resolve_voxel_size(self.voxel_size, self.relative_voxel_size, bounds_size)
+
+    def get_asset_bounds(self, asset) -> Gf.Range3d:
+        """Get the bounds of `asset`, computed once per loaded asset."""
+        if self._asset_bounds is None:
+            self._asset_bounds = get_world_bounds(asset, UsdGeom.BBoxCache(0, [UsdGeom.Tokens.default_])).GetRange()
+        return self._asset_bounds
 
     async def initialize_stage(self, file_path: str):
+        with self.profiler.span("stage_init"):
+            await self._initialize_stage()
+
+        # Load usd mesh to the scene
+        await self.swap_asset(file_path)
+
+    async def _initialize_stage(self):
         # create a new one
         await omni.usd.get_context().new_stage_async()
 
         self.stage = omni.usd.get_context().get_stage()
+        # sensors are bound to the previous stage
+        self.sd_helper.reset_sensors()
 
         # Create dome light and ground for rendering.
-        for _ in range(10):
-            await self.app.next_update_async()
-        await asyncio.sleep(1)
-        for _ in range(10):
-            await self.app.next_update_async()
+        await self.readiness.wait("initialize_stage")
 
         self.stage_up_axis = UsdGeom.GetStageUpAxis(self.stage)
 
@@ -268,11 +683,29 @@ class PointCloudGenerator:
         sem.GetSemanticTypeAttr().Set("class")
         sem.GetSemanticDataAttr().Set("Target")
 
-        # Load usd mesh to the scene
+    async def swap_asset(self, file_path: str):
+        """Replace the asset referenced on `/World/Object`, keeping the stage, camera rig and sensors.
+        Must be called after `self.initialize_stage`.
+        """
         usd_context = omni.usd.get_context()
+        self.asset_status = {}
 
-        async with async_loading_wrapper(usd_context, status=self.asset_status, mode="event"):
-            self.ref.GetReferences().AddReference(file_path)
+        # spans are reported per asset from here on
+        self.profiler.begin_asset(file_path)
+        with self.profiler.span("asset_load"):
+            async with async_loading_wrapper(usd_context, status=self.asset_status, mode="event"):
+                references = self.ref.GetReferences()
+                references.ClearReferences()
+                references.AddReference(file_path)
+        self.asset_path = file_path
+        self._asset_bounds = None
+
+    async def load_asset(self, file_path: str):
+        """Load an asset, initializing the stage only if it is not the one set up by `initialize_stage`."""
+        if self.stage is None or self.stage != omni.usd.get_context().get_stage() or not self.ref:
+            await self.initialize_stage(file_path)
+        else:
+            await self.swap_asset(file_path)
 
     async def get_asset_pointcloud(self, **kwargs) -> dict:
         """Get the pointcloud of the current loaded
@@ -281,12 +714,99 @@ class PointCloudGenerator:
         Returns:
             dict: dictionary with scene renderings
         """
-        for _ in range(2):
-            await self.app.next_update_async()
-
-        self.pointcloud = await self.generate_pointcloud()
+        cache_key = None
+        self.cache_hit = False
+        self._stream_exported = False
+        use_cache = self.result_cache is not None and self.asset_path
+        if use_cache and self.generation_mode == "render":
+            if not all(hasattr(view_filter, "params") for view_filter in self.view_filters):
+                carb.log_warn(
+                    "Result cache skipped, every view filter needs a params() description to be part of the key"
+                )
+                use_cache = False
+        if use_cache:
+            with self.profiler.span("cache_lookup"):
+                cache_key = self.result_cache.key(self.asset_path, self.get_generation_params())
+                cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                carb.log_info(f"Result cache hit for {self.asset_path}: {self.result_cache.stats()}")
+                self.pointcloud = cached
+                self.cache_hit = True
+                # the views are not generated again, the outputs get the cached cloud in one piece
+                self.write_to_sinks(cached)
+                return
+            carb.log_info(f"Result cache miss for {self.asset_path}")
+
+        await self.readiness.wait("get_asset_pointcloud")
+
+        if self.generation_mode == "mesh_sampling":
+            pointcloud = self.sample_pointcloud()
+        elif self.generation_mode == "render":
+            pointcloud = await self.generate_pointcloud()
+        else:
+            raise ValueError(f"Unknown generation mode: '{self.generation_mode}'")
+        # Store the result compactly, the dense float64 array is only needed while generating
+        self.pointcloud = PointCloud.from_array(pointcloud)
+
+        if cache_key is not None:
+            with self.profiler.span("cache_store"):
+                self.result_cache.put(cache_key, self.pointcloud)
+        if self.stream_export_path and not self._stream_exported:
+            self.export_pointcloud(self.stream_export_path)
         print("Self . pointcloud is ",self.pointcloud)
 
+    def write_to_sinks(self, pointcloud):
+        """Write a whole point cloud to `self.sinks` and to `self.stream_export_path`, then close them."""
+        sinks = list(self.sinks)
+        if self.stream_export_path:
+            sinks.append(FileSink(self.stream_export_path))
+        try:
+            with self.profiler.span("sink"):
+                for sink in sinks:
+                    sink.write(pointcloud)
+        finally:
+            for sink in sinks:
+                sink.close()
+
+    async def convert_batch(self, asset_paths, output_dir: str, file_format: str = ".ply", manifest_path: str = None):
+        """Convert many assets to point cloud files, see `BatchConverter`."""
+        converter = BatchConverter(self, output_dir, file_format=file_format, manifest_path=manifest_path)
+        return await converter.run(asset_paths)
+
+    def export_pointcloud(self, path: str, file_format: str = None):
+        """Export the generated pointcloud to a binary file.
+
+        Args:
+            path (str): output file path
+            file_format (str, optional): one of ".ply", ".npz" or ".pcraw", inferred from `path` if not set
+        """
+        if self.pointcloud is None:
+            raise RuntimeError("No pointcloud to export, generate one with `get_asset_pointcloud` first")
+        with self.profiler.span("export"):
+            export_pointcloud(path, self.pointcloud, file_format)
+
+    def get_run_report(self) -> dict:
+        """Time spent in every stage of the conversion, for the run and per asset and view, see `Profiler.report`."""
+        report = self.profiler.report()
+        report["readiness_waits"] = dict(self.readiness.wait_times)
+        report["settle_frames"] = list(self.settle_frames)
+        report["viewpoints"] = self.viewpoint_stats
+        report["outliers"] = self.outlier_stats
+        report["pipeline"] = self.pipeline_stats
+        if self.result_cache is not None:
+            report["cache"] = dict(self.result_cache.stats(), hit=self.cache_hit)
+        if self.view_cache is not None:
+            report["view_cache"] = dict(self.view_cache.stats(), cached_views=self.cached_views)
+        return report
+
+    def write_run_report(self, path: str) -> dict:
+        """Write `get_run_report` to a JSON file and return it."""
+        report = self.get_run_report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        carb.log_info(f"Wrote run report to {path}")
+        return report
+
     async def load_pointcloud(self):
         """
         Load Pointcloud as UsdGeomPoints into the scene.
@@ -296,43 +816,72 @@ class PointCloudGenerator:
             scale (int): scale to scale up the points for better visualization.
         """
         # Recreate stage
-        for _ in range(10):
-            await self.app.next_update_async()
-        await asyncio.sleep(1)
-        self.stage = await recreate_stage(self.app)
-        for _ in range(10):
-            await self.app.next_update_async()
+        await self.readiness.wait("load_pointcloud")
+        self.stage = await recreate_stage(self.app, self.readiness)
 
         UsdGeom.SetStageUpAxis(self.stage, self.stage_up_axis)
-        self._load_pointcloud(self.stage, self.pointcloud, "/World/Pointcloud")
+        self._lod_subscription = None
+        if self.lod_node_budget:
+            with self.profiler.span("octree"):
+                self.octree = self.get_octree()
+            with self.profiler.span("usd_authoring"):
+                author_lod_points(self.stage, self.octree, "/World/Pointcloud", level=0)
+            carb.log_info(
+                f"Authored {self.octree.n_levels} levels of detail from {len(self.octree.nodes)} octree nodes"
+            )
+            self.update_pointcloud_lod()
+            if self.lod_auto_switch:
+                self._lod_subscription = self.app.get_update_event_stream().create_subscription_to_pop(
+                    lambda _: self.update_pointcloud_lod(), name="pc.extension LOD switching"
+                )
+        else:
+            with self.profiler.span("usd_authoring"):
+                self._load_pointcloud(self.stage, self.pointcloud, "/World/Pointcloud")
 
     def _load_pointcloud(self, stage, pointcloud, scene_path):
-        points = pointcloud[..., :3]
-
-        normals = pointcloud[..., 3:6]
-        rgb = pointcloud[..., 6:]
-
-        points_prim = stage.DefinePrim(scene_path, "Points")
-        geom_points = UsdGeom.Points(points_prim)
+        author_points(stage, pointcloud, scene_path)
 
-        # Calculate default point scale
-        bounds = points.max(axis=0) - points.min(axis=0)
-        min_bound = np.min(bounds)
-        point_size = (min_bound / points.shape[0] ** (1 / 3)).item()
+    def get_octree(self) -> Octree:
+        """Get the octree of the generated pointcloud, built on the first call."""
+        if self.pointcloud is None:
+            raise RuntimeError("No pointcloud, generate one with `get_asset_pointcloud` first")
+        if self.octree is None or self.octree.pointcloud is not self.pointcloud:
+            self.octree = Octree.build(self.pointcloud, self.lod_node_budget or 65536, self.lod_max_depth)
+        return self.octree
 
-        # Generate instancer parameters
-        positions = points.tolist()
-        point_size = [point_size] * points.shape[0]
+    def update_pointcloud_lod(self, scene_path: str = "/World/Pointcloud") -> int:
+        """Select the level of detail of the authored octree from the distance of `self.lod_camera_path`.
 
-        # Populate UsdGeomPoints
-        geom_points.GetPointsAttr().Set(points)
-        geom_points.GetWidthsAttr().Set(Vt.FloatArray(point_size))
-
-        # Set color
-        geom_points.GetDisplayColorAttr().Set(rgb / 255)
+        Returns:
+            int: selected level, None if there is no octree or camera
+        """
+        camera = self.stage.GetPrimAtPath(self.lod_camera_path) if self.stage else None
+        root = self.stage.GetPrimAtPath(scene_path) if self.stage else None
+        if self.octree is None or not camera or not root:
+            return None
 
-        # Set normals
-        geom_points.GetNormalsAttr().Set(normals)
+        metadata = self.get_camera_metadata(camera)
+        center = self.octree.origin + self.octree.size / 2
+        distance = max(float(np.linalg.norm(metadata["local_to_world_tf"][3, :3] - center)), 1e-6)
+        fov = 2 * math.atan(metadata["horizontal_aperture"] / (2 * metadata["focal_length"]))
+        level = self.octree.select_level(distance, fov / self.get_lod_viewport_width(), self.lod_max_points)
+
+        variant_set = root.GetVariantSets().GetVariantSet("lod")
+        if variant_set.GetVariantSelection() != f"LOD_{level}":
+            variant_set.SetVariantSelection(f"LOD_{level}")
+        return level
+
+    def get_lod_viewport_width(self) -> int:
+        """Width in pixels of the active viewport showing the point cloud, the render width if there is none."""
+        viewport = get_active_viewport()
+        if viewport is None:
+            return self.width_resolution
+        return int(viewport.resolution[0])
+
+    def export_pointcloud_tiles(self, directory: str, file_format: str = ".pcraw") -> dict:
+        """Export the octree of the generated pointcloud as one file per node and an `index.json`."""
+        with self.profiler.span("export"):
+            return export_tiles(self.get_octree(), directory, file_format)
 
     def get_pointcloud(
         self,
@@ -344,49 +893,22 @@ class PointCloudGenerator:
         depth_scale: float = 100.0,
     ) -> np.ndarray:
 
-        # Preprocess depth, normals and rgba to binary mask
-        binary_mask = binary_mask.astype(bool)
-        depth[binary_mask == 0] = 0
-        normals[binary_mask == 0] = 0
-        rgba[binary_mask == 0] = 0
-
         metadata = self.get_camera_metadata(camera)
+        directions = self.get_ray_directions(metadata, depth.shape[:2])
+        return self._projection_workspace.project(
+            directions, depth, normals, rgba, binary_mask, metadata["local_to_world_tf"], depth_scale=depth_scale
+        )
 
-        height, width = depth.shape[:2]
-        mask = (depth != 0).reshape(-1)
-        fov_h = 2 * np.arctan(metadata["horizontal_aperture"] / metadata["focal_length"] / 2)
-        alpha_h = (np.pi - fov_h) / 2
-        ii, jj = np.meshgrid(np.arange(width)[::-1], np.arange(height), indexing="xy")
-        gamma_h = alpha_h + ii * fov_h / width
-        x = depth.reshape(-1, 1)[mask] / np.tan(gamma_h.reshape(-1, 1)[mask])
-        fov_w = 2 * np.arctan(metadata["vertical_aperture"] / metadata["focal_length"] / 2)
-        alpha_w = 2 * np.pi - fov_w / 2
-        gamma_w = alpha_w + jj * fov_w / height
-        y = -depth.reshape(-1, 1)[mask] * np.tan(gamma_w.reshape(-1, 1)[mask])
-        z = -depth.reshape(-1, 1)[mask]
-
-        points_cam = np.concatenate([x, y, z], axis=1) * depth_scale
-        points_world = np.pad(points_cam, ((0, 0), (0, 1)), constant_values=1) @ metadata["local_to_world_tf"]
-        normals = normals.reshape(-1, 3)[mask]
-        rgb = rgba.reshape(-1, 4)[mask][:, :3]
-        pointcloud = np.concatenate([points_world[..., :3], normals, rgb], axis=1)
-
-        return pointcloud
+    def get_ray_directions(self, metadata: dict, shape) -> np.ndarray:
+        """Get the cached (H, W, 3) ray directions of a camera, `shape` being the (H, W) of its frames."""
+        height, width = shape
+        return self._ray_cache.get(
+            width,
+            height,
+            metadata["focal_length"],
+            metadata["horizontal_aperture"],
+            metadata["vertical_aperture"],
+        )
 
     def get_camera_metadata(self, camera) -> dict:
-        # get some additional camera attributes
-        camera_attributes = camera.GetPropertyNames()
-        # get camera metadata
-        metadata = {
-            "clipping_range": np.array(camera.GetAttribute("clippingRange").Get()),
-            "focal_length": camera.GetAttribute("focalLength").Get(),
-            "horizontal_aperture": camera.GetAttribute("horizontalAperture").Get(),
-            "vertical_aperture": camera.GetAttribute("verticalAperture").Get(),
-            "local_to_world_tf": np.array(UsdGeom.Imageable(camera).ComputeLocalToWorldTransform(0.0)),
-            "prim_path": str(camera.GetPath()),
-        }
-        # > camera tags NOTE: this is for drivesim (might not be generic)
-        if "searchTags" in camera_attributes:
-            metadata["searchTags"] = [t.strip() for t in str(camera.GetAttribute("searchTags").Get()).split(",")]
-
-        return metadata
+        return get_camera_metadata(camera)
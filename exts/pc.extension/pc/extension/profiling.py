@@ -0,0 +1,156 @@
+"""Span timers aggregating where the conversion time goes, per view, per asset and for the whole run.
+"""
+import json
+import time
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "view", "start")
+
+    def __init__(self, profiler, name: str, view: int = None):
+        self.profiler = profiler
+        self.name = name
+        self.view = view
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, time.perf_counter() - self.start, self.view)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _add(stats: dict, name: str, elapsed: float):
+    entry = stats.get(name)
+    if entry is None:
+        stats[name] = {"count": 1, "total": elapsed, "min": elapsed, "max": elapsed}
+    else:
+        entry["count"] += 1
+        entry["total"] += elapsed
+        entry["min"] = min(entry["min"], elapsed)
+        entry["max"] = max(entry["max"], elapsed)
+
+
+def _summary(stats: dict) -> dict:
+    return {name: dict(entry, mean=entry["total"] / entry["count"]) for name, entry in stats.items()}
+
+
+def _asset_summary(asset: dict) -> dict:
+    return {"asset": asset["asset"], "spans": _summary(asset["spans"]), "views": asset["views"]}
+
+
+class Profiler:
+    """Collect the time spent in named spans.
+
+    Spans are aggregated for the whole run, for the current asset set with `begin_asset` and per view.
+    Views processed concurrently, like in the stages of a pipeline, pass their view index to `span`. Spans
+    without a view index go to the current view set with `begin_view`. Nested spans are all recorded, so
+    e.g. the sensor readbacks are also part of the settle span wrapping them. A disabled profiler hands out
+    a shared no-op span.
+
+    Example:
+        with profiler.span("projection", view=index):
+            pointcloud = project(...)
+
+    Args:
+        enabled (bool): record spans, when False `span` returns a no-op context manager
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """Drop every recorded span."""
+        self._spans = {}
+        self._assets = []
+        self._asset = None
+        self._views = {}
+        self._view = None
+        self._start = time.time()
+
+    def span(self, name: str, view: int = None):
+        """Context manager timing its body under `name`, and under the view `view`, the current view by default."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, view)
+
+    def record(self, name: str, elapsed: float, view: int = None):
+        """Record `elapsed` seconds spent in `name`, for the view `view`, the current view by default."""
+        if not self.enabled:
+            return
+        _add(self._spans, name, elapsed)
+        if self._asset is not None:
+            _add(self._asset["spans"], name, elapsed)
+        entry = self._view if view is None else self._get_view(view)
+        if entry is not None:
+            entry["spans"][name] = entry["spans"].get(name, 0.0) + elapsed
+
+    def _get_view(self, index: int) -> dict:
+        entry = self._views.get(index)
+        if entry is None:
+            entry = self._views[index] = {"view": index, "spans": {}}
+            if self._asset is not None:
+                self._asset["views"].append(entry)
+        return entry
+
+    def begin_asset(self, asset: str):
+        """Aggregate the next spans under `asset`, until the next call."""
+        self.end_view()
+        self._views = {}
+        if not self.enabled:
+            return
+        self._asset = {"asset": asset, "spans": {}, "views": []}
+        self._assets.append(self._asset)
+
+    def begin_view(self, index: int, **info):
+        """Aggregate the next spans without a view index under the view `index`, until `end_view` is called.
+
+        Args:
+            index (int): index of the view for the current asset
+            info: extra values stored with the view, e.g. its elevation and azimuth
+        """
+        self.end_view()
+        if not self.enabled:
+            return
+        self._view = self._get_view(index)
+        self._view.update(info)
+
+    def end_view(self):
+        self._view = None
+
+    def asset_report(self) -> dict:
+        """Spans of the current asset, None if no asset was started."""
+        if self._asset is None:
+            return None
+        return _asset_summary(self._asset)
+
+    def report(self) -> dict:
+        """Spans of the whole run, with the breakdown per asset and per view."""
+        return {
+            "started": self._start,
+            "enabled": self.enabled,
+            "spans": _summary(self._spans),
+            "assets": [_asset_summary(asset) for asset in self._assets],
+        }
+
+    def write_report(self, path: str) -> dict:
+        """Write `report` to a JSON file and return it."""
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,356 @@
+"""Back-projection helpers used to turn rendered depth frames into camera-space points.
+"""
+import numpy as np
+
+
+def compute_ray_directions(
+    width: int, height: int, focal_length: float, horizontal_aperture: float, vertical_aperture: float
+) -> np.ndarray:
+    """Compute the camera-space ray direction of every pixel.
+
+    Directions are scaled so that their z component is -1, which means multiplying them by the
+    linear depth of a pixel gives its camera-space position directly.
+
+    Args:
+        width (int): image width in pixels
+        height (int): image height in pixels
+        focal_length (float): camera focal length
+        horizontal_aperture (float): camera horizontal aperture
+        vertical_aperture (float): camera vertical aperture
+
+    Returns:
+        np.ndarray: (height, width, 3) array of per-pixel directions
+    """
+    fov_h = 2 * np.arctan(horizontal_aperture / focal_length / 2)
+    alpha_h = (np.pi - fov_h) / 2
+    gamma_h = alpha_h + np.arange(width)[::-1] * fov_h / width
+
+    fov_w = 2 * np.arctan(vertical_aperture / focal_length / 2)
+    alpha_w = 2 * np.pi - fov_w / 2
+    gamma_w = alpha_w + np.arange(height) * fov_w / height
+
+    # The angles only vary along one image axis each, so evaluate them once per row/column
+    directions = np.empty((height, width, 3))
+    directions[..., 0] = (1 / np.tan(gamma_h))[None, :]
+    directions[..., 1] = -np.tan(gamma_w)[:, None]
+    directions[..., 2] = -1
+    return directions
+
+
+class RayDirectionCache:
+    """Keep per-pixel ray directions around for every set of camera intrinsics seen during a run.
+
+    The resolution, focal length and apertures stay fixed across all the views of an asset, so the
+    directions only need to be computed once instead of once per view.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._cache = {}
+
+    def get(
+        self, width: int, height: int, focal_length: float, horizontal_aperture: float, vertical_aperture: float
+    ) -> np.ndarray:
+        """Get the (height, width, 3) ray directions for the given intrinsics, computing them if needed.
+        The returned array is read-only since it is shared between calls.
+        """
+        key = (int(width), int(height), float(focal_length), float(horizontal_aperture), float(vertical_aperture))
+        directions = self._cache.get(key)
+        if directions is None:
+            directions = compute_ray_directions(*key)
+            directions.setflags(write=False)
+            # Drop the oldest entry, intrinsics rarely change within a session
+            if len(self._cache) >= self.max_entries:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = directions
+        return directions
+
+    def clear(self):
+        self._cache.clear()
+
+
+def mask_bounds(mask: np.ndarray) -> tuple:
+    """Bounding rectangle of the non-zero pixels of an (H, W) mask.
+
+    Returns:
+        tuple: (rows, cols) slices cropping the mask to its non-zero pixels, None if the mask is empty
+    """
+    rows = np.flatnonzero(np.any(mask, axis=1))
+    if rows.shape[0] == 0:
+        return None
+    rows = slice(int(rows[0]), int(rows[-1]) + 1)
+    cols = np.flatnonzero(np.any(mask[rows], axis=0))
+    return rows, slice(int(cols[0]), int(cols[-1]) + 1)
+
+
+def backproject_view(
+    directions: np.ndarray,
+    depth: np.ndarray,
+    normals: np.ndarray,
+    rgba: np.ndarray,
+    mask: np.ndarray,
+    local_to_world_tf: np.ndarray,
+    depth_scale: float = 100.0,
+) -> np.ndarray:
+    """Back-project a single view into a world-space point cloud.
+
+    Only the bounding rectangle of the mask is read, the same crop being taken from the ray directions so
+    that pixels keep their directions.
+
+    Args:
+        directions (np.ndarray): (H, W, 3) ray directions, see `compute_ray_directions`
+        depth (np.ndarray): (H, W) linear depth
+        normals (np.ndarray): (H, W, 3) normals
+        rgba (np.ndarray): (H, W, 4) colors
+        mask (np.ndarray): (H, W) object mask, non-zero where the asset is visible
+        local_to_world_tf (np.ndarray): (4, 4) camera to world matrix, row-vector convention
+        depth_scale (float): scale applied to depth before transforming to world space
+
+    Returns:
+        np.ndarray: (N, 9) array with positions, normals and rgb of the valid pixels
+    """
+    height, width = directions.shape[:2]
+    mask = np.asarray(mask).reshape(height, width)
+    roi = mask_bounds(mask)
+    if roi is None:
+        return np.empty((0, 9))
+    depth = depth.reshape(height, width)[roi]
+    valid = (mask[roi] != 0) & (depth != 0)
+    local_to_world_tf = np.asarray(local_to_world_tf)
+
+    points_cam = directions[roi][valid] * (depth[valid] * depth_scale)[:, None]
+    pointcloud = np.empty((points_cam.shape[0], 9))
+    np.matmul(points_cam, local_to_world_tf[:3, :3], out=pointcloud[:, :3])
+    pointcloud[:, :3] += local_to_world_tf[3, :3]
+    pointcloud[:, 3:6] = normals.reshape(height, width, 3)[roi][valid]
+    pointcloud[:, 6:9] = rgba.reshape(height, width, -1)[roi][valid, :3]
+    return pointcloud
+
+
+class ProjectionWorkspace:
+    """Buffers reused across the views of a resolution, so that `project` barely allocates per view.
+
+    Every buffer holds a full frame of pixels and is allocated on first use, then sliced to the points of
+    each view. The buffers are dropped when the resolution changes. A workspace is not thread safe, use one
+    per thread.
+    """
+
+    def __init__(self):
+        self.shape = None
+        self._buffers = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def _buffer(self, name: str, n: int, dtype, columns: int = None) -> np.ndarray:
+        """First `n` rows of the buffer `name`, reallocated only for another dtype or number of columns."""
+        dtype = np.dtype(dtype)
+        shape = (self.shape[0] * self.shape[1],) + ((columns,) if columns else ())
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer[:n]
+
+    def project(
+        self,
+        directions: np.ndarray,
+        depth: np.ndarray,
+        normals: np.ndarray,
+        rgba: np.ndarray,
+        mask: np.ndarray,
+        local_to_world_tf: np.ndarray,
+        depth_scale: float = 100.0,
+        out: np.ndarray = None,
+        allocate=None,
+    ) -> np.ndarray:
+        """Back-project a single view like `backproject_view`, writing the points straight into `out`.
+
+        The valid pixels of the mask bounding rectangle are indexed once, then every field is gathered with
+        that index into the workspace or the output, and positions are rotated and translated in place.
+
+        Args:
+            directions, depth, normals, rgba, mask, local_to_world_tf, depth_scale: see `backproject_view`
+            out (np.ndarray, optional): (N, 9) output, N being the number of valid pixels
+            allocate (callable, optional): called with N to get the output instead, e.g.
+                `PointCloudAccumulator.allocate`
+
+        Returns:
+            np.ndarray: (N, 9) array with positions, normals and rgb of the valid pixels
+        """
+        height, width = directions.shape[:2]
+        if self.shape != (height, width):
+            self._buffers.clear()
+            self.shape = (height, width)
+        depth = depth.reshape(height, width)
+        mask = np.asarray(mask).reshape(height, width)
+
+        n_points = 0
+        roi = mask_bounds(mask)
+        if roi is not None:
+            rows, cols = roi
+            crop_height, crop_width = rows.stop - rows.start, cols.stop - cols.start
+            n_pixels = crop_height * crop_width
+            valid = self._buffer("valid", n_pixels, bool).reshape(crop_height, crop_width)
+            nonzero_depth = self._buffer("nonzero_depth", n_pixels, bool).reshape(crop_height, crop_width)
+            np.not_equal(mask[roi], 0, out=valid)
+            np.not_equal(depth[roi], 0, out=nonzero_depth)
+            np.logical_and(valid, nonzero_depth, out=valid)
+            n_points = int(np.count_nonzero(valid))
+
+        if allocate is not None:
+            out = allocate(n_points)
+        elif out is None:
+            out = np.empty((n_points, 9))
+        elif out.shape != (n_points, 9):
+            raise ValueError(f"Output shape {out.shape} does not match the {n_points} valid points")
+        if n_points == 0:
+            return out
+
+        # index of the valid pixels in the crop, shifted to their index in the full frame. It is the only
+        # array allocated per view, NumPy has no way to find non-zero elements into a given buffer.
+        index = np.flatnonzero(valid)
+        row_shift = self._buffer("row_shift", n_points, np.intp)
+        np.floor_divide(index, crop_width, out=row_shift)
+        row_shift *= width - crop_width
+        index += row_shift
+        index += rows.start * width + cols.start
+
+        # mode="clip" lets take write into the buffers directly, the indices are in range anyway
+        scales = self._buffer("depth", n_points, depth.dtype)
+        np.take(depth.reshape(-1), index, out=scales, mode="clip")
+        scales *= depth_scale
+        points_cam = self._buffer("points", n_points, directions.dtype, 3)
+        np.take(directions.reshape(-1, 3), index, axis=0, out=points_cam, mode="clip")
+        points_cam *= scales[:, None]
+
+        local_to_world_tf = np.asarray(local_to_world_tf)
+        np.matmul(points_cam, local_to_world_tf[:3, :3], out=out[:, :3])
+        out[:, :3] += local_to_world_tf[3, :3]
+
+        gathered_normals = self._buffer("normals", n_points, normals.dtype, 3)
+        np.take(normals.reshape(-1, 3), index, axis=0, out=gathered_normals, mode="clip")
+        out[:, 3:6] = gathered_normals
+        gathered_rgba = self._buffer("rgba", n_points, rgba.dtype, rgba.shape[-1])
+        np.take(rgba.reshape(height * width, -1), index, axis=0, out=gathered_rgba, mode="clip")
+        out[:, 6:9] = gathered_rgba[:, :3]
+        return out
+
+
+def backproject_views(
+    directions: np.ndarray,
+    depths: np.ndarray,
+    normals: np.ndarray,
+    rgba: np.ndarray,
+    masks: np.ndarray,
+    local_to_world_tfs: np.ndarray,
+    depth_scale: float = 100.0,
+    out: np.ndarray = None,
+    chunk_size: int = 1 << 20,
+) -> np.ndarray:
+    """Back-project a stack of V views into a single world-space point cloud.
+
+    The ray directions are rotated to every view at once with a stacked (V, H * W, 3) matmul, then the valid
+    pixels of the whole stack are gathered with a single flat index, scaled by their depth and translated to
+    their view. The gathers are run over chunks of that index so that their temporaries stay bounded. Points
+    are in view order and then in pixel order, which matches concatenating the per-view clouds one after the
+    other.
+
+    Args:
+        directions (np.ndarray): (H, W, 3) ray directions shared by all views
+        depths (np.ndarray): (V, H, W) linear depth
+        normals (np.ndarray): (V, H, W, 3) normals
+        rgba (np.ndarray): (V, H, W, 4) colors
+        masks (np.ndarray): (V, H, W) object mask, non-zero where the asset is visible
+        local_to_world_tfs (np.ndarray): (V, 4, 4) camera to world matrices, row-vector convention
+        depth_scale (float): scale applied to depth before transforming to world space
+        out (np.ndarray, optional): preallocated (N, 9) output, N being the number of valid pixels
+        chunk_size (int): number of points processed at a time, bounds the size of temporaries
+
+    Returns:
+        np.ndarray: (N, 9) array with positions, normals and rgb
+    """
+    n_views = depths.shape[0]
+    height, width = directions.shape[:2]
+    n_pixels = height * width
+    depths = depths.reshape(-1)
+    valid = np.asarray(masks).reshape(-1) != 0
+    valid &= depths != 0
+    # index of the valid pixels in the stack, the view of a pixel being its index divided by the frame size
+    index = np.flatnonzero(valid)
+    del valid
+
+    n_points = index.shape[0]
+    if out is None:
+        out = np.empty((n_points, 9))
+    elif out.shape != (n_points, 9):
+        raise ValueError(f"Output shape {out.shape} does not match the {n_points} valid points")
+
+    normals = normals.reshape(-1, 3)
+    rgba = rgba.reshape(n_views * n_pixels, -1)
+    local_to_world_tfs = np.asarray(local_to_world_tfs).reshape(n_views, 4, 4)
+    translations = np.ascontiguousarray(local_to_world_tfs[:, 3, :3])
+    # the ray directions of every view in world orientation, one stacked matmul over the view axis
+    world_directions = np.matmul(directions.reshape(1, n_pixels, 3), local_to_world_tfs[:, :3, :3]).reshape(-1, 3)
+
+    for start in range(0, n_points, chunk_size):
+        chunk = index[start : start + chunk_size]
+        chunk_out = out[start : start + chunk.shape[0]]
+
+        # np.take gathers rows much faster than fancy indexing
+        positions = np.take(world_directions, chunk, axis=0)
+        scales = np.take(depths, chunk)
+        scales *= depth_scale
+        positions *= scales[:, None]
+        positions += np.take(translations, chunk // n_pixels, axis=0)
+        chunk_out[:, :3] = positions
+        chunk_out[:, 3:6] = np.take(normals, chunk, axis=0)
+        chunk_out[:, 6:9] = np.take(rgba, chunk, axis=0)[:, :3]
+    return out
+
+
+class ViewBatch:
+    """Stack the frames of every view so they can be back-projected with `backproject_views` in one go.
+
+    Buffers are allocated on the first added view, once the frame resolution is known.
+    """
+
+    def __init__(self, n_views: int):
+        self.n_views = n_views
+        self.count = 0
+        self.depths = None
+        self.normals = None
+        self.rgba = None
+        self.masks = None
+        self.local_to_world_tfs = np.empty((n_views, 4, 4))
+
+    def add(self, depth: np.ndarray, normals: np.ndarray, rgba: np.ndarray, mask: np.ndarray, local_to_world_tf):
+        if self.count >= self.n_views:
+            raise IndexError(f"ViewBatch is full, it was allocated for {self.n_views} views")
+        if self.depths is None:
+            height, width = depth.shape[:2]
+            self.depths = np.empty((self.n_views, height, width), dtype=depth.dtype)
+            self.normals = np.empty((self.n_views, height, width, 3), dtype=normals.dtype)
+            self.rgba = np.empty((self.n_views, height, width, rgba.shape[-1]), dtype=rgba.dtype)
+            self.masks = np.empty((self.n_views, height, width), dtype=bool)
+
+        self.depths[self.count] = depth.reshape(self.depths.shape[1:])
+        self.normals[self.count] = normals.reshape(self.normals.shape[1:])
+        self.rgba[self.count] = rgba.reshape(self.rgba.shape[1:])
+        self.masks[self.count] = mask.reshape(self.masks.shape[1:]) != 0
+        self.local_to_world_tfs[self.count] = local_to_world_tf
+        self.count += 1
+
+    def backproject(self, directions: np.ndarray, depth_scale: float = 100.0) -> np.ndarray:
+        n = self.count
+        if n == 0:
+            return np.empty((0, 9))
+        return backproject_views(
+            directions,
+            self.depths[:n],
+            self.normals[:n],
+            self.rgba[:n],
+            self.masks[:n],
+            self.local_to_world_tfs[:n],
+            depth_scale=depth_scale,
+        )
@@ -0,0 +1,73 @@
+"""Decide when a rendered view has settled and its ground truth can be projected.
+"""
+import numpy as np
+
+
+class SettlePolicy:
+    """Settle a view once its frames stop changing instead of rendering it a fixed number of times.
+
+    Every frame is summarized by a cheap signature, a downsampled copy of its masked depth and color.
+    A view is settled once two frames in a row match, so a half-loaded frame, e.g. with materials still
+    streaming in, is not accepted since it differs from the next one. Only a frame the source knows to show
+    the current camera pose, told through `pose_applied_fn`, is accepted on its own. `confirm_frames` asks for
+    that many identical frames in a row after the first one, at least one without `pose_applied_fn`.
+    `max_frames` caps the frames of a view.
+
+    Args:
+        max_frames (int): maximum number of frames read for a view
+        confirm_frames (int): number of extra identical frames required, at least one unless the pose is known
+        tolerance (float): relative tolerance when comparing signatures
+        downsample (int): stride used to subsample the frames for the signature
+    """
+
+    def __init__(self, max_frames: int = 4, confirm_frames: int = 0, tolerance: float = 1e-3, downsample: int = 8):
+        self.max_frames = max(int(max_frames), 1)
+        self.confirm_frames = max(int(confirm_frames), 0)
+        self.tolerance = tolerance
+        self.downsample = max(int(downsample), 1)
+
+    def signature(self, gt: dict) -> np.ndarray:
+        step = self.downsample
+        mask = np.asarray(gt["segmentation"])[::step, ::step].reshape(-1) != 0
+        depth = np.asarray(gt["linear_depth"])[::step, ::step].reshape(-1)
+        rgb = np.asarray(gt["images"])[::step, ::step, :3].reshape(mask.shape[0], 3)
+        return np.concatenate([np.where(mask, depth, 0), rgb.mean(axis=1) * mask], axis=0).astype(np.float32)
+
+    def _matches(self, signature, previous) -> bool:
+        if previous is None or signature.shape != previous.shape:
+            return False
+        scale = max(float(np.abs(previous).max(initial=0)), 1.0)
+        return bool(np.allclose(signature, previous, rtol=0, atol=self.tolerance * scale))
+
+    async def settle(self, read_fn, is_loading_fn=None, pose_applied_fn=None):
+        """Read frames with `read_fn` until the view is settled.
+
+        Args:
+            read_fn: coroutine function returning the ground truth dict of the current frame
+            is_loading_fn (optional): function returning True while the stage is still loading assets
+            pose_applied_fn (optional): function of the ground truth returning True when the frame is known
+                to show the current camera pose, e.g. from a pose or frame token
+
+        Returns:
+            tuple: ground truth of the accepted frame and number of frames read
+        """
+        previous = None
+        confirmed = 0
+        for n_frames in range(1, self.max_frames + 1):
+            gt = await read_fn()
+            signature = self.signature(gt)
+
+            if is_loading_fn is not None and is_loading_fn():
+                previous, confirmed = None, 0
+                continue
+
+            confirmed = confirmed + 1 if self._matches(signature, previous) else 0
+            previous = signature
+            # consecutive frames of this view agree
+            if confirmed >= max(self.confirm_frames, 1):
+                break
+            # the frame is known to show the current pose, no need to compare it with the next one
+            if pose_applied_fn is not None and pose_applied_fn(gt) and confirmed >= self.confirm_frames:
+                break
+
+        return gt, n_frames
@@ -24,6 +24,9 @@ import numpy as np
 import omni
 import omni.syntheticdata as syn
 
+from .backends import GroundTruthSource
+from .profiling import Profiler
+
 
 # define a list of supported sensor that are extracted from USD file
 # > mapping sensor type to field name
@@ -37,11 +40,63 @@ SENSORS = {
 }
 
 
+# readbacks telling whether a sensor produced data yet
+SENSOR_READERS = {
+    syn._syntheticdata.SensorType.Rgb: syn.sensors.get_rgb,
+    syn._syntheticdata.SensorType.Depth: syn.sensors.get_depth,
+    syn._syntheticdata.SensorType.DepthLinear: syn.sensors.get_depth_linear,
+    syn._syntheticdata.SensorType.Normal: syn.sensors.get_normals,
+    syn._syntheticdata.SensorType.InstanceSegmentation: lambda viewport: syn.sensors.get_instance_segmentation(
+        viewport, parsed=True, return_mapping=False
+    ),
+}
+
+
+class SensorPlan:
+    """Minimal set of sensors needed to produce the requested groundtruth fields.
+
+    Args:
+        fields (list): groundtruth field names, values of `SENSORS`
+    """
+
+    def __init__(self, fields):
+        fields = set(fields)
+        unknown = fields - set(SENSORS.values())
+        if unknown:
+            raise ValueError(f"Unknown groundtruth fields: {sorted(unknown)}")
+        self.fields = fields
+        self.sensors = [sensor for sensor, field in SENSORS.items() if field in fields]
+
+    def __repr__(self):
+        return f"SensorPlan({sorted(self.fields)})"
+
+
 class SyntheticDataHelper:
-    def __init__(self):
+    def __init__(self, profiler: Profiler = None):
         self.app = omni.kit.app.get_app_interface()
+        # times the readback of every sensor, disabled unless the generator shares its profiler
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
         # vp_iface = omni.kit.viewport.get_viewport_interface()
 
+        # Sensors are initialized once per viewport and reused across views
+        self._sensor_viewport = None
+        self._enabled_sensors = set()
+
+    def reset_sensors(self):
+        """Forget which sensors are enabled, they will be initialized again on the next read."""
+        self._sensor_viewport = None
+        self._enabled_sensors = set()
+
+    async def ensure_sensors(self, viewport, sensors):
+        """Enable the sensors that are not already enabled on `viewport`."""
+        if viewport is not self._sensor_viewport:
+            self.reset_sensors()
+        missing = [s for s in sensors if s not in self._enabled_sensors]
+        if missing:
+            await self.enable_sensors(viewport, missing)
+            self._sensor_viewport = viewport
+            self._enabled_sensors.update(missing)
+
     async def enable_sensors(self, viewport, sensors):
         """Enable syntheticdata sensors.
 
@@ -52,9 +107,24 @@ class SyntheticDataHelper:
         """
         # Enable sensor
         await syn.sensors.initialize_async(viewport, sensors)
-
-        for _ in range(2):
+        await self._wait_for_sensors(viewport, sensors)
+
+    def _has_data(self, viewport, sensor) -> bool:
+        reader = SENSOR_READERS.get(sensor)
+        if reader is None:
+            return True
+        try:
+            return np.asarray(reader(viewport)).size > 0
+        except Exception:
+            return False
+
+    async def _wait_for_sensors(self, viewport, sensors, timeout: float = 10):
+        """Update the app until every sensor returns data, instead of rendering a fixed number of frames."""
+        pending = [sensor for sensor in sensors if not self._has_data(viewport, sensor)]
+        start = time.time()
+        while pending and time.time() < start + timeout:
             await self.app.next_update_async()
+            pending = [sensor for sensor in pending if not self._has_data(viewport, sensor)]
 
     async def _wait_for_data(self, viewport, timeout: float = 10):
         # HACK Render until data is available (remove when no longer needed)
@@ -76,7 +146,7 @@ class SyntheticDataHelper:
         instance_tex = syn.sensors.get_instance_segmentation(viewport, parsed=True, return_mapping=False)
         return instance_tex
 
-    async def get_groundtruth(self, viewport, gt_sensors: list, err_limit: int = 10) -> dict:
+    async def get_groundtruth(self, viewport, gt_sensors, err_limit: int = 10) -> dict:
         """Get groundtruth from specified gt_sensors.
         Enable syntheticdata sensors if required, render a frame and
         collect groundtruth from the specified gt_sensors
@@ -85,17 +155,19 @@ class SyntheticDataHelper:
         an additional frame in RayTracedLighting mode.
 
         Args:
-            gt_sensors (list): List of strings of sensor names. Valid sensors names: rgb, depth,
-                instanceSegmentation, semanticSegmentation, boundingBox2DTight,
-                boundingBox2DLoose, boundingBox3D, camera, normal
+            gt_sensors (list or SensorPlan): List of strings of sensor names, or the plan to read.
+                Valid sensors names: rgb, depth, instanceSegmentation, semanticSegmentation,
+                boundingBox2DTight, boundingBox2DLoose, boundingBox3D, camera, normal
 
         Returns:
             Dict of sensor outputs
         """
+        if isinstance(gt_sensors, SensorPlan):
+            gt_sensors = gt_sensors.sensors
 
         gt = {}
-        # make sure sensors are enabled
-        await self.enable_sensors(viewport, gt_sensors)
+        # make sure sensors are enabled, only the first read on a viewport initializes them
+        await self.ensure_sensors(viewport, gt_sensors)
 
         for sensor in gt_sensors:
             received = False
@@ -103,22 +175,51 @@ class SyntheticDataHelper:
             while not received and err_count < err_limit:
                 try:
                     field = SENSORS[sensor]
-                    if sensor == syn._syntheticdata.SensorType.Rgb:
-                        gt[field] = syn.sensors.get_rgb(viewport)
-                    elif sensor == syn._syntheticdata.SensorType.InstanceSegmentation:
-                        instance_mask = await self.get_instance_segmentation(viewport)
-                        gt[field] = instance_mask
-                    elif sensor == syn._syntheticdata.SensorType.Depth:
-                        gt[field] = syn.sensors.get_depth(viewport)
-                    elif sensor == syn._syntheticdata.SensorType.DepthLinear:
-                        gt[field] = syn.sensors.get_depth_linear(viewport)
-                    elif sensor == syn._syntheticdata.SensorType.Normal:
-                        gt[field] = syn.sensors.get_normals(viewport)
-                    else:
-                        raise NotImplementedError(f"Sensor '{sensor}' is currently not implemented in this helper")
+                    with self.profiler.span(f"readback.{field}"):
+                        if sensor == syn._syntheticdata.SensorType.Rgb:
+                            gt[field] = syn.sensors.get_rgb(viewport)
+                        elif sensor == syn._syntheticdata.SensorType.InstanceSegmentation:
+                            instance_mask = await self.get_instance_segmentation(viewport)
+                            gt[field] = instance_mask
+                        elif sensor == syn._syntheticdata.SensorType.Depth:
+                            gt[field] = syn.sensors.get_depth(viewport)
+                        elif sensor == syn._syntheticdata.SensorType.DepthLinear:
+                            gt[field] = syn.sensors.get_depth_linear(viewport)
+                        elif sensor == syn._syntheticdata.SensorType.Normal:
+                            gt[field] = syn.sensors.get_normals(viewport)
+                        else:
+                            raise NotImplementedError(
+                                f"Sensor '{sensor}' is currently not implemented in this helper"
+                            )
                     received = True
                 except Exception as e:
                     print(e)
                     err_count += 1
-                    await self.enable_sensors(viewport, gt_sensors)
+                    self.reset_sensors()
+                    await self.ensure_sensors(viewport, gt_sensors)
         return gt
+
+
+class KitGroundTruthSource(GroundTruthSource):
+    """Groundtruth rendered by RTX and read from the syntheticdata sensors of a viewport.
+
+    Args:
+        sd_helper (SyntheticDataHelper): helper reading the sensors
+        viewport: viewport api rendering the camera
+        sensor_plan (SensorPlan): sensors to read
+    """
+
+    name = "rtx"
+
+    def __init__(self, sd_helper: SyntheticDataHelper, viewport, sensor_plan: SensorPlan):
+        self.sd_helper = sd_helper
+        self.viewport = viewport
+        self.sensor_plan = sensor_plan
+
+    def reset(self):
+        self.sd_helper.reset_sensors()
+
+    async def get_groundtruth(self) -> dict:
+        # sensors stay enabled across views, so tick the app to render the current pose
+        await self.sd_helper.app.next_update_async()
+        return await self.sd_helper.get_groundtruth(self.viewport, self.sensor_plan)
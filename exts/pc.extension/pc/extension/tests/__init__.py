@@ -1 +1,16 @@
-from .test_hello_world import *
\ No newline at end of file
+from .test_hello_world import *
+from .test_projection import *
+from .test_fusion import *
+from .test_accumulator import *
+from .test_pointcloud import *
+from .test_exporters import *
+from .test_settling import *
+from .test_viewpoints import *
+from .test_backends import *
+from .test_geometry import *
+from .test_batch import *
+from .test_profiling import *
+from .test_octree import *
+from .test_filtering import *
+from .test_cache import *
+from .test_pipeline import *
@@ -0,0 +1,36 @@
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.accumulator import PointCloudAccumulator
+
+
+class TestAccumulator(omni.kit.test.AsyncTestCase):
+    async def test_append_grows_and_finalize_trims(self):
+        accumulator = PointCloudAccumulator(initial_capacity=4)
+        views = [np.random.rand(n, 9) for n in (3, 5, 0, 17)]
+        for view in views:
+            accumulator.append(view)
+
+        self.assertEqual(len(accumulator), 25)
+        self.assertEqual(accumulator.capacity, 32)
+
+        pointcloud = accumulator.finalize()
+        self.assertTrue(np.array_equal(pointcloud, np.concatenate(views, axis=0)))
+        self.assertEqual(len(accumulator), 0)
+
+    async def test_views_outlive_growth(self):
+        accumulator = PointCloudAccumulator(initial_capacity=2)
+        first = accumulator.allocate(2)
+        first[...] = 1.0
+        points = accumulator.view()
+
+        # growing copies the buffer, the views keep the previous one alive
+        accumulator.append(np.full((7, 9), 2.0))
+        self.assertTrue(np.all(points == 1.0))
+        self.assertFalse(np.shares_memory(points, accumulator.view()))
+
+        pointcloud = accumulator.finalize()
+        self.assertEqual(pointcloud.shape, (9, 9))
+        self.assertTrue(np.all(pointcloud[:2] == 1.0) and np.all(pointcloud[2:] == 2.0))
+        self.assertTrue(np.all(first == 1.0))
@@ -0,0 +1,52 @@
+import omni.kit.test
+
+import numpy as np
+
+from pxr import Gf, Usd, UsdGeom
+
+from pc.extension.backends import RayCastGroundTruthSource
+from pc.extension.geometry import get_camera_metadata
+from pc.extension.projection import ViewBatch, compute_ray_directions
+
+
+def create_cube_stage(half_size: float = 50.0):
+    stage = Usd.Stage.CreateInMemory()
+    UsdGeom.Xform.Define(stage, "/World/Object")
+    mesh = UsdGeom.Mesh.Define(stage, "/World/Object/Cube")
+    corners = (-half_size, half_size)
+    points = [Gf.Vec3f(x, y, z) for x in corners for y in corners for z in corners]
+    faces = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+    mesh.CreatePointsAttr(points)
+    mesh.CreateFaceVertexCountsAttr([4] * len(faces))
+    mesh.CreateFaceVertexIndicesAttr([i for face in faces for i in face])
+    mesh.CreateDisplayColorAttr([Gf.Vec3f(1, 0, 0)])
+
+    camera = UsdGeom.Camera.Define(stage, "/World/Camera")
+    camera.CreateFocalLengthAttr(18.0)
+    camera.CreateHorizontalApertureAttr(20.955)
+    camera.CreateVerticalApertureAttr(20.955)
+    return stage, camera.GetPrim()
+
+
+class TestRayCastBackend(omni.kit.test.AsyncTestCase):
+    async def test_cube_points_lie_on_surface(self):
+        stage, camera = create_cube_stage()
+        xformable = UsdGeom.Xformable(camera)
+        xformable.AddRotateXOp().Set(45)
+        xformable.AddTranslateOp().Set(Gf.Vec3d(0, 0, 300))
+
+        source = RayCastGroundTruthSource(camera, stage.GetPrimAtPath("/World/Object"), 64, 64)
+        gt = await source.get_groundtruth()
+        self.assertEqual(gt["linear_depth"].shape, (64, 64))
+        self.assertTrue(gt["segmentation"].any())
+
+        metadata = get_camera_metadata(camera)
+        directions = compute_ray_directions(64, 64, 18.0, 20.955, 20.955)
+        batch = ViewBatch(1)
+        batch.add(gt["linear_depth"], gt["normal"], gt["images"], gt["segmentation"], metadata["local_to_world_tf"])
+        pointcloud = batch.backproject(directions)
+
+        # every point is on a face of the cube, facing the camera, and red
+        self.assertTrue(np.allclose(np.abs(pointcloud[:, :3]).max(axis=1), 50, atol=1e-3))
+        self.assertTrue(np.all(pointcloud[:, 3:6] @ np.array([0, -1, 1]) > 0))
+        self.assertTrue(np.all(pointcloud[:, 6:] == [255, 0, 0]))
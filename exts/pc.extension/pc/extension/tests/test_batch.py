@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.batch import BatchConverter, expand_asset_paths
+from pc.extension.exporters import export_pointcloud
+from pc.extension.profiling import Profiler
+
+
+class _Generator:
+    """Generator double producing a fixed cloud, failing on assets named 'broken'."""
+
+    def __init__(self):
+        self.asset_status = {}
+        self.pointcloud = None
+        self.loaded = []
+        self.profiler = Profiler()
+        self.cache_hit = False
+
+    async def load_asset(self, path):
+        self.loaded.append(path)
+        self.profiler.begin_asset(path)
+
+    async def get_asset_pointcloud(self):
+        if "broken" in self.loaded[-1]:
+            raise RuntimeError("no mesh")
+        self.pointcloud = np.zeros((4, 9))
+
+    def export_pointcloud(self, path, file_format=None):
+        with self.profiler.span("export"):
+            export_pointcloud(path, self.pointcloud, file_format)
+
+
+class TestBatch(omni.kit.test.AsyncTestCase):
+    async def test_manifest_records_each_asset(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ("a.usd", "b.usda", "broken.usd"):
+                open(os.path.join(tmp_dir, name), "w").close()
+            assets = expand_asset_paths([os.path.join(tmp_dir, "*.usd*"), os.path.join(tmp_dir, "a.usd")])
+            self.assertEqual([os.path.basename(p) for p in assets], ["a.usd", "b.usda", "broken.usd"])
+
+            output_dir = os.path.join(tmp_dir, "out")
+            manifest = await BatchConverter(_Generator(), output_dir, file_format="npz").run(assets)
+
+            self.assertEqual((manifest["succeeded"], manifest["failed"]), (2, 1))
+            self.assertTrue(os.path.exists(os.path.join(output_dir, "b.npz")))
+            self.assertIn("no mesh", manifest["assets"][2]["error"])
+            with open(os.path.join(output_dir, "manifest.json")) as f:
+                entry = json.load(f)["assets"][0]
+            self.assertEqual(entry["n_points"], 4)
+            self.assertEqual(entry["spans"]["export"]["count"], 1)
+
+    async def test_assets_with_the_same_name_do_not_collide(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            names = (("a", "chair.usd"), ("b", "chair.usd"), ("b", "chair.usda"))
+            assets = [os.path.join(tmp_dir, *parts) for parts in names]
+            for path in assets:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "w").close()
+
+            output_dir = os.path.join(tmp_dir, "out")
+            manifest = await BatchConverter(_Generator(), output_dir, file_format="npz").run(assets)
+
+            outputs = [entry["output"] for entry in manifest["assets"]]
+            self.assertEqual(len(set(outputs)), 3)
+            self.assertEqual(outputs[0], os.path.join(output_dir, "a", "chair.npz"))
+            self.assertTrue(all(os.path.exists(path) for path in outputs))
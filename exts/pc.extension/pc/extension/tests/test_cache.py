@@ -0,0 +1,96 @@
+import omni.kit.test
+
+import os
+import tempfile
+
+import numpy as np
+
+from pc.extension.cache import ResultCache, asset_dependencies, cache_key, view_key
+from pc.extension.pointcloud import PointCloud
+
+
+def _write(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _pointcloud(n_points: int) -> np.ndarray:
+    pointcloud = np.zeros((n_points, 9))
+    pointcloud[:, 0:3] = np.arange(n_points * 3).reshape(-1, 3)
+    pointcloud[:, 5] = 1
+    pointcloud[:, 6:9] = 200
+    return pointcloud
+
+
+class TestCache(omni.kit.test.AsyncTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        self.cache = ResultCache(os.path.join(self.tmp, "cache"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    async def test_roundtrip_and_stats(self):
+        key = cache_key("asset", {"resolution": [448, 448]})
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, PointCloud.from_array(_pointcloud(10)))
+
+        pointcloud = self.cache.get(key)
+        self.assertIsInstance(pointcloud, PointCloud)
+        self.assertTrue(np.array_equal(pointcloud.to_array(), _pointcloud(10)))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    async def test_key_follows_sublayers_and_params(self):
+        root, sublayer = os.path.join(self.tmp, "root.usda"), os.path.join(self.tmp, "sub.usda")
+        _write(sublayer, '#usda 1.0\ndef Cube "Cube" {}\n')
+        _write(root, '#usda 1.0\n(\n    subLayers = [@./sub.usda@]\n)\n')
+        self.assertEqual(len(asset_dependencies(root)), 2)
+
+        key = self.cache.key(root, {"resolution": [448, 448]})
+        self.assertEqual(self.cache.key(root, {"resolution": [448, 448]}), key)
+        self.assertNotEqual(self.cache.key(root, {"resolution": [224, 224]}), key)
+
+        _write(sublayer, '#usda 1.0\ndef Sphere "Sphere" {}\n')
+        self.assertNotEqual(self.cache.key(root, {"resolution": [448, 448]}), key)
+
+    async def test_evicts_least_recently_used(self):
+        # every entry is a bit over 2.7kB
+        self.cache.max_bytes = 6000
+        for i, key in enumerate(("a", "b")):
+            self.cache.put(key, _pointcloud(100))
+            os.utime(self.cache.path(key), ns=(i, i))
+        # reading "a" makes "b" the least recently used entry
+        self.assertIsNotNone(self.cache.get("a"))
+        self.cache.put("c", _pointcloud(100))
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+        # below the cap, putting an entry does not list the directory
+        self.cache.max_bytes = 1 << 20
+        listed = []
+        entries = self.cache.entries
+        self.cache.entries = lambda: listed.append(1) or entries()
+        self.cache.put("d", _pointcloud(100))
+        self.cache.put("d", _pointcloud(50))
+        self.assertEqual(listed, [])
+        self.assertEqual(self.cache._total_bytes, self.cache.stats()["bytes"])
+
+    async def test_view_key_ignores_pose_noise(self):
+        intrinsics = {"focal_length": 24.0, "horizontal_aperture": 20.955, "vertical_aperture": 20.955}
+        pose = np.eye(4)
+        pose[3, :3] = [0, 0, 150]
+        key = view_key("asset", intrinsics, pose, {"resolution": [448, 448]})
+
+        noisy = pose.copy()
+        noisy[0, 1] = -1e-13
+        noisy[3, 2] += 1e-12
+        self.assertEqual(view_key("asset", intrinsics, noisy, {"resolution": [448, 448]}), key)
+        moved = pose.copy()
+        moved[3, 2] = 151
+        self.assertNotEqual(view_key("asset", intrinsics, moved, {"resolution": [448, 448]}), key)
+        self.assertNotEqual(view_key("asset", dict(intrinsics, focal_length=35.0), pose), key)
@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.exporters import export_pointcloud, load_raw, open_writer
+from pc.extension.pointcloud import PointCloud
+
+
+class TestExporters(omni.kit.test.AsyncTestCase):
+    async def setUp(self):
+        rng = np.random.default_rng(0)
+        colors = rng.integers(0, 256, (100, 3))
+        self.pointcloud = np.concatenate([rng.random((100, 3)), rng.random((100, 3)), colors], axis=1)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    async def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_npz_export(self):
+        path = os.path.join(self.tmp_dir.name, "cloud.npz")
+        export_pointcloud(path, PointCloud.from_array(self.pointcloud), chunk_size=30)
+        with np.load(path) as data:
+            self.assertTrue(np.allclose(data["positions"], self.pointcloud[:, :3]))
+            self.assertTrue(np.array_equal(data["colors"], self.pointcloud[:, 6:]))
+
+    async def test_streamed_raw_export(self):
+        path = os.path.join(self.tmp_dir.name, "cloud.pcraw")
+        with open_writer(path) as writer:
+            for view in np.array_split(self.pointcloud, 4):
+                writer.write(view)
+
+        records = load_raw(path)
+        self.assertEqual(records.shape, (100,))
+        self.assertTrue(np.allclose(records["nz"], self.pointcloud[:, 5]))
+        del records
+
+    async def test_ply_header_count(self):
+        path = os.path.join(self.tmp_dir.name, "cloud.ply")
+        export_pointcloud(path, self.pointcloud)
+        with open(path, "rb") as f:
+            data = f.read()
+        header, body = data.split(b"end_header\n", 1)
+        self.assertIn(b"element vertex 100 ", header)
+        self.assertEqual(len(body), 100 * 27)
@@ -0,0 +1,81 @@
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.filtering import OutlierFilter, SpatialHash, mean_knn_distances, radius_neighbor_counts
+from pc.extension.pointcloud import PointCloud
+
+
+def _plane_with_outliers(n_side: int, n_outliers: int):
+    grid = np.stack(np.meshgrid(np.arange(n_side), np.arange(n_side), indexing="ij"), -1).reshape(-1, 2) * 0.01
+    rng = np.random.default_rng(0)
+    outliers = rng.uniform(-1, 1, (n_outliers, 3)) + [0.3, 0.3, 2.0]
+    points = np.concatenate([np.pad(grid, ((0, 0), (0, 1))), outliers], axis=0)
+    return points[rng.permutation(points.shape[0])]
+
+
+class TestFiltering(omni.kit.test.AsyncTestCase):
+    async def test_neighbor_queries_match_brute_force(self):
+        points = _plane_with_outliers(20, 5)
+        distances = np.linalg.norm(points[:, None] - points[None], axis=2)
+
+        counts = radius_neighbor_counts(points, 0.015, max_pairs=500)
+        self.assertTrue(np.array_equal(counts, (distances <= 0.015).sum(axis=1) - 1))
+
+        means = mean_knn_distances(points, 4, cell_size=0.05, max_pairs=500)
+        expected = np.sort(distances, axis=1)[:, 1:5].mean(axis=1)
+        on_plane = np.abs(points[:, 2]) < 1e-9
+        self.assertTrue(np.allclose(means[on_plane], expected[on_plane]))
+
+        # every pair shares a cell or a neighboring one
+        grid = SpatialHash(points, 0.05)
+        n_pairs = sum(queries.shape[0] for queries, _ in grid.iter_pairs(max_pairs=100))
+        self.assertGreater(n_pairs, 0)
+
+    async def test_sparse_points_get_their_nearest_neighbors(self):
+        dense = _plane_with_outliers(20, 0)
+        sparse = np.stack(np.meshgrid(np.arange(4), np.arange(4), [0], indexing="ij"), -1).reshape(-1, 3) * 0.1 + 5
+        points = np.concatenate([dense, sparse, [[9.0, 9.0, 9.0]]])
+        distances = np.linalg.norm(points[:, None] - points[None], axis=2)
+        expected = np.sort(distances, axis=1)[:, 1:5].mean(axis=1)
+
+        # the sparse points are 2 cells apart, the search widens until it finds their neighbors
+        means = mean_knn_distances(points, 4, cell_size=0.05, max_pairs=500)
+        self.assertTrue(np.all(np.isfinite(means)))
+        self.assertTrue(np.allclose(means[:-1], expected[:-1]))
+
+        # with fewer other points than k, the mean is over the ones there are
+        means = mean_knn_distances(points[:3], 4, cell_size=0.001)
+        self.assertTrue(np.allclose(means, np.sort(distances[:3, :3], axis=1)[:, 1:].mean(axis=1)))
+        self.assertEqual(mean_knn_distances(points[:1], 4)[0], np.inf)
+
+    async def test_filters_remove_isolated_points(self):
+        rng = np.random.default_rng(1)
+        sphere = rng.normal(size=(4000, 3))
+        sphere /= np.linalg.norm(sphere, axis=1, keepdims=True)
+        outliers = rng.uniform(2, 3, (20, 3)) * rng.choice([-1, 1], (20, 3))
+        pointcloud = np.zeros((4020, 9))
+        pointcloud[:, :3] = np.concatenate([sphere, outliers])
+        pointcloud[:, 6] = np.arange(4020) >= 4000
+
+        outlier_filter = OutlierFilter(nb_neighbors=8, std_ratio=3.0)
+        filtered = outlier_filter.apply(PointCloud.from_array(pointcloud))
+        self.assertFalse(filtered.colors[:, 0].any())
+        self.assertEqual(outlier_filter.stats["input"], 4020)
+        self.assertEqual(outlier_filter.stats["output"], len(filtered))
+        self.assertLess(outlier_filter.stats["statistical"], 60)
+
+        outlier_filter = OutlierFilter(nb_neighbors=None, radius=0.2, min_neighbors=4)
+        filtered = outlier_filter.apply(pointcloud)
+        self.assertEqual(outlier_filter.stats, {"input": 4020, "radius": 20, "output": 4000})
+        self.assertFalse(filtered[:, 6].any())
+
+        # without a neighbor to measure, no point is dropped
+        lone = PointCloud.from_array(pointcloud[:1])
+        self.assertEqual(len(OutlierFilter(nb_neighbors=8).apply(lone)), 1)
+
+    async def test_cell_keys_do_not_overflow(self):
+        points = np.array([[0.0, 0.0, 0.0], [1e6, 1e6, 1e6]])
+        with self.assertRaises(ValueError):
+            SpatialHash(points, 1e-3)
+        self.assertEqual(radius_neighbor_counts(points, 1.0).tolist(), [0, 0])
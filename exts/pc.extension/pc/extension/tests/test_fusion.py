@@ -0,0 +1,35 @@
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.fusion import VoxelGridFusion, resolve_voxel_size, voxel_downsample
+
+
+class TestFusion(omni.kit.test.AsyncTestCase):
+    async def test_voxel_downsample_averages_points(self):
+        pointcloud = np.array(
+            [
+                [0.1, 0.1, 0.1, 0, 0, 1, 10, 20, 30],
+                [0.3, 0.3, 0.3, 0, 0, 1, 30, 40, 50],
+                [1.5, 0.1, 0.1, 1, 0, 0, 0, 0, 0],
+            ]
+        )
+        fused = voxel_downsample(pointcloud, 1.0)
+        self.assertEqual(fused.shape, (2, 9))
+        self.assertTrue(np.allclose(fused[0], [0.2, 0.2, 0.2, 0, 0, 1, 20, 30, 40]))
+        self.assertTrue(np.allclose(fused[1], pointcloud[2]))
+
+    async def test_streaming_fusion_matches_single_pass(self):
+        rng = np.random.default_rng(0)
+        pointcloud = np.concatenate([rng.random((500, 3)) * 4 - 2, rng.random((500, 3)), rng.random((500, 3))], 1)
+        fusion = VoxelGridFusion(0.5)
+        for view in np.array_split(pointcloud, 6):
+            fusion.add(view)
+
+        self.assertEqual(fusion.n_points_in, 500)
+        self.assertTrue(np.allclose(fusion.get_pointcloud(), voxel_downsample(pointcloud, 0.5)))
+
+    async def test_relative_voxel_size(self):
+        self.assertEqual(resolve_voxel_size(0.2, 0.5, (3, 4, 0)), 0.2)
+        self.assertAlmostEqual(resolve_voxel_size(None, 0.1, (3, 4, 0)), 0.5)
+        self.assertIsNone(resolve_voxel_size())
@@ -0,0 +1,43 @@
+import omni.kit.test
+
+import numpy as np
+
+from pxr import Gf, Usd, UsdGeom
+
+from pc.extension.geometry import MeshTriangles, author_points, sample_surface, triangulate_faces
+from .test_backends import create_cube_stage
+
+
+class TestGeometry(omni.kit.test.AsyncTestCase):
+    async def test_fan_triangulation(self):
+        face_idx, corners = triangulate_faces([3, 5, 2, 4])
+        self.assertEqual(face_idx.tolist(), [0, 1, 1, 1, 3, 3])
+        self.assertEqual(corners.tolist(), [[0, 1, 2], [3, 4, 5], [3, 5, 6], [3, 6, 7], [10, 11, 12], [10, 12, 13]])
+
+    async def test_surface_samples_follow_transforms(self):
+        stage, _ = create_cube_stage(half_size=1.0)
+        cube = stage.GetPrimAtPath("/World/Object")
+        UsdGeom.Xformable(cube).AddTranslateOp().Set(Gf.Vec3d(10, 0, 0))
+        triangles = MeshTriangles.from_prim(cube)
+        self.assertEqual(len(triangles), 12)
+        self.assertAlmostEqual(triangles.areas.sum(), 24.0)
+
+        pointcloud = sample_surface(triangles, 1000, seed=0)
+        self.assertEqual(pointcloud.shape, (1000, 9))
+        self.assertTrue(np.allclose(np.abs(pointcloud[:, :3] - [10, 0, 0]).max(axis=1), 1))
+        self.assertTrue(np.allclose(np.linalg.norm(pointcloud[:, 3:6], axis=1), 1))
+        self.assertTrue(np.allclose(pointcloud[:, 6:], [255, 0, 0]))
+
+    async def test_author_points(self):
+        stage = Usd.Stage.CreateInMemory()
+        pointcloud = np.zeros((8, 9))
+        pointcloud[:, :3] = np.arange(24).reshape(8, 3)
+        pointcloud[:, 5] = 1
+        pointcloud[:, 6:] = 255
+        points = author_points(stage, pointcloud, "/World/Pointcloud")
+
+        self.assertTrue(np.allclose(np.array(points.GetPointsAttr().Get()), pointcloud[:, :3]))
+        self.assertTrue(np.allclose(np.array(points.GetNormalsAttr().Get()), pointcloud[:, 3:6]))
+        self.assertTrue(np.allclose(np.array(points.GetDisplayColorAttr().Get()), 1))
+        self.assertEqual(len(points.GetWidthsAttr().Get()), 1)
+        self.assertEqual(points.GetWidthsInterpolation(), UsdGeom.Tokens.constant)
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+
+import omni.kit.test
+
+import numpy as np
+
+from pxr import Usd, UsdGeom
+
+from pc.extension.exporters import load_raw
+from pc.extension.geometry import author_lod_points
+from pc.extension.octree import Octree, export_tiles
+from pc.extension.pointcloud import PointCloud
+
+
+def _sphere(n_points: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(n_points, 3))
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    pointcloud = np.zeros((n_points, 9))
+    pointcloud[:, :3] = points * 2 + 5
+    pointcloud[:, 3:6] = points
+    pointcloud[:, 6:] = rng.integers(0, 256, (n_points, 3))
+    return pointcloud
+
+
+class TestOctree(omni.kit.test.AsyncTestCase):
+    async def test_nodes_partition_the_points(self):
+        pointcloud = _sphere(20000)
+        octree = Octree.build(pointcloud, node_budget=512, max_depth=6)
+
+        self.assertTrue(np.array_equal(np.sort(octree.order), np.arange(20000)))
+        self.assertEqual(octree.level_offsets[-1], 20000)
+        self.assertGreater(octree.n_levels, 2)
+        for node in octree.nodes.values():
+            if node.children:
+                self.assertLessEqual(node.count, 512)
+            bounds_min, bounds_max = octree.node_bounds(node)
+            points = octree.node_points(node)[:, :3]
+            self.assertTrue(np.all(points >= bounds_min - 1e-9) and np.all(points <= bounds_max + 1e-9))
+            for child in node.children:
+                self.assertEqual(child[:-1], node.name)
+                self.assertEqual(octree.nodes[child].level, node.level + 1)
+
+        self.assertEqual(octree.select_level(1e6, 1e-3), 0)
+        self.assertEqual(octree.select_level(1e-6, 1e-3), octree.n_levels - 1)
+        self.assertEqual(octree.select_level(1e-6, 1e-3, max_points=octree.level_offsets[2]), 1)
+
+    async def test_lod_variants_and_tiles(self):
+        pointcloud = PointCloud.from_array(_sphere(5000))
+        octree = Octree.build(pointcloud, node_budget=64, max_depth=4)
+        stage = Usd.Stage.CreateInMemory()
+        variant_set = author_lod_points(stage, octree, "/World/Pointcloud", level=0)
+
+        def visible_points():
+            return sum(
+                len(UsdGeom.Points(prim).GetPointsAttr().Get())
+                for prim in stage.GetPrimAtPath("/World/Pointcloud").GetChildren()
+                if UsdGeom.Imageable(prim).ComputeVisibility() != UsdGeom.Tokens.invisible
+            )
+
+        self.assertEqual(visible_points(), octree.level_offsets[1])
+        variant_set.SetVariantSelection(f"LOD_{octree.n_levels - 1}")
+        self.assertEqual(visible_points(), 5000)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = export_tiles(octree, tmp_dir)
+            with open(os.path.join(tmp_dir, "index.json")) as f:
+                self.assertEqual(json.load(f)["nodes"].keys(), octree.nodes.keys())
+            counts = [len(load_raw(os.path.join(tmp_dir, node["file"]))) for node in index["nodes"].values()]
+            self.assertEqual(sum(counts), 5000)
+            root = load_raw(os.path.join(tmp_dir, "r.pcraw"))
+            self.assertTrue(np.allclose(root["x"], octree.node_points(octree.nodes["r"]).positions[:, 0]))
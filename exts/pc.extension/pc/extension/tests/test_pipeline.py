@@ -0,0 +1,118 @@
+import omni.kit.test
+
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+
+import numpy as np
+
+from pc.extension.exporters import POINT_DTYPE, load_raw
+from pc.extension.pipeline import FileSink, Pipeline, SocketSink
+
+
+class TestPipeline(omni.kit.test.AsyncTestCase):
+    async def test_items_keep_their_order(self):
+        async def slow_double(x):
+            # later items finish first
+            await asyncio.sleep(0.01 * (5 - x))
+            return 2 * x
+
+        results = []
+        pipeline = Pipeline(queue_depth=1)
+        pipeline.add_stage("double", slow_double, workers=3)
+        pipeline.add_stage("odd", lambda x: None if x % 4 else x)
+        pipeline.add_stage("collect", results.append)
+        await pipeline.run(range(6))
+
+        self.assertEqual(results, [0, 4, 8])
+        stats = pipeline.stats()["stages"]
+        self.assertEqual(stats["double"]["items"], 6)
+        self.assertEqual(stats["odd"]["dropped"], 3)
+        self.assertEqual(pipeline.in_flight, 0)
+
+    async def test_stats_point_at_the_bottleneck(self):
+        async def slow(x):
+            await asyncio.sleep(0.02)
+            return x
+
+        pipeline = Pipeline(queue_depth=2)
+        pipeline.add_stage("fast", lambda x: x)
+        pipeline.add_stage("slow", slow)
+        await pipeline.run(range(8))
+
+        stats = pipeline.stats()["stages"]
+        # the fast stage waits on the full queue of the slow one, which never waits for input
+        self.assertGreater(stats["fast"]["blocked"], 0.05)
+        self.assertLess(stats["slow"]["starved"], 0.02)
+        self.assertEqual(stats["slow"]["max_occupancy"], 2)
+
+    async def test_source_waits_for_feedback(self):
+        merged = []
+        pipeline = Pipeline(queue_depth=4)
+
+        async def source():
+            for i in range(4):
+                yield i
+                await pipeline.wait_idle()
+                # every item is merged before the next one is picked
+                self.assertEqual(merged, list(range(i + 1)))
+
+        pipeline.add_stage("merge", merged.append)
+        await pipeline.run(source())
+        self.assertEqual(merged, [0, 1, 2, 3])
+
+    async def test_errors_stop_the_pipeline(self):
+        def fail(x):
+            if x == 2:
+                raise RuntimeError("broken view")
+            return x
+
+        results = []
+        pipeline = Pipeline()
+        pipeline.add_stage("fail", fail)
+        pipeline.add_stage("collect", results.append)
+        with self.assertRaises(RuntimeError):
+            await pipeline.run(range(100))
+        self.assertLess(len(results), 100)
+
+    async def test_file_and_socket_sinks(self):
+        views = [np.full((n, 9), n, dtype=np.float64) for n in (3, 5)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "views.pcraw")
+            sink = FileSink(path)
+            for view in views:
+                sink.write(view)
+            sink.close()
+            self.assertEqual(load_raw(path, mmap=False)["x"].tolist(), [3] * 3 + [5] * 5)
+
+        server = socket.create_server(("127.0.0.1", 0))
+        received = bytearray()
+
+        def serve():
+            connection, _ = server.accept()
+            with connection:
+                while True:
+                    chunk = connection.recv(4096)
+                    if not chunk:
+                        break
+                    received.extend(chunk)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        sink = SocketSink(*server.getsockname(), timeout=5)
+        for view in views:
+            sink.write(view)
+        sink.close()
+        thread.join(5)
+        server.close()
+
+        offset = 0
+        for view in views:
+            (n_points,) = SocketSink.header.unpack_from(received, offset)
+            offset += SocketSink.header.size
+            records = np.frombuffer(received, dtype=POINT_DTYPE, count=n_points, offset=offset)
+            offset += n_points * POINT_DTYPE.itemsize
+            self.assertEqual(records["x"].tolist(), view[:, 0].tolist())
+        self.assertEqual(offset, len(received))
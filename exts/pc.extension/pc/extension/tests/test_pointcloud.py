@@ -0,0 +1,21 @@
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.pointcloud import PointCloud
+
+
+class TestPointCloud(omni.kit.test.AsyncTestCase):
+    async def test_compact_storage_and_field_views(self):
+        rng = np.random.default_rng(0)
+        dense = np.concatenate([rng.random((10, 3)), rng.random((10, 3)), rng.integers(0, 256, (10, 3))], 1)
+        pointcloud = PointCloud.from_array(dense)
+
+        self.assertEqual(pointcloud.shape, (10, 9))
+        self.assertEqual(pointcloud.nbytes, 10 * (12 + 6 + 3))
+        self.assertTrue(np.shares_memory(pointcloud[..., :3], pointcloud.positions))
+        self.assertTrue(np.shares_memory(pointcloud[:, 3:6], pointcloud.normals))
+        self.assertEqual(pointcloud[..., 6:].dtype, np.uint8)
+        self.assertTrue(np.array_equal(pointcloud[..., 6:], dense[:, 6:]))
+        self.assertTrue(np.allclose(np.asarray(pointcloud), dense, atol=1e-3))
+        self.assertEqual(len(pointcloud[dense[:, 0] > 0.5]), int(np.sum(dense[:, 0] > 0.5)))
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+
+import omni.kit.test
+
+from pc.extension.profiling import Profiler
+
+
+class TestProfiling(omni.kit.test.AsyncTestCase):
+    async def test_spans_are_aggregated_per_asset_and_view(self):
+        profiler = Profiler()
+        with profiler.span("stage_init"):
+            pass
+        profiler.begin_asset("a.usd")
+        for view in range(3):
+            profiler.begin_view(view, elevation=0, azimuth=view * 90)
+            profiler.record("settle", 0.5)
+            profiler.record("readback.normal", 0.25)
+        profiler.end_view()
+        profiler.record("usd_authoring", 1.0)
+        profiler.begin_asset("b.usd")
+        profiler.record("settle", 2.0)
+
+        report = profiler.report()
+        self.assertEqual(report["spans"]["stage_init"]["count"], 1)
+        self.assertEqual(report["spans"]["settle"]["count"], 4)
+        self.assertAlmostEqual(report["spans"]["settle"]["max"], 2.0)
+
+        asset = report["assets"][0]
+        self.assertNotIn("stage_init", asset["spans"])
+        self.assertAlmostEqual(asset["spans"]["settle"]["total"], 1.5)
+        self.assertAlmostEqual(asset["spans"]["settle"]["mean"], 0.5)
+        self.assertEqual([v["azimuth"] for v in asset["views"]], [0, 90, 180])
+        self.assertNotIn("usd_authoring", asset["views"][-1]["spans"])
+        self.assertEqual(profiler.asset_report()["asset"], "b.usd")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "report.json")
+            profiler.write_report(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["assets"][1]["spans"]["settle"]["count"], 1)
+
+    async def test_spans_of_concurrent_views(self):
+        profiler = Profiler()
+        profiler.begin_asset("a.usd")
+        profiler.begin_view(0, azimuth=0)
+        profiler.record("settle", 0.5)
+        profiler.begin_view(1, azimuth=90)
+        # view 0 is projected while view 1 renders
+        with profiler.span("projection", view=0):
+            profiler.record("readback.normal", 0.25)
+        profiler.record("projection", 1.0, view=1)
+        profiler.end_view()
+
+        views = profiler.asset_report()["views"]
+        self.assertEqual([v["azimuth"] for v in views], [0, 90])
+        self.assertEqual(set(views[0]["spans"]), {"settle", "projection"})
+        self.assertEqual(views[1]["spans"], {"readback.normal": 0.25, "projection": 1.0})
+
+    async def test_disabled_profiler_records_nothing(self):
+        profiler = Profiler(enabled=False)
+        profiler.begin_asset("a.usd")
+        with profiler.span("settle"):
+            pass
+        self.assertIs(profiler.span("settle"), profiler.span("projection"))
+        self.assertEqual(profiler.report()["spans"], {})
+        self.assertIsNone(profiler.asset_report())
@@ -0,0 +1,131 @@
+import omni.kit.test
+
+import numpy as np
+
+from pc.extension.accumulator import PointCloudAccumulator
+from pc.extension.projection import (
+    ProjectionWorkspace,
+    RayDirectionCache,
+    ViewBatch,
+    backproject_view,
+    backproject_views,
+    compute_ray_directions,
+    mask_bounds,
+)
+
+
+class TestProjection(omni.kit.test.AsyncTestCase):
+    async def test_ray_directions_match_per_pixel_angles(self):
+        height, width, focal_length, h_aperture = 12, 16, 5.0, 20.955
+        v_aperture = h_aperture * width / height
+        directions = compute_ray_directions(width, height, focal_length, h_aperture, v_aperture)
+
+        fov_h = 2 * np.arctan(h_aperture / focal_length / 2)
+        fov_w = 2 * np.arctan(v_aperture / focal_length / 2)
+        ii, jj = np.meshgrid(np.arange(width)[::-1], np.arange(height), indexing="xy")
+        x = 1 / np.tan((np.pi - fov_h) / 2 + ii * fov_h / width)
+        y = -np.tan(2 * np.pi - fov_w / 2 + jj * fov_w / height)
+
+        self.assertEqual(directions.shape, (height, width, 3))
+        self.assertTrue(np.allclose(directions[..., 0], x))
+        self.assertTrue(np.allclose(directions[..., 1], y))
+        self.assertTrue(np.all(directions[..., 2] == -1))
+
+    async def test_ray_cache_reuses_entries(self):
+        cache = RayDirectionCache(max_entries=1)
+        directions = cache.get(8, 8, 5.0, 20.0, 20.0)
+        self.assertIs(cache.get(8, 8, 5.0, 20.0, 20.0), directions)
+        self.assertFalse(directions.flags.writeable)
+
+        cache.get(16, 8, 5.0, 20.0, 20.0)
+        self.assertIsNot(cache.get(8, 8, 5.0, 20.0, 20.0), directions)
+
+    async def test_batched_backprojection_matches_per_view(self):
+        height, width, n_views = 6, 8, 3
+        directions = compute_ray_directions(width, height, 5.0, 20.0, 20.0)
+        rng = np.random.default_rng(0)
+        batch = ViewBatch(n_views)
+        expected = []
+        for _ in range(n_views):
+            depth = rng.random((height, width))
+            normals = rng.random((height, width, 3))
+            rgba = rng.random((height, width, 4)) * 255
+            mask = rng.random((height, width)) > 0.5
+            tf = np.eye(4)
+            tf[3, :3] = rng.random(3)
+            batch.add(depth, normals, rgba, mask, tf)
+
+            valid = mask.reshape(-1)
+            points = directions.reshape(-1, 3)[valid] * depth.reshape(-1, 1)[valid] * 100.0 + tf[3, :3]
+            expected.append(np.concatenate([points, normals.reshape(-1, 3)[valid], rgba.reshape(-1, 4)[valid, :3]], 1))
+
+        expected = np.concatenate(expected, axis=0)
+        self.assertTrue(np.allclose(batch.backproject(directions), expected))
+
+        single = [
+            backproject_view(directions, *(a[i] for a in (batch.depths, batch.normals, batch.rgba, batch.masks)), tf)
+            for i, tf in enumerate(batch.local_to_world_tfs)
+        ]
+        self.assertTrue(np.allclose(np.concatenate(single, axis=0), expected))
+
+        out = np.empty_like(expected)
+        stacked = (batch.depths, batch.normals, batch.rgba, batch.masks, batch.local_to_world_tfs)
+        self.assertIs(backproject_views(directions, *stacked, out=out), out)
+        self.assertTrue(np.allclose(out, expected))
+        with self.assertRaises(ValueError):
+            backproject_views(directions, *stacked, out=out[1:])
+
+    async def test_backprojection_crops_to_mask_bounds(self):
+        height, width = 10, 12
+        directions = compute_ray_directions(width, height, 5.0, 20.0, 20.0)
+        rng = np.random.default_rng(1)
+        depth = rng.random((height, width))
+        normals = rng.random((height, width, 3))
+        rgba = rng.random((height, width, 4)) * 255
+        mask = np.zeros((height, width), dtype=np.uint8)
+        mask[2:5, 7:11] = rng.random((3, 4)) > 0.3
+        mask[2, 7] = mask[4, 10] = 1
+        self.assertEqual(mask_bounds(mask), (slice(2, 5), slice(7, 11)))
+
+        valid = mask.reshape(-1) != 0
+        points = directions.reshape(-1, 3)[valid] * depth.reshape(-1, 1)[valid] * 100.0
+        expected = np.concatenate([points, normals.reshape(-1, 3)[valid], rgba.reshape(-1, 4)[valid, :3]], 1)
+        self.assertTrue(np.allclose(backproject_view(directions, depth, normals, rgba, mask, np.eye(4)), expected))
+
+        empty = np.zeros_like(mask)
+        self.assertIsNone(mask_bounds(empty))
+        self.assertEqual(backproject_view(directions, depth, normals, rgba, empty, np.eye(4)).shape, (0, 9))
+        stacked = [a[None] for a in (depth, normals, rgba, empty)]
+        self.assertEqual(backproject_views(directions, *stacked, np.eye(4)[None]).shape, (0, 9))
+
+    async def test_workspace_projects_into_the_accumulator(self):
+        height, width = 10, 12
+        directions = compute_ray_directions(width, height, 5.0, 20.0, 20.0)
+        rng = np.random.default_rng(2)
+        workspace = ProjectionWorkspace()
+        accumulator = PointCloudAccumulator(initial_capacity=4)
+        expected = []
+        for view in range(3):
+            depth = rng.random((height, width)).astype(np.float32)
+            depth[0, :] = 0
+            normals = rng.random((height, width, 3)).astype(np.float32)
+            rgba = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+            mask = rng.random((height, width)) > 0.4
+            tf = np.eye(4)
+            tf[:3, :3] = np.linalg.qr(rng.random((3, 3)))[0]
+            tf[3, :3] = rng.random(3)
+
+            expected.append(backproject_view(directions, depth, normals, rgba, mask, tf))
+            projected = workspace.project(directions, depth, normals, rgba, mask, tf, allocate=accumulator.allocate)
+            self.assertTrue(np.array_equal(projected, expected[-1]))
+            if view == 0:
+                buffers = dict(workspace._buffers)
+        self.assertTrue(np.array_equal(accumulator.finalize(), np.concatenate(expected)))
+        # buffers are allocated once per resolution
+        self.assertTrue(all(workspace._buffers[name] is buffer for name, buffer in buffers.items()))
+
+        with self.assertRaises(ValueError):
+            workspace.project(directions, depth, normals, rgba, mask, tf, out=np.empty((1, 9)))
+        small = compute_ray_directions(6, 5, 5.0, 20.0, 20.0)
+        workspace.project(small, depth[:5, :6], normals[:5, :6], rgba[:5, :6], mask[:5, :6], tf)
+        self.assertEqual(workspace.shape, (5, 6))
@@ -0,0 +1,77 @@
+import omni.kit.test
+
+import numpy as np
+
+from pxr import Gf, UsdGeom
+
+from pc.extension.backends import RayCastGroundTruthSource
+from pc.extension.settling import SettlePolicy
+
+from .test_backends import create_cube_stage
+
+
+def _frame(value: float, empty: bool = False) -> dict:
+    mask = np.zeros((16, 16), dtype=np.uint32)
+    if not empty:
+        mask[4:12, 4:12] = 1
+    return {
+        "segmentation": mask,
+        "linear_depth": np.full((16, 16), value, dtype=np.float32),
+        "images": np.full((16, 16, 4), 128, dtype=np.uint8),
+    }
+
+
+class TestSettling(omni.kit.test.AsyncTestCase):
+    async def _settle(self, policy, frames, pose_applied_fn=None):
+        frames = iter(frames)
+
+        async def read():
+            return next(frames)
+
+        return await policy.settle(read, pose_applied_fn=pose_applied_fn)
+
+    async def test_half_loaded_frame_is_not_accepted(self):
+        # the first frame differs from any previous view, yet its materials are still loading
+        policy = SettlePolicy(downsample=2)
+        gt, n_frames = await self._settle(policy, [_frame(1.0), _frame(2.0), _frame(2.0)])
+        self.assertEqual(n_frames, 3)
+        self.assertEqual(gt["linear_depth"][0, 0], 2.0)
+
+        # unless the source knows the frame shows the current pose
+        _, n_frames = await self._settle(policy, [_frame(1.0)], pose_applied_fn=lambda gt: True)
+        self.assertEqual(n_frames, 1)
+
+    async def test_confirm_frames_and_cap(self):
+        policy = SettlePolicy(max_frames=3, confirm_frames=1, downsample=2)
+        _, n_frames = await self._settle(policy, [_frame(1.0), _frame(1.5), _frame(1.5)])
+        self.assertEqual(n_frames, 3)
+
+        gt, n_frames = await self._settle(policy, [_frame(1.0), _frame(2.0), _frame(3.0)])
+        self.assertEqual(n_frames, 3)
+        self.assertEqual(gt["linear_depth"][0, 0], 3.0)
+
+    async def test_symmetric_asset_settles_in_two_frames(self):
+        # every quarter turn of the cube renders the same frame, so views never differ from the previous one
+        stage, camera = create_cube_stage()
+        xformable = UsdGeom.Xformable(camera)
+        rotate = xformable.AddRotateYOp()
+        xformable.AddTranslateOp().Set(Gf.Vec3d(0, 0, 300))
+        source = RayCastGroundTruthSource(camera, stage.GetPrimAtPath("/World/Object"), 32, 32)
+
+        policy = SettlePolicy()
+        frames = []
+        for azimuth in (0, 90, 180, 270, 0, 90):
+            rotate.Set(azimuth)
+            _, n_frames = await policy.settle(source.get_groundtruth)
+            frames.append(n_frames)
+        self.assertLessEqual(max(frames), 2)
+
+        # the source renders the current pose, the first frame is enough
+        _, n_frames = await policy.settle(source.get_groundtruth, pose_applied_fn=lambda gt: True)
+        self.assertEqual(n_frames, 1)
+
+    async def test_empty_frames_settle_in_two_frames(self):
+        policy = SettlePolicy(downsample=2)
+        for _ in range(3):
+            _, n_frames = await self._settle(policy, [_frame(0.0, empty=True)] * 4)
+            self.assertEqual(n_frames, 2)
@@ -0,0 +1,102 @@
+import omni.kit.test
+
+import numpy as np
+from pxr import Gf, Usd, UsdGeom
+
+from pc.extension.viewpoints import (
+    AdaptiveSampler,
+    FibonacciSampler,
+    GridSampler,
+    camera_fit,
+    camera_poses,
+    direction_to_viewpoint,
+    viewpoint_direction,
+)
+
+
+def _drain(sampler, observe_fn=None) -> list:
+    viewpoints = []
+    viewpoint = sampler.next_viewpoint()
+    while viewpoint is not None:
+        viewpoints.append(viewpoint)
+        if observe_fn is not None:
+            sampler.observe(observe_fn(viewpoint))
+        viewpoint = sampler.next_viewpoint()
+    return viewpoints
+
+
+class TestViewpoints(omni.kit.test.AsyncTestCase):
+    async def test_grid_sampler_order(self):
+        sampler = GridSampler([45, 135], [-60, 0])
+        self.assertEqual(_drain(sampler), [(-60, 45), (-60, 135), (0, 45), (0, 135)])
+        sampler.reset()
+        self.assertEqual(sampler.next_viewpoint(), (-60, 45))
+
+    async def test_fibonacci_directions_are_spread(self):
+        for up_axis in ("Z", "Y"):
+            sampler = FibonacciSampler(16)
+            sampler.reset(up_axis=up_axis)
+            directions = np.array([viewpoint_direction(el, az, up_axis) for el, az in _drain(sampler)])
+            self.assertEqual(directions.shape, (16, 3))
+            self.assertLess(np.linalg.norm(directions.mean(axis=0)), 0.05)
+
+    async def test_direction_roundtrip(self):
+        for up_axis in ("Z", "Y"):
+            for direction in ([1, 2, 3], [-1, 0.5, -2], [0.3, -1, 0.1]):
+                direction = np.array(direction) / np.linalg.norm(direction)
+                el, az = direction_to_viewpoint(direction, up_axis)
+                self.assertTrue(np.allclose(viewpoint_direction(el, az, up_axis), direction))
+
+    async def test_adaptive_sampler_stops_when_coverage_saturates(self):
+        # every view sees the same patch, so coverage stops growing after the first one
+        patch = np.zeros((100, 9))
+        patch[:, 0] = np.linspace(0, 1, 100)
+        patch[:, 5] = 1
+
+        sampler = AdaptiveSampler(FibonacciSampler(20), min_views=3)
+        sampler.reset(bounds_size=(1, 1, 1))
+        viewpoints = _drain(sampler, lambda _: patch)
+        self.assertEqual(len(viewpoints), 3)
+        self.assertEqual(len(set(viewpoints)), 3)
+        self.assertEqual(sampler.stats()["last_gain"], 0.0)
+        self.assertEqual(sampler.stats()["coverage"], 1.0)
+
+        # the second view sees half of the first one and as much new surface, the third one a last new part
+        parts = [patch + [0, offset, 0, 0, 0, 0, 0, 0, 0] for offset in (0, 0.5, 1, 1.5)]
+        views = iter([np.concatenate(parts[:2]), np.concatenate(parts[1:3]), parts[3]])
+        sampler = AdaptiveSampler(FibonacciSampler(20), min_views=3)
+        sampler.reset(bounds_size=(1, 1, 1))
+        sampler.next_viewpoint()
+        sampler.observe(next(views))
+        self.assertIsNone(sampler.stats()["coverage"])
+        coverages = []
+        for view in views:
+            sampler.next_viewpoint()
+            sampler.observe(view)
+            coverages.append(sampler.stats()["coverage"])
+        self.assertTrue(0.5 < coverages[0] < 1.0)
+        self.assertLess(coverages[1], coverages[0])
+
+    async def test_camera_poses_match_usd_rig(self):
+        bounds_min, bounds_max = np.array([-1.0, 2.0, 0.5]), np.array([3.0, 4.0, 2.5])
+        center, offset = camera_fit(bounds_min, bounds_max, distance_multiplier=1.5)
+        viewpoints = [(0, 0), (-60, 45), (30, 135), (90, 270)]
+        for up_axis in ("Z", "Y"):
+            poses = camera_poses(viewpoints, center, offset, up_axis)
+            self.assertEqual(poses.shape, (4, 4, 4))
+
+            # the rig the generator used to pose with USD ops
+            stage = Usd.Stage.CreateInMemory()
+            rig1 = UsdGeom.Xform.Define(stage, "/Rig1")
+            rig2 = UsdGeom.Xform.Define(stage, "/Rig1/Rig2")
+            camera = UsdGeom.Camera.Define(stage, "/Rig1/Rig2/Camera")
+            rig1.AddTranslateOp().Set(Gf.Vec3d(*center))
+            camera.AddTranslateOp().Set(Gf.Vec3d(0, 0, offset))
+            azimuth_op = rig2.AddRotateZOp() if up_axis == "Z" else rig2.AddRotateYOp()
+            elevation_op = rig2.AddRotateXOp()
+            for (el, az), pose in zip(viewpoints, poses):
+                azimuth_op.Set(az)
+                elevation_op.Set(el)
+                expected = np.array(camera.ComputeLocalToWorldTransform(Usd.TimeCode.Default()))
+                self.assertTrue(np.allclose(pose, expected))
+                self.assertTrue(np.allclose(pose[3, :3] - center, offset * viewpoint_direction(el, az, up_axis)))
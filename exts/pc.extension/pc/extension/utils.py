@@ -1,27 +1,115 @@
 import os
 import time
-import asyncio
 
 import numpy as np
 
 from PIL import Image
 
+import omni.kit.app
 import omni.usd
 
-from pxr import Usd, UsdGeom, Sdf, UsdShade, Semantics
+from pxr import Gf, Usd, UsdGeom, Sdf, UsdShade, Semantics
 
+from .viewpoints import camera_fit
 
-async def recreate_stage(app):
+
+class StageReadiness:
+    """Wait for the stage to be opened and done loading, instead of sleeping or spinning a fixed number of frames.
+
+    The app is updated until the stage is opened and `get_stage_loading_status` reports every file as
+    loaded, while the stage event stream is watched for failures. Measured wait times are kept per label.
+
+    Args:
+        context: usd context, the default one if not set
+        timeout (float): maximum time to wait in seconds, `RENDERING_TIMEOUT` by default
+    """
+
+    def __init__(self, context=None, timeout: float = None):
+        self.context = context or omni.usd.get_context()
+        self.app = omni.kit.app.get_app()
+        self.timeout = timeout if timeout is not None else float(os.getenv("RENDERING_TIMEOUT", "600"))
+        self.status = {}
+        self.wait_time = 0.0
+        self.wait_times = {}
+        self._subscription = None
+
+    def is_opened(self) -> bool:
+        if hasattr(self.context, "get_stage_state"):
+            return self.context.get_stage_state() == omni.usd.StageState.OPENED
+        return self.context.get_stage() is not None
+
+    def is_loading(self) -> bool:
+        _, files_loaded, total_files = self.context.get_stage_loading_status()
+        return files_loaded < total_files
+
+    def is_ready(self) -> bool:
+        return self.is_opened() and not self.is_loading()
+
+    async def wait(self, label: str = None, condition=None) -> float:
+        """Update the app until the stage is ready and `condition`, if set, returns True.
+
+        Args:
+            label (str, optional): key of the wait in `wait_times`
+            condition (optional): function returning True once whatever else is awaited is ready, e.g. a viewport
+
+        Returns:
+            float: time waited in seconds, also stored in `wait_time` and `wait_times[label]`
+
+        Raises:
+            RuntimeError: if the stage failed to open or load, or was not ready within `timeout`, the error is
+                also stored in `status["error"]`
+        """
+        failures = {
+            int(omni.usd.StageEventType.OPEN_FAILED): "Received OPEN_FAILED",
+            int(omni.usd.StageEventType.ASSETS_LOAD_ABORTED): "Received ASSETS_LOAD_ABORTED",
+        }
+        events = []
+        self._subscription = self.context.get_stage_event_stream().create_subscription_to_pop(
+            lambda event: events.append(int(event.type)), name="pc.extension stage readiness"
+        )
+        self.status = {"ready": False}
+        start = time.time()
+        frames = 0
+        try:
+            while True:
+                await self.app.next_update_async()
+                frames += 1
+                errors = [failures[e] for e in events if e in failures]
+                if errors:
+                    self.status["error"] = errors[0]
+                    break
+                if self.is_ready() and (condition is None or condition()):
+                    self.status["ready"] = True
+                    break
+                if time.time() - start > self.timeout:
+                    self.status["error"] = f"Stage not ready after {self.timeout}s"
+                    break
+        finally:
+            # dropping the subscription unsubscribes it
+            self._subscription = None
+
+        self.wait_time = time.time() - start
+        self.status["frames"] = frames
+        if label is not None:
+            self.wait_times[label] = self.wait_times.get(label, 0.0) + self.wait_time
+        if "error" in self.status:
+            raise RuntimeError(self.status["error"])
+        return self.wait_time
+
+
+async def wait_for_stage_ready(context=None, timeout: float = None, condition=None) -> float:
+    """Convenience wrapper around `StageReadiness.wait`, returns the time waited in seconds."""
+    return await StageReadiness(context, timeout).wait(condition=condition)
+
+
+async def recreate_stage(app, readiness: StageReadiness = None):
+    readiness = readiness or StageReadiness()
     # close stage stage
     await omni.usd.get_context().close_stage_async()
-    # update Kit
-    for _ in range(2):
-        await app.next_update_async()
     # create a new one
     await omni.usd.get_context().new_stage_async()
-    # update Kit
-    for _ in range(2):
-        await app.next_update_async()
+    # update Kit until the new stage is usable
+    await readiness.wait("recreate_stage")
     # get stage
     return omni.usd.get_context().get_stage()
 
@@ -202,8 +290,10 @@ def create_prim(
 
 
 def get_world_bounds(prim, cache=None):
-    bounds = UsdGeom.Imageable(prim).ComputeLocalBound(0, "default")
-    return bounds
+    """Bounds of `prim` in the space of its parent, `cache` being a `UsdGeom.BBoxCache` reused between calls."""
+    if cache is None:
+        cache = UsdGeom.BBoxCache(0, [UsdGeom.Tokens.default_])
+    return cache.ComputeLocalBound(prim)
 
 
 async def stage_event_compat() -> int:
@@ -300,44 +390,43 @@ class async_loading_wrapper:
 
                 self.status["load_time"] = time.time() - self.loading_start
             elif self.mode == "editor":
-                await asyncio.sleep(1)
-                bg = time.time()
-                while self.is_loading() and time.time() - bg < self.timeout:
-                    await asyncio.sleep(1)
+                readiness = StageReadiness(self.context, self.timeout - (time.time() - self.loading_start))
+                try:
+                    await readiness.wait()
+                except RuntimeError as e:
+                    self.status["error"] = str(e)
 
                 # log that asset is loaded
                 self.status["loaded"] = not self.is_loading()
+                self.status["load_time"] = time.time() - self.loading_start
             else:
                 raise ValueError(f"Unknown mode: '{self.mode}'")
         else:
             self.status["loaded"] = True
 
         # make sure all the materials are loaded
-        await asyncio.sleep(0.2)
+        readiness = StageReadiness(self.context, self.timeout)
+        try:
+            self.status["settle_time"] = await readiness.wait()
+        except RuntimeError as e:
+            self.status.setdefault("error", str(e))
+            self.status["settle_time"] = readiness.wait_time
 
 
 def camera_fit_to_prim(camera, camera_rig, focus_prim, distance_multiplier: float = 1.2):
     """Move camera rig to centroid elevation and set camera distance so to fit `focus_prim`.
     """
-    horiz_aperture = camera.GetAttribute("horizontalAperture").Get()
-    vert_aperture = camera.GetAttribute("verticalAperture").Get()
     bounds_world = get_world_bounds(focus_prim)
     asset_range = bounds_world.GetRange()
-
-    translation = asset_range.GetMidpoint()
+    center, offset = camera_fit(asset_range.GetMin(), asset_range.GetMax(), distance_multiplier)
 
     # Setting the camera rig to the center of the object.
     camera_rig.ClearXformOpOrder()
-    camera_rig.AddTranslateOp().Set(translation)
+    camera_rig.AddTranslateOp().Set(Gf.Vec3d(*center))
 
-    # Calculate distance to move camera from asset
-    distance = np.linalg.norm(np.array(asset_range.GetSize()))
-    distance *= distance_multiplier  # Scale factor of distance from object centroid to camera
-
-    translation[0], translation[1] = 0, 0  # Only setting the z axis of the camera.
-    translation[2] += distance
+    # Only setting the z axis of the camera.
     UsdGeom.Xformable(camera).ClearXformOpOrder()
-    UsdGeom.Xformable(camera).AddTranslateOp().Set(translation)
+    UsdGeom.Xformable(camera).AddTranslateOp().Set(Gf.Vec3d(0, 0, offset))
 
 
 async def create_viewport(resolution=None, camera=None, window_width=0, window_height=0):
@@ -357,8 +446,12 @@ async def create_viewport(resolution=None, camera=None, window_width=0, window_h
     if camera:
         viewport.set_active_camera(str(camera.GetPath()))
 
-    # Wait for some frames to draw before creating the next window
-    for _ in range(10):
-        await omni.kit.app.get_app_interface().next_update_async()
+    def is_viewport_ready() -> bool:
+        if camera and viewport.get_active_camera() != str(camera.GetPath()):
+            return False
+        return not resolution or tuple(viewport.get_texture_resolution()) == tuple(resolution)
+
+    # Wait for the viewport to use the camera and resolution on a ready stage before creating the next window
+    await wait_for_stage_ready(condition=is_viewport_ready)
 
     return viewport_name
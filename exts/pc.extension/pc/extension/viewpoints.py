@@ -0,0 +1,283 @@
+"""Viewpoint samplers deciding from which (elevation, azimuth) pairs an asset is rendered.
+"""
+import math
+
+import numpy as np
+
+from .fusion import voxel_keys
+
+
+def viewpoint_direction(elevation: float, azimuth: float, up_axis: str = "Z") -> np.ndarray:
+    """Unit vector from the asset center to the camera for a camera rig posed at (elevation, azimuth) degrees."""
+    # The camera sits on the +Z axis of the rig, which is rotated about X by the elevation first and then
+    # about the up axis by the azimuth
+    el, az = math.radians(elevation), math.radians(azimuth)
+    if up_axis == "Z":
+        return np.array([math.sin(az) * math.sin(el), -math.cos(az) * math.sin(el), math.cos(el)])
+    return np.array([math.sin(az) * math.cos(el), -math.sin(el), math.cos(az) * math.cos(el)])
+
+
+def _rotations(axis: str, degrees: np.ndarray) -> np.ndarray:
+    """(V, 3, 3) row-vector rotations, `p @ R`, about a main axis, matching the USD rotate ops."""
+    angles = np.radians(np.asarray(degrees, dtype=np.float64))
+    cos, sin = np.cos(angles), np.sin(angles)
+    i, j = {"X": (1, 2), "Y": (2, 0), "Z": (0, 1)}[axis]
+    rotations = np.zeros(angles.shape + (3, 3))
+    rotations[..., 3 - i - j, 3 - i - j] = 1
+    rotations[..., i, i] = cos
+    rotations[..., i, j] = sin
+    rotations[..., j, i] = -sin
+    rotations[..., j, j] = cos
+    return rotations
+
+
+def camera_fit(bounds_min, bounds_max, distance_multiplier: float = 1.2) -> tuple:
+    """Center of the camera rig and offset of the camera along the rig +Z axis framing the given bounds.
+
+    Returns:
+        tuple: (3,) rig center, camera offset
+    """
+    bounds_min, bounds_max = np.asarray(bounds_min, dtype=np.float64), np.asarray(bounds_max, dtype=np.float64)
+    center = (bounds_min + bounds_max) / 2
+    # the camera is moved by the height of the center too, as the rig always did
+    return center, float(center[2] + np.linalg.norm(bounds_max - bounds_min) * distance_multiplier)
+
+
+def camera_poses(viewpoints, center, offset: float, up_axis: str = "Z") -> np.ndarray:
+    """Camera to world matrices of the camera rig posed at every (elevation, azimuth) pair, without USD.
+
+    The rig is translated to `center`, rotated about X by the elevation and then about the up axis by the
+    azimuth, and holds the camera at `offset` along its +Z axis. Matrices are row-vector, like USD ones.
+
+    Args:
+        viewpoints: (V, 2) elevation and azimuth pairs in degrees
+        center: (3,) center of the rig, see `camera_fit`
+        offset (float): distance of the camera along the rig +Z axis
+        up_axis (str): up axis of the stage, "Z" or "Y"
+
+    Returns:
+        np.ndarray: (V, 4, 4) local to world matrices of the camera
+    """
+    viewpoints = np.asarray(viewpoints, dtype=np.float64).reshape(-1, 2)
+    rotations = _rotations("X", viewpoints[:, 0]) @ _rotations(up_axis, viewpoints[:, 1])
+    poses = np.zeros((viewpoints.shape[0], 4, 4))
+    poses[:, :3, :3] = rotations
+    poses[:, 3, :3] = offset * rotations[:, 2] + np.asarray(center, dtype=np.float64)
+    poses[:, 3, 3] = 1
+    return poses
+
+
+def direction_to_viewpoint(direction, up_axis: str = "Z") -> tuple:
+    """Inverse of `viewpoint_direction`, get the (elevation, azimuth) degrees placing the camera along `direction`."""
+    x, y, z = np.asarray(direction, dtype=np.float64) / np.linalg.norm(direction)
+    if up_axis == "Z":
+        # the elevation is measured from the up axis with this rig
+        return math.degrees(math.acos(np.clip(z, -1, 1))), math.degrees(math.atan2(x, -y)) % 360
+    return math.degrees(math.asin(np.clip(-y, -1, 1))), math.degrees(math.atan2(x, z)) % 360
+
+
+class ViewpointSampler:
+    """Base class of the viewpoint samplers.
+
+    The generator calls `reset` once per asset, then asks for `next_viewpoint` until it returns None and
+    hands every projected view back through `observe`, which lets adaptive samplers stop early.
+    """
+
+    # whether the sampler needs every view projected as soon as it is rendered
+    adaptive = False
+
+    def reset(self, bounds_size=None, up_axis: str = "Z"):
+        self._index = 0
+
+    @property
+    def max_views(self) -> int:
+        return len(self.viewpoints())
+
+    def viewpoints(self) -> list:
+        """All the (elevation, azimuth) pairs the sampler can return, in order."""
+        raise NotImplementedError
+
+    def next_viewpoint(self):
+        viewpoints = self.viewpoints()
+        if self._index >= len(viewpoints):
+            return None
+        viewpoint = viewpoints[self._index]
+        self._index += 1
+        return viewpoint
+
+    def observe(self, pointcloud: np.ndarray):
+        pass
+
+    def stats(self) -> dict:
+        return {"views": self._index}
+
+    def params(self) -> dict:
+        """JSON serializable description of the sampler, two samplers with equal params pick the same views."""
+        return {"type": type(self).__name__, "viewpoints": [list(viewpoint) for viewpoint in self.viewpoints()]}
+
+
+class GridSampler(ViewpointSampler):
+    """Every combination of the given elevations and azimuths, the historical fixed viewpoints."""
+
+    def __init__(self, azimuths, elevations):
+        self.azimuths = list(azimuths)
+        self.elevations = list(elevations)
+        self.reset()
+
+    def viewpoints(self) -> list:
+        return [(el, az) for el in self.elevations for az in self.azimuths]
+
+
+class FibonacciSampler(ViewpointSampler):
+    """N viewpoints spread evenly over the sphere along a Fibonacci spiral.
+
+    Args:
+        n_views (int): number of viewpoints
+    """
+
+    def __init__(self, n_views: int = 12):
+        self.n_views = n_views
+        self.reset()
+
+    def reset(self, bounds_size=None, up_axis: str = "Z"):
+        super().reset(bounds_size, up_axis)
+        self.up_axis = up_axis
+
+    def viewpoints(self) -> list:
+        golden_angle = math.pi * (3 - math.sqrt(5))
+        up, side_a, side_b = (2, 0, 1) if self.up_axis == "Z" else (1, 0, 2)
+        viewpoints = []
+        for i in range(self.n_views):
+            height = 1 - (2 * i + 1) / self.n_views
+            radius = math.sqrt(1 - height * height)
+            direction = np.empty(3)
+            direction[up] = height
+            direction[side_a] = radius * math.cos(i * golden_angle)
+            direction[side_b] = radius * math.sin(i * golden_angle)
+            viewpoints.append(direction_to_viewpoint(direction, self.up_axis))
+        return viewpoints
+
+    def params(self) -> dict:
+        # the viewpoints depend on the up axis of the stage, set on reset
+        return {"type": type(self).__name__, "n_views": self.n_views}
+
+
+class AdaptiveSampler(ViewpointSampler):
+    """Next-best-view sampler stopping once new views barely add surface.
+
+    Observed points are accumulated on a voxel grid along with their normals. The next viewpoint is the
+    candidate facing the most surface that no previous view faced, and sampling stops when a view adds
+    less than `min_gain` new voxels relative to the voxels already covered.
+
+    The fraction of the surface covered is estimated from the overlap of each view with the voxels
+    already covered, the share of a view falling on covered voxels being about the share of the whole
+    surface that is covered. Views aimed at uncovered surface make it an underestimate.
+
+    Args:
+        candidates (ViewpointSampler): sampler providing the candidate viewpoints
+        min_gain (float): stop when a view adds less than this fraction of new voxels
+        min_views (int): number of views rendered before stopping is considered
+        relative_voxel_size (float): coverage voxel size as a fraction of the asset bounds diagonal
+    """
+
+    adaptive = True
+
+    def __init__(
+        self,
+        candidates: ViewpointSampler = None,
+        min_gain: float = 0.02,
+        min_views: int = 4,
+        relative_voxel_size: float = 0.01,
+    ):
+        self.candidates = candidates if candidates is not None else FibonacciSampler(32)
+        self.min_gain = min_gain
+        self.min_views = min_views
+        self.relative_voxel_size = relative_voxel_size
+        self.reset()
+
+    def viewpoints(self) -> list:
+        return self.candidates.viewpoints()
+
+    def reset(self, bounds_size=None, up_axis: str = "Z"):
+        super().reset(bounds_size, up_axis)
+        self.candidates.reset(bounds_size, up_axis)
+        self.voxel_size = None
+        if bounds_size is not None:
+            diagonal = float(np.linalg.norm(np.asarray(bounds_size, dtype=np.float64)))
+            self.voxel_size = self.relative_voxel_size * diagonal
+        candidates = self.viewpoints()
+        self._directions = np.array([viewpoint_direction(el, az, up_axis) for el, az in candidates]).reshape(-1, 3)
+        self._remaining = list(range(len(candidates)))
+        self._used = []
+        self._keys = np.empty(0, dtype=np.int64)
+        self._normals = np.empty((0, 3))
+        self.last_gain = None
+        self.coverage = None
+        self._stop = False
+
+    def next_viewpoint(self):
+        if self._stop or not self._remaining:
+            return None
+        if not self._used or self._normals.shape[0] == 0:
+            # Nothing observed yet, go for the candidate farthest from the views already used
+            choice = self._remaining[0]
+            if self._used:
+                similarity = self._directions[self._remaining] @ self._directions[self._used].T
+                choice = self._remaining[int(np.argmin(similarity.max(axis=1)))]
+        else:
+            # Surface facing a candidate, minus how well it was already facing one of the used views
+            seen = np.clip(self._normals @ self._directions[self._used].T, 0, None).max(axis=1)
+            facing = np.clip(self._normals @ self._directions[self._remaining].T, 0, None)
+            scores = (facing * (1 - seen)[:, None]).sum(axis=0)
+            choice = self._remaining[int(np.argmax(scores))]
+
+        self._remaining.remove(choice)
+        self._used.append(choice)
+        self._index += 1
+        return self.viewpoints()[choice]
+
+    def observe(self, pointcloud: np.ndarray):
+        if pointcloud is None or len(pointcloud) == 0:
+            self.last_gain = 0.0
+        else:
+            if self.voxel_size is None:
+                # No bounds given, derive the voxel size from the first view
+                extent = np.ptp(np.asarray(pointcloud[..., :3], dtype=np.float64), axis=0)
+                self.voxel_size = self.relative_voxel_size * float(np.linalg.norm(extent)) or 1.0
+            keys, first = np.unique(voxel_keys(pointcloud, self.voxel_size), return_index=True)
+            new = ~np.isin(keys, self._keys, assume_unique=True)
+            n_covered = self._keys.shape[0]
+            self._keys = np.union1d(self._keys, keys)
+            normals = np.asarray(pointcloud[..., 3:6], dtype=np.float64)[first[new]]
+            self._normals = np.concatenate([self._normals, normals], axis=0)
+            self.last_gain = float(new.sum()) / max(n_covered, 1) if n_covered else 1.0
+            if n_covered:
+                # Chapman estimate of the surface voxels from the voxels seen again by this view
+                n_seen_again = keys.shape[0] - int(new.sum())
+                n_surface = (n_covered + 1) * (keys.shape[0] + 1) / (n_seen_again + 1) - 1
+                self.coverage = min(self.n_voxels / n_surface, 1.0)
+
+        if self._index >= self.min_views and self.last_gain < self.min_gain:
+            self._stop = True
+
+    @property
+    def n_voxels(self) -> int:
+        return self._keys.shape[0]
+
+    def params(self) -> dict:
+        return {
+            "type": type(self).__name__,
+            "candidates": self.candidates.params(),
+            "min_gain": self.min_gain,
+            "min_views": self.min_views,
+            "relative_voxel_size": self.relative_voxel_size,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "views": self._index,
+            "candidates": len(self.viewpoints()),
+            "covered_voxels": self.n_voxels,
+            "last_gain": self.last_gain,
+            "coverage": self.coverage,
+        }
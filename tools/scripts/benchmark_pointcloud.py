@@ -0,0 +1,413 @@
+"""Offline benchmarks of the CPU stages of the point cloud generator, runnable without Kit.
+
+Synthetic depth, normal, color and mask frames are ray cast from analytic scenes (plane, sphere, box) and fed
+to the same functions the generator uses: per-view back-projection, with or without a `ProjectionWorkspace`
+writing into the accumulator, the concatenation of the views (streamed through `PointCloudAccumulator` or stacked
+in a `ViewBatch`), the authoring of the `UsdGeom.Points` prim on an
+in-memory stage and `get_camera_metadata`. Every case reports its throughput, peak traced memory and its error
+against the analytic surface, and the results are saved to JSON so revisions can be compared:
+
+    python tools/scripts/benchmark_pointcloud.py --quick
+    python tools/scripts/benchmark_pointcloud.py --compare _benchmarks/<previous run>.json
+
+Requires numpy and usd-core (pxr).
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+from pxr import Gf, Usd, UsdGeom
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+EXTENSION_ROOT = os.path.join(REPO_ROOT, "exts", "pc.extension")
+
+SCENES = ["plane", "sphere", "box"]
+RESOLUTIONS = [256, 448, 1024, 2048]
+VIEW_COUNTS = [12, 48]
+
+# Camera of the generator: default USD aperture, 60 degrees fov scaled by the generator fov multiplier (4 * 0.5)
+HORIZONTAL_APERTURE = 20.955
+FOCAL_LENGTH = HORIZONTAL_APERTURE / math.tan(math.radians(30)) * 2.0
+DEPTH_SCALE = 100.0
+CAMERA_DISTANCE = 4.0
+PLANE_HALF_SIZE = 1.0
+SPHERE_RADIUS = 1.0
+BOX_HALF_SIZE = 0.75
+
+
+def import_extension_modules():
+    """Import the Kit-free modules of the extension, without running `pc/extension/__init__.py` which needs Kit."""
+    if "pc.extension" not in sys.modules:
+        package = types.ModuleType("pc")
+        package.__path__ = [os.path.join(EXTENSION_ROOT, "pc")]
+        extension = types.ModuleType("pc.extension")
+        extension.__path__ = [os.path.join(EXTENSION_ROOT, "pc", "extension")]
+        sys.modules["pc"] = package
+        sys.modules["pc.extension"] = extension
+    names = ["accumulator", "geometry", "projection", "viewpoints"]
+    return types.SimpleNamespace(**{name: importlib.import_module(f"pc.extension.{name}") for name in names})
+
+
+pc = import_extension_modules()
+
+
+def camera_pose(direction: np.ndarray) -> np.ndarray:
+    """Camera to world matrix, row-vector convention, of a camera on `direction` looking at the origin."""
+    z_axis = direction / np.linalg.norm(direction)
+    up = np.array([0.0, 0.0, 1.0]) if abs(z_axis[2]) < 0.999 else np.array([0.0, 1.0, 0.0])
+    x_axis = np.cross(up, z_axis)
+    x_axis /= np.linalg.norm(x_axis)
+    y_axis = np.cross(z_axis, x_axis)
+    pose = np.eye(4)
+    pose[0, :3], pose[1, :3], pose[2, :3] = x_axis, y_axis, z_axis
+    pose[3, :3] = z_axis * CAMERA_DISTANCE
+    return pose
+
+
+def camera_poses(n_views: int) -> list:
+    sampler = pc.viewpoints.FibonacciSampler(n_views)
+    sampler.reset(up_axis="Z")
+    return [camera_pose(pc.viewpoints.viewpoint_direction(el, az, "Z")) for el, az in sampler.viewpoints()]
+
+
+def intersect(scene: str, origin: np.ndarray, rays: np.ndarray):
+    """Ray cast an analytic scene, returning the (N,) ray parameters (inf on a miss) and (N, 3) normals."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if scene == "plane":
+            t = -origin[2] / rays[:, 2]
+            points = origin + t[:, None] * rays
+            hit = (t > 0) & (np.abs(points[:, :2]) <= PLANE_HALF_SIZE).all(axis=1)
+            normals = np.zeros_like(rays)
+            normals[:, 2] = 1
+        elif scene == "sphere":
+            a = (rays * rays).sum(axis=1)
+            b = 2 * rays @ origin
+            c = origin @ origin - SPHERE_RADIUS**2
+            disc = b * b - 4 * a * c
+            t = (-b - np.sqrt(disc)) / (2 * a)
+            hit = (disc >= 0) & (t > 0)
+            normals = origin + t[:, None] * rays
+        elif scene == "box":
+            t0 = (-BOX_HALF_SIZE - origin) / rays
+            t1 = (BOX_HALF_SIZE - origin) / rays
+            t_near = np.minimum(t0, t1)
+            t = t_near.max(axis=1)
+            hit = (t <= np.maximum(t0, t1).min(axis=1)) & (t > 0)
+            axis = t_near.argmax(axis=1)
+            normals = np.zeros_like(rays)
+            normals[np.arange(rays.shape[0]), axis] = -np.sign(rays[np.arange(rays.shape[0]), axis])
+        else:
+            raise ValueError(f"Unknown scene: '{scene}'")
+
+    t = np.where(hit, t, np.inf)
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    # face the camera, as the normal sensor does
+    normals *= np.where((normals * rays).sum(axis=1) > 0, -1.0, 1.0)[:, None]
+    return t, normals
+
+
+def render_frame(scene: str, directions: np.ndarray, pose: np.ndarray) -> dict:
+    """Synthetic groundtruth with the layout and dtypes of the syntheticdata sensors."""
+    height, width = directions.shape[:2]
+    rays = directions.reshape(-1, 3) @ pose[:3, :3]
+    t, normals = intersect(scene, pose[3, :3], rays)
+    hit = np.isfinite(t)
+    points = pose[3, :3] + t[hit, None] * rays[hit]
+
+    depth = np.zeros(height * width, dtype=np.float32)
+    # directions have a z of -1 in camera space, so the ray parameter is the linear depth
+    depth[hit] = t[hit] / DEPTH_SCALE
+    normal_image = np.zeros((height * width, 3), dtype=np.float32)
+    normal_image[hit] = normals[hit]
+    rgba = np.zeros((height * width, 4), dtype=np.uint8)
+    rgba[hit, :3] = np.clip((points + 1) * 127.5, 0, 255)
+    rgba[hit, 3] = 255
+    return {
+        "linear_depth": depth.reshape(height, width),
+        "normal": normal_image.reshape(height, width, 3),
+        "images": rgba.reshape(height, width, 4),
+        "segmentation": hit.astype(np.uint32).reshape(height, width),
+    }
+
+
+def surface_error(scene: str, points: np.ndarray) -> np.ndarray:
+    """Distance of points to the analytic surface."""
+    if scene == "plane":
+        outside = np.clip(np.abs(points[:, :2]) - PLANE_HALF_SIZE, 0, None)
+        return np.sqrt(points[:, 2] ** 2 + (outside**2).sum(axis=1))
+    if scene == "sphere":
+        return np.abs(np.linalg.norm(points, axis=1) - SPHERE_RADIUS)
+    return np.abs(np.abs(points).max(axis=1) - BOX_HALF_SIZE)
+
+
+def measure_memory():
+    """Reset the traced peak and return a function giving the peak in bytes above the current usage."""
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    return lambda: tracemalloc.get_traced_memory()[1] - current
+
+
+def throughput(stage: str, case: dict, seconds: float, n_points: int, n_views: int, peak: int, **extra) -> dict:
+    result = dict(case, stage=stage, seconds=seconds, points=int(n_points), views=n_views)
+    result["points_per_s"] = n_points / seconds if seconds > 0 else None
+    result["views_per_s"] = n_views / seconds if seconds > 0 else None
+    result["peak_mb"] = peak / 2**20
+    result.update(extra)
+    return result
+
+
+def bench_views(scene: str, resolution: int, n_views: int, batched_budget: float) -> list:
+    """Benchmark the back-projection, the concatenation of the views and the USD authoring of one case."""
+    case = {"scene": scene, "resolution": resolution, "n_views": n_views}
+    poses = camera_poses(n_views)
+    directions = pc.projection.RayDirectionCache().get(
+        resolution, resolution, FOCAL_LENGTH, HORIZONTAL_APERTURE, HORIZONTAL_APERTURE
+    )
+    results = []
+
+    # Per-view back-projection streamed into the accumulator, as `generate_pointcloud` does
+    project_time = accumulate_time = 0.0
+    peak = 0
+    errors, normal_errors = [], []
+    expected_points = 0
+    accumulator = pc.accumulator.PointCloudAccumulator(initial_capacity=resolution * resolution)
+    for pose in poses:
+        gt = render_frame(scene, directions, pose)
+        expected_points += int(np.count_nonzero(gt["segmentation"]))
+        get_peak = measure_memory()
+
+        start = time.perf_counter()
+        pointcloud = pc.projection.backproject_view(
+            directions, gt["linear_depth"], gt["normal"], gt["images"], gt["segmentation"], pose, DEPTH_SCALE
+        )
+        project_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        accumulator.append(pointcloud)
+        accumulate_time += time.perf_counter() - start
+        peak = max(peak, get_peak())
+
+        errors.append(surface_error(scene, pointcloud[:, :3]).max(initial=0))
+        rays = pointcloud[:, :3] - pose[3, :3]
+        normal_errors.append((pointcloud[:, 3:6] * rays).sum(axis=1).max(initial=-1))
+        del gt, pointcloud
+
+    get_peak = measure_memory()
+    start = time.perf_counter()
+    pointcloud = accumulator.finalize()
+    accumulate_time += time.perf_counter() - start
+    peak = max(peak, get_peak())
+
+    correctness = {
+        "max_surface_error": float(max(errors)),
+        "normals_face_camera": bool(max(normal_errors) <= 0),
+        "points_match_mask": int(pointcloud.shape[0]) == expected_points,
+    }
+    results.append(throughput("project", case, project_time, pointcloud.shape[0], n_views, peak, **correctness))
+    results.append(
+        throughput(
+            "accumulate", case, project_time + accumulate_time, pointcloud.shape[0], n_views, peak, **correctness
+        )
+    )
+
+    # Per-view back-projection written straight into the accumulator with a reused workspace
+    workspace = pc.projection.ProjectionWorkspace()
+    accumulator = pc.accumulator.PointCloudAccumulator(initial_capacity=resolution * resolution)
+    seconds = 0.0
+    peak = 0
+    for pose in poses:
+        gt = render_frame(scene, directions, pose)
+        get_peak = measure_memory()
+        start = time.perf_counter()
+        workspace.project(
+            directions,
+            gt["linear_depth"],
+            gt["normal"],
+            gt["images"],
+            gt["segmentation"],
+            pose,
+            DEPTH_SCALE,
+            allocate=accumulator.allocate,
+        )
+        seconds += time.perf_counter() - start
+        peak = max(peak, get_peak())
+        del gt
+    inplace = accumulator.finalize()
+    identical = inplace.shape == pointcloud.shape and bool(np.array_equal(inplace, pointcloud))
+    results.append(
+        throughput("project_inplace", case, seconds, inplace.shape[0], n_views, peak, matches_accumulate=identical)
+    )
+    del inplace
+
+    # Every view stacked and back-projected at once, skipped when the stacked frames do not fit the budget
+    frame_bytes = resolution * resolution * (4 + 12 + 4 + 1)
+    if n_views * frame_bytes + pointcloud.nbytes <= batched_budget * 2**30:
+        batch = pc.projection.ViewBatch(n_views)
+        for pose in poses:
+            gt = render_frame(scene, directions, pose)
+            batch.add(gt["linear_depth"], gt["normal"], gt["images"], gt["segmentation"], pose)
+            del gt
+        get_peak = measure_memory()
+        start = time.perf_counter()
+        batched = batch.backproject(directions, DEPTH_SCALE)
+        seconds = time.perf_counter() - start
+        # read before the comparison, whose temporaries are not part of the projection
+        peak = get_peak()
+        identical = batched.shape == pointcloud.shape and bool(np.allclose(batched, pointcloud))
+        results.append(
+            throughput("batched", case, seconds, batched.shape[0], n_views, peak, matches_accumulate=identical)
+        )
+        del batch, batched
+    else:
+        results.append(dict(case, stage="batched", skipped=f"stacked frames exceed {batched_budget} GiB"))
+
+    # Authoring of the Points prim, what `_load_pointcloud` does once the views are merged
+    stage = Usd.Stage.CreateInMemory()
+    get_peak = measure_memory()
+    start = time.perf_counter()
+    points = pc.geometry.author_points(stage, pointcloud, "/World/Pointcloud")
+    seconds = time.perf_counter() - start
+    peak = get_peak()
+    authored = np.array(points.GetPointsAttr().Get())
+    error = float(np.abs(authored - pointcloud[:, :3]).max(initial=0)) if authored.shape[0] else 0.0
+    results.append(
+        throughput(
+            "author",
+            case,
+            seconds,
+            pointcloud.shape[0],
+            n_views,
+            peak,
+            points_match=authored.shape[0] == pointcloud.shape[0],
+            max_position_error=error,
+        )
+    )
+    return results
+
+
+def bench_camera_metadata(n_views: int, repeat: int = 20) -> dict:
+    """Benchmark `get_camera_metadata` on a camera posed by an xform op, like the generator camera rig."""
+    stage = Usd.Stage.CreateInMemory()
+    camera = stage.DefinePrim("/World/CameraRig1/CameraRig2/Camera", "Camera")
+    camera.GetAttribute("focalLength").Set(FOCAL_LENGTH)
+    camera.GetAttribute("horizontalAperture").Set(HORIZONTAL_APERTURE)
+    camera.GetAttribute("verticalAperture").Set(HORIZONTAL_APERTURE)
+    transform = UsdGeom.Xformable(stage.GetPrimAtPath("/World/CameraRig1")).AddTransformOp()
+
+    poses = camera_poses(n_views)
+    seconds = 0.0
+    error = 0.0
+    get_peak = measure_memory()
+    for _ in range(repeat):
+        for pose in poses:
+            transform.Set(Gf.Matrix4d(pose.tolist()))
+            start = time.perf_counter()
+            metadata = pc.geometry.get_camera_metadata(camera)
+            seconds += time.perf_counter() - start
+            error = max(error, float(np.abs(metadata["local_to_world_tf"] - pose).max()))
+
+    case = {"scene": None, "resolution": None, "n_views": n_views}
+    return throughput("camera_metadata", case, seconds / repeat, 0, n_views, get_peak(), max_pose_error=error)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result: dict) -> tuple:
+    return result["stage"], result["scene"], result["resolution"], result["n_views"]
+
+
+def compare(results: list, baseline_path: str):
+    """Print the speedup of every case over a previous run."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {result_key(r): r for r in baseline["results"] if r.get("seconds")}
+    print(f"\nCompared to {baseline_path} (revision {baseline.get('revision')}):")
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None or not result.get("seconds"):
+            continue
+        speedup = before["seconds"] / result["seconds"]
+        memory = result["peak_mb"] - before["peak_mb"]
+        print(f"  {' / '.join(str(k) for k in result_key(result)):<36} x{speedup:6.2f}  memory {memory:+9.1f} MB")
+
+
+def print_result(result: dict):
+    name = " / ".join(str(k) for k in result_key(result))
+    if "skipped" in result:
+        print(f"  {name:<36} skipped: {result['skipped']}")
+        return
+    rate = f"{result['points_per_s'] / 1e6:9.2f} Mpts/s" if result["points"] else " " * 15
+    checks = {k: v for k, v in result.items() if k.startswith(("max_", "points_match", "normals_", "matches_"))}
+    print(f"  {name:<36} {result['seconds']:8.4f}s {rate} {result['views_per_s']:8.1f} views/s")
+    print(f"  {'':<36} peak {result['peak_mb']:9.1f} MB  {checks}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CPU stages of the point cloud generator")
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=SCENES)
+    parser.add_argument("--resolutions", nargs="+", type=int, default=RESOLUTIONS)
+    parser.add_argument("--views", nargs="+", type=int, default=VIEW_COUNTS)
+    parser.add_argument("--quick", action="store_true", help="only 256 and 448 pixels with 12 views")
+    parser.add_argument(
+        "--batched-budget", type=float, default=4.0, help="GiB of stacked frames above which batching is skipped"
+    )
+    parser.add_argument("--output", help="result file, _benchmarks/<time>_<revision>.json by default")
+    parser.add_argument("--compare", help="previous result file to compare against")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.resolutions = [r for r in args.resolutions if r <= 448]
+        args.views = [min(args.views)]
+
+    revision = git_revision()
+    tracemalloc.start()
+    results = []
+    for n_views in args.views:
+        results.append(bench_camera_metadata(n_views))
+        print_result(results[-1])
+    for scene in args.scenes:
+        for resolution in args.resolutions:
+            for n_views in args.views:
+                for result in bench_views(scene, resolution, n_views, args.batched_budget):
+                    print_result(result)
+                    results.append(result)
+    tracemalloc.stop()
+
+    run = {
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        REPO_ROOT, "_benchmarks", f"{time.strftime('%Y%m%d-%H%M%S')}_{revision or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()